@@ -1,5 +1,12 @@
 from . import shapes as _shapes
 from .polygrid import PolyGrid
 from .maze import Maze
+from .solver import Solver
+from .cache import MazeCache
+from .progress import CancelToken, Cancelled
+from .shared import SharedGrid
+from .tracing import ChromeTracer, set_tracer
+from .animation import save_animation
+from .cli import make_maze
 
-SUPERSHAPES_DICT = _shapes.supershapes_dict()  # all of the built-in shapes
+SUPERSHAPES_DICT = _shapes.supershapes_dict()  # all shapes, including loaded specs
@@ -0,0 +1,103 @@
+"""asyncio entry points that make and draw mazes without blocking the loop.
+
+The work runs in an executor (the default executor of the loop unless
+another one is given). When the waiting task is cancelled or its timeout
+passes, the work stops at its next check (see progress) so it does not go
+on in a thread that nobody waits for.
+
+note: python 3 only so it is imported separately (import polymaze.aio)
+"""
+import asyncio
+import random
+import threading
+
+from . import cli
+from .maze import Maze
+from .progress import CancelToken
+
+
+_LOCK_POLL_SECONDS = 0.05
+# mazes use the shared random generator so they are made one at a time.
+# otherwise unseeded mazes would change the numbers that seeded ones get
+_random_lock = threading.Lock()
+
+
+def make_maze(timeout=None, executor=None, **params):
+    """Make a maze like polymaze.make_maze without blocking the event loop.
+
+    kwargs:
+    timeout - seconds until the task gives up with asyncio.TimeoutError
+    executor - concurrent.futures executor for the work
+    params - see polymaze.make_maze (except cache). progress (see progress)
+             is called from the executor
+
+    returns: an asyncio task for the maze
+    """
+    return _start(executor, timeout, _make_maze, params)
+
+
+def maze_image(maze, timeout=None, executor=None, progress=None):
+    """Draw maze (see Maze.image) without blocking the event loop.
+
+    returns: an asyncio task for the image (None if the maze is empty)
+    """
+    return _start(executor, timeout, _maze_image, maze, progress)
+
+
+def make_maze_image(timeout=None, executor=None, **params):
+    """Make and draw a maze with one timeout for all of the work.
+
+    returns: an asyncio task for (maze, image)
+    """
+    return _start(executor, timeout, _make_maze_image, params)
+
+
+def _start(executor, timeout, function, *args):
+    """Return a task for function(cancel token, *args) run in executor.
+
+    The token is cancelled when the task is done for any reason so the work
+    stops at its next check when nobody waits for it anymore.
+    """
+    cancel = CancelToken()
+    loop = asyncio.get_running_loop()
+    work = loop.run_in_executor(executor, function, cancel, *args)
+    task = asyncio.ensure_future(asyncio.wait_for(work, timeout))
+    task.add_done_callback(lambda _: cancel.cancel())
+    return task
+
+
+def _make_maze(cancel, params):
+    while not _random_lock.acquire(True, _LOCK_POLL_SECONDS):
+        cancel.check()
+    try:
+        if params.get('seed') is not None:
+            random.seed(params['seed'])
+        return _carved_maze(cancel, params)
+    finally:
+        _random_lock.release()
+
+
+def _carved_maze(cancel, params):
+    params = dict(params)
+    params.pop('seed', None)
+    processes = params.pop('processes', None)
+    tile_size = params.pop('tile_size', None)
+    progress = params.get('progress')
+    cancel.check()
+    grid = cli._make_grid(cancel=cancel, **params)
+    return Maze(grid, processes=processes, tile_size=tile_size,
+                progress=progress, cancel=cancel)
+
+
+def _maze_image(cancel, maze, progress=None):
+    cancel.check()
+    return maze.image(progress=progress, cancel=cancel)
+
+
+def _make_maze_image(cancel, params):
+    maze = _make_maze(cancel, params)
+    return maze, _maze_image(cancel, maze, params.get('progress'))
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,226 @@
+"""Save the carving of a maze as an animation (animated PNG or GIF).
+
+Each frame only redraws the part of the image that changed since the last
+frame and animated PNGs store only that part so the cost of a frame follows
+the number of carving steps instead of the size of the maze.
+
+Only animated PNGs are incremental. PIL keeps every whole frame of a GIF
+(1 byte per pixel) until the file is written so GIF memory grows with the
+size of the image times the number of frames.
+"""
+import struct
+
+import PIL.Image
+import PIL.ImageDraw
+
+from . import png
+from .maze import Maze
+
+
+_DEFAULT_FRAME_COUNT = 100  # approximate when steps_per_frame is not given
+_BUCKET_PX = 64  # size of the squares used to find shapes near a region
+
+
+def save_animation(grid, path, steps_per_frame=None, frame_ms=40):
+    """Carve a maze from grid and save the carving as an animation.
+
+    kwargs:
+    steps_per_frame - carving steps shown by each frame. the default gives
+                      about 100 frames
+    frame_ms - how long each frame is shown
+
+    returns: the finished maze
+
+    note: a path ending with .gif is saved as a GIF. Anything else is saved
+          as an animated PNG.
+    """
+    maze = Maze(grid, carve=False)
+    if steps_per_frame is None:
+        # about one shape and one edge event for each shape
+        steps_per_frame = max(1, 2 * len(grid._shapes) // _DEFAULT_FRAME_COUNT)
+    frames = _frames(maze, steps_per_frame)
+    if path.lower().endswith('.gif'):
+        _save_gif(path, frames, frame_ms)
+    else:
+        with open(path, 'wb') as f:
+            _write_apng(f, frames, frame_ms)
+    return maze
+
+
+def _frames(maze, steps_per_frame):
+    """Carve maze and generate (image, box) for each frame.
+
+    The first box is None (the whole image). Each later box is the
+    (left, top, right, bottom) region that was redrawn.
+
+    note: the same image is updated in place for every frame
+    """
+    steps = maze.carve_steps()
+    for kind, _ in steps:
+        if kind == 'start':
+            break  # the grid is ready to draw
+    canvas = _Canvas(maze._viz)
+    yield canvas.image, None
+    grid = maze._grid
+    dirty = set()
+    step_count = 0
+    for kind, item in steps:
+        if kind == 'shape':
+            dirty.add(item.index())
+        elif kind == 'edge':
+            # both sides of an edge show the change
+            for index in (item._neighbor_1_index, item._neighbor_2_index):
+                if index in grid._shapes:
+                    dirty.add(index)
+        else:
+            continue
+        step_count += 1
+        if step_count == steps_per_frame:
+            yield canvas.image, canvas.redraw(dirty)
+            dirty = set()
+            step_count = 0
+    if dirty:
+        yield canvas.image, canvas.redraw(dirty)
+
+
+class _Canvas(object):
+    """The image of a grid that redraws only the regions that change."""
+    def __init__(self, viz):
+        self._viz = viz
+        frame = viz.frame()
+        self.image = PIL.Image.new('RGBA', frame.size)
+        shapes = list(viz.grid.shapes())
+        # the geometry never changes so keep the pixels of each shape and
+        # bucket the shapes by area so nearby shapes can be found quickly
+        margin = viz.EDGE_WIDTH
+        self._shapes = list()
+        self._boxes = dict()
+        self._buckets = dict()
+        for order, shape in enumerate(shapes):
+            points = viz.shape_points(frame, shape)
+            # walls are drawn from the shape that owns them like a full image
+            edge_data = shape._edge_data
+            lines = [(edge, frame.point(edge_data[n_index]['counter_vertex']),
+                      frame.point(edge_data[n_index]['clock_vertex']))
+                     for n_index, edge in shape._owned_edges.items()]
+            self._shapes.append((shape, points, lines))
+            box = (min(x for x, _ in points) - margin,
+                   min(y for _, y in points) - margin,
+                   max(x for x, _ in points) + margin + 1,
+                   max(y for _, y in points) + margin + 1)
+            self._boxes[shape.index()] = box
+            for bucket in _buckets(box):
+                self._buckets.setdefault(bucket, list()).append(order)
+        self._draw(self.image, (0, 0), self._shapes)
+
+    def redraw(self, indexes):
+        """Redraw the region covering the shapes at indexes.
+
+        Every shape that reaches into the region is redrawn in the same order
+        as a full image so the result is identical to redrawing everything.
+
+        returns: the (left, top, right, bottom) box that was redrawn
+        """
+        boxes = [self._boxes[index] for index in indexes]
+        width, height = self.image.size
+        left = max(0, min(b[0] for b in boxes))
+        top = max(0, min(b[1] for b in boxes))
+        right = min(width, max(b[2] for b in boxes))
+        bottom = min(height, max(b[3] for b in boxes))
+        nearby = set()
+        for bucket in _buckets((left, top, right, bottom)):
+            nearby.update(self._buckets.get(bucket, ()))
+        nearby = [self._shapes[order] for order in sorted(nearby)]
+        # draw the nearby shapes whole and crop the region out of them since
+        # PIL draws wide lines a little differently where they leave an image
+        boxes = [self._boxes[shape.index()] for shape, _, _ in nearby]
+        area_left = min(b[0] for b in boxes)
+        area_top = min(b[1] for b in boxes)
+        area = PIL.Image.new('RGBA', (max(b[2] for b in boxes) - area_left,
+                                      max(b[3] for b in boxes) - area_top))
+        self._draw(area, (area_left, area_top), nearby)
+        region = area.crop((left - area_left, top - area_top,
+                            right - area_left, bottom - area_top))
+        self.image.paste(region, (left, top))
+        return left, top, right, bottom
+
+    def _draw(self, image, offset, shapes):
+        """Draw shapes (and the walls they own) on image placed at offset."""
+        viz = self._viz
+        left, top = offset
+        drawer = PIL.ImageDraw.Draw(image)
+        # color spaces before other parts just like a full image
+        for shape, points, _ in shapes:
+            drawer.polygon([(x - left, y - top) for x, y in points],
+                           fill=viz.get_shape_style(shape)['color'])
+        for _, _, lines in shapes:
+            for edge, (x_a, y_a), (x_b, y_b) in lines:
+                color = viz.get_edge_style(edge)['color']
+                if color[3] == viz.TRANSPARENT:
+                    continue
+                drawer.line(((x_a - left, y_a - top), (x_b - left, y_b - top)),
+                            fill=color, width=viz.EDGE_WIDTH)
+
+
+def _buckets(box):
+    """Generate the keys of all buckets that box overlaps."""
+    left, top, right, bottom = box
+    for row in range(top // _BUCKET_PX, (bottom - 1) // _BUCKET_PX + 1):
+        for col in range(left // _BUCKET_PX, (right - 1) // _BUCKET_PX + 1):
+            yield row, col
+
+
+def _save_gif(path, frames, frame_ms):
+    """Save frames as a GIF. PIL stores only the difference of each frame.
+
+    note: frames are given to PIL one at a time (PIL copies each one as it
+          goes) but PIL still holds all of them until the end (see above)
+    """
+    frames = iter(frames)
+    first, _ = next(frames)
+    first.copy().save(path, save_all=True,
+                      append_images=(image for image, _ in frames),
+                      duration=frame_ms, loop=0)
+
+
+def _write_apng(f, frames, frame_ms):
+    """Stream frames to the file f as an animated PNG.
+
+    The first frame is the whole image. Later frames only hold the region
+    that changed and are drawn over the previous frame.
+
+    note: f must be seekable since the frame count is written at the end
+    """
+    f.write(png.SIGNATURE)
+    sequence = 0
+    frame_count = 0
+    actl_position = None
+    for image, box in frames:
+        if box is None:
+            box = (0, 0) + image.size
+            f.write(png.header(image.size))
+            actl_position = f.tell()
+            f.write(png.chunk(b'acTL', struct.pack('>II', 0, 0)))
+        left, top, right, bottom = box
+        # region replaces the previous pixels and stays for the next frame
+        f.write(png.chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', sequence, right - left, bottom - top, left, top,
+            frame_ms, 1000, 0, 0)))
+        sequence += 1
+        data = png.image_data(image.crop(box))
+        if frame_count == 0:
+            f.write(png.chunk(b'IDAT', data))
+        else:
+            f.write(png.chunk(b'fdAT', struct.pack('>I', sequence) + data))
+            sequence += 1
+        frame_count += 1
+    f.write(png.chunk(b'IEND', b''))
+    # now the number of frames is known
+    end_position = f.tell()
+    f.seek(actl_position)
+    f.write(png.chunk(b'acTL', struct.pack('>II', frame_count, 0)))
+    f.seek(end_position)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,109 @@
+"""Run many items through a sequence of stages with the stages overlapped."""
+import threading
+import time
+
+# silly workaround to allow py2 or py3
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+_DONE = object()  # end of the items for a stage
+# cpu time of the current thread leaves out time spent waiting for the GIL
+_thread_time = getattr(time, 'thread_time', time.time)
+
+
+def pipeline(items, stages, queue_size=2):
+    """Run each item through all stages with each stage in its own threads.
+
+    While the first stage works on item N, the next stage can work on item
+    N - 1 and so on. Stages that spend their time outside of python (e.g.
+    zlib, file writing) run truly in parallel with the others.
+
+    arguments:
+    items - iterable of inputs for the first stage
+    stages - sequence of (name, function, thread count). the result of each
+             stage is the input of the next stage
+
+    kwargs:
+    queue_size - most items waiting in front of each stage. limits memory
+                 when an early stage is faster than a later one
+
+    returns: results of the last stage (in the order of items),
+             {'items': count, 'elapsed': seconds,
+              'busy': {stage name: seconds spent on items, ...},
+              'cpu': {stage name: cpu seconds spent on items, ...},
+              'overlap': busy total / elapsed (1.0 means no overlap)}
+
+    note: busy includes waiting for I/O and for other threads to release
+          the GIL. cpu shows how much work really ran in parallel
+
+    note: the first exception raised by any stage is raised again here
+          after all threads are finished
+    """
+    inboxes = [queue.Queue(maxsize=queue_size) for _ in stages]
+    busy = dict((name, 0.0) for name, _, _ in stages)
+    cpu = dict(busy)
+    results = dict()
+    errors = list()
+    lock = threading.Lock()
+
+    def work(name, function, inbox, outbox):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)  # for the other threads of this stage
+                return
+            if errors:
+                continue  # keep emptying the queue so no stage is blocked
+            index, value = item
+            start = time.time()
+            start_cpu = _thread_time()
+            try:
+                value = function(value)
+            except Exception as e:
+                errors.append(e)
+                continue
+            with lock:
+                busy[name] += time.time() - start
+                cpu[name] += _thread_time() - start_cpu
+            if outbox is None:
+                results[index] = value
+            else:
+                outbox.put((index, value))
+
+    stage_threads = list()
+    for i, (name, function, thread_count) in enumerate(stages):
+        outbox = inboxes[i + 1] if i + 1 < len(stages) else None
+        threads = [threading.Thread(target=work,
+                                    args=(name, function, inboxes[i], outbox))
+                   for _ in range(thread_count)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        stage_threads.append(threads)
+    start = time.time()
+    count = 0
+    for count, item in enumerate(items, 1):
+        if errors:
+            break
+        inboxes[0].put((count - 1, item))
+    # finish each stage before telling the next one that items are done
+    for i, threads in enumerate(stage_threads):
+        inboxes[i].put(_DONE)
+        for thread in threads:
+            thread.join()
+    elapsed = time.time() - start
+    if errors:
+        raise errors[0]
+    report = {'items': count,
+              'elapsed': elapsed,
+              'busy': busy,
+              'cpu': cpu,
+              'overlap': sum(busy.values()) / elapsed if elapsed else 1.0}
+    return [results[i] for i in sorted(results)], report
+
+
+if __name__ == '__main__':
+    pass
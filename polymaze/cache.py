@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+_DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_replace = getattr(os, 'replace', os.rename)  # atomic overwrite when possible
+
+
+def cache_key(**params):
+    """Return a content hash of all parameters that define a maze or render.
+
+    note: image_path is replaced by the content of the file and any bytes
+          values are hashed so identical sources give identical keys
+    """
+    digest = hashlib.sha256()
+    for name in sorted(params):
+        value = params[name]
+        if (name == 'image_path') and (value is not None):
+            with open(value, 'rb') as f:
+                value = f.read()
+        if isinstance(value, bytes):
+            value = hashlib.sha256(value).hexdigest()
+        digest.update(json.dumps([name, value]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MazeCache(object):
+    """Size-bounded, least recently used cache of mazes and renders on disk."""
+    def __init__(self, directory, max_bytes=None):
+        """Use (or create) directory for the cache.
+
+        kwargs:
+        max_bytes - oldest entries are removed when the total is larger
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes or _DEFAULT_MAX_BYTES
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+        self._size = sum(size for _, _, size in self._entries())
+
+    def get(self, key, kind):
+        """Return the cached bytes of kind (e.g. 'png') for key or None."""
+        path = self._path(key, kind)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return None
+        self._touch(path)
+        return data
+
+    def put(self, key, kind, data):
+        """Store the bytes of kind for key and evict old entries if needed."""
+        path = self._path(key, kind)
+        # write to a temporary file first so readers never see partial data
+        handle, temp_path = tempfile.mkstemp(dir=self._directory,
+                                             suffix='.tmp')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        try:
+            self._size -= os.path.getsize(path)  # replacing an old entry
+        except OSError:
+            pass
+        _replace(temp_path, path)
+        self._size += len(data)
+        self._evict()
+
+    def get_maze(self, key):
+        """Return the cached maze for key (memory-mapped) or None."""
+        from . import storage  # imported here since shapes use the cache
+        path = self._path(key, 'maze')
+        try:
+            maze = storage.load(path)
+        except (IOError, OSError, ValueError):
+            return None  # not cached (or removed by another process)
+        self._touch(path)
+        return maze
+
+    def put_maze(self, key, maze):
+        from . import storage
+        self.put(key, 'maze', storage.dumps(maze))
+
+    def _path(self, key, kind):
+        return os.path.join(self._directory, '{}.{}'.format(key, kind))
+
+    def _touch(self, path):
+        """Mark path as recently used."""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass  # evicted by another process. still fine for this read
+
+    def _entries(self):
+        """Return (last used time, path, size) of all cache entries."""
+        entries = list()
+        for name in os.listdir(self._directory):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self._directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Remove the least recently used entries until under max_bytes."""
+        if self._size <= self._max_bytes:
+            return
+        entries = sorted(self._entries())
+        # other processes may share the directory so recount from disk
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # in use (windows) or already removed
+            self._size -= size
+
+
+if __name__ == '__main__':
+    pass
@@ -1,79 +1,279 @@
 #! /usr/bin/python
 import argparse
 from datetime import datetime
+import io
+import random
 import sys
 
 import PIL.Image
 
-from .polygrid import PolyGrid
+from .batch import pipeline
+from .cache import MazeCache, cache_key
+from .pages import PAGE_SIZES
+from .polygrid import PolyGrid, PolyViz
 from .shapes import supershapes_dict
 from .maze import Maze
+from .tracing import ChromeTracer, set_tracer, traced
 
 
 ss_dict = supershapes_dict()
 
 
-def commandline():
+def commandline(args=None):
+    args = sys.argv[1:] if args is None else args
+    if args[:1] == ['serve']:
+        # imported here since the server uses this module
+        from .server import commandline as serve_commandline
+        serve_commandline(args[1:])
+        return
     parser = _parser()
-    kwargs = vars(parser.parse_args())
-    # setup the base grid with a supershape if provided
-    grid = PolyGrid(supershape=ss_dict.get(kwargs.pop('shape'), None))
-
+    kwargs = vars(parser.parse_args(args))
     # pull off non-common parameters
-    text = kwargs.pop('text')
-    if text is not None:
-        text = text.decode(sys.stdin.encoding)
-    image_path = kwargs.pop('image')
-    if image_path is not None:
-        image_path = image_path.decode(sys.stdin.encoding)
-    font_path = kwargs.pop('font')
-    if font_path is not None:
-        font_path = font_path.decode(sys.stdin.encoding)
-    filename = kwargs.pop('output')
-    if filename is not None:
-        filename = filename.decode(sys.stdin.encoding)
+    text = _decoded(kwargs.pop('text'))
+    image_path = _decoded(kwargs.pop('image'))
+    font_path = _decoded(kwargs.pop('font'))
+    filename = _decoded(kwargs.pop('output'))
+    cache_directory = _decoded(kwargs.pop('cache'))
+    count = kwargs.pop('count')
+    trace_path = _decoded(kwargs.pop('trace'))
+    page_size, dpi = kwargs.pop('pages'), kwargs.pop('dpi')
+    if page_size and count > 1:
+        parser.error('--pages only works with one maze')
+    cache = MazeCache(cache_directory) if cache_directory else None
 
     # fill the grid and create maze based on the remaining arguments provided
+    params = dict(kwargs, text=text, image_path=image_path,
+                  font_path=font_path)
+    maze_type = _maze_type(text, image_path)
+    tracer = ChromeTracer() if trace_path else None
+    previous_tracer = set_tracer(tracer) if tracer else None
+    try:
+        if count > 1:
+            report = make_and_save_mazes(count, maze_type, filename,
+                                         cache=cache, **params)
+            print(_report_text(report))
+        else:
+            maze = make_maze(cache=cache, **params)
+            if page_size:
+                save_maze_pages(maze, maze_type, filename, page_size, dpi)
+            else:
+                save_maze(maze, maze_type, filename, cache=cache,
+                          cache_params=params)
+    finally:
+        if tracer is not None:
+            set_tracer(previous_tracer)
+            tracer.save(trace_path)
+            print(u'Saved trace {}'.format(trace_path))
+
+
+def make_maze(text=None, image_path=None, shape=None, font_path=None,
+              seed=None, cache=None, processes=None, tile_size=None,
+              progress=None, cancel=None, **kwargs):
+    """Return a maze made from text, an image or a plain rectangle.
+
+    kwargs:
+    text - make a maze inside the characters of text
+    image_path - make a maze from the dark parts of this image
+    shape - name of the supershape to use (random if not provided)
+    font_path - font for text mazes
+    seed - seed for the random generator (required for caching)
+    cache - a MazeCache that is consulted before any grid work happens
+    processes, tile_size - see Maze
+    progress, cancel - report and stop the 'grid' and 'carve' phases
+                       (see progress)
+    complexity, width, height, aspect - see PolyGrid.create_from_image
+    """
+    key = None
+    if (cache is not None) and (seed is not None):
+        # the number of processes doesn't change the result but carving each
+        # region in a pool (seeded separately) does. tiles ignore processes
+        parallel = (tile_size is None) and (processes or 0) > 1
+        key = cache_key(text=text, image_path=image_path, shape=shape,
+                        font_path=font_path, seed=seed, tile_size=tile_size,
+                        parallel=parallel, **kwargs)
+        maze = cache.get_maze(key)
+        if maze is not None:
+            return maze
+    if seed is not None:
+        random.seed(seed)
+    grid = _make_grid(text, image_path, shape, font_path, progress=progress,
+                      cancel=cancel, **kwargs)
+    maze = Maze(grid, processes=processes, tile_size=tile_size,
+                progress=progress, cancel=cancel)
+    if key is not None:
+        cache.put_maze(key, maze)
+    return maze
+
+
+def _make_grid(text=None, image_path=None, shape=None, font_path=None,
+               **kwargs):
+    """Return the grid for a maze (see make_maze)."""
+    # setup the base grid with a supershape if provided
+    grid = PolyGrid(supershape=ss_dict.get(shape, None))
     if text:
         grid.create_string(text, font_path=font_path, **kwargs)
-        maze_type = 'Text'
     elif image_path:
         image = PIL.Image.open(image_path).convert('L')
-        if not image:
-            print('Unable to open the provided image path: {}'
-                  ''.format(image_path))
         grid.create_from_image(image, **kwargs)
-        maze_type = 'Image'
     else:
         grid.create_rectangle(**kwargs)
-        maze_type = 'Rectangle'
+    return grid
+
+
+def _save_attributes(maze, maze_type, filename=None, cache=None,
+                     cache_params=None):
+    """Return the tracing attributes of a save_maze call."""
+    return {'maze_type': maze_type, 'supershape': maze.shape_name(),
+            'cache': cache is not None}
 
-    maze = Maze(grid)
-    save_maze(maze, maze_type, filename)
 
+@traced('cli.save_maze', _save_attributes)
+def save_maze(maze, maze_type, filename=None, cache=None, cache_params=None):
+    """Save maze as a png.
 
-def save_maze(maze, maze_type, filename=None):
-    image = maze.image()
-    if image is None:
+    kwargs:
+    cache - a MazeCache to get / store the encoded png
+    cache_params - the make_maze parameters that identify maze in the cache
+    """
+    key, png = _cached_png(cache, cache_params)
+    if png is None:
+        image = maze.image(keep=False)
+        if image is None:
+            print('This maze appears to be empty. Not saving.')
+            return
+        png = _encoded_png(image, cache, key)
+    _write_png(png, _png_filename(filename, maze_type, maze))
+
+
+def save_maze_pages(maze, maze_type, filename=None, page_size='A4',
+                    dpi=150):
+    """Save maze as a PDF with pages of page_size (see pages.save_pages)."""
+    filename = _png_filename(filename, maze_type, maze) + '.pdf'
+    report = maze.save_pages(filename, page_size=page_size, dpi=dpi)
+    if report is None:
         print('This maze appears to be empty. Not saving.')
-    else:
-        now_str = str(datetime.now().time())
-        clean_now_string = now_str.replace(':', '.').rsplit('.', 1)[0]
-        if filename is None:
-            filename = '{} - {} made with {}'.format(clean_now_string,
-                                                     maze_type,
-                                                     maze.shape_name())
-        # force png... for your own good! png works well with this type
-        # of image, lossless AND smaller file size than jpg.
-        # If this is ever updated to work with original images remaining
-        # in the background of the maze, then jpg might make sense.
-        filename += '.png'
-        image.save(filename)
-        print(u'Saved {}'.format(filename))
+        return
+    print(u'Saved {} ({} x {} pages)'.format(filename, report['columns'],
+                                             report['rows']))
+
+
+def make_and_save_mazes(count, maze_type, filename=None, cache=None,
+                        encoders=2, **params):
+    """Make and save count mazes with generation, rendering and saving overlapped.
+
+    Maze N + 1 is generated while maze N is rendered and maze N - 1 is
+    encoded and written. With a seed, maze i is made with seed + i.
+
+    kwargs:
+    filename - each maze is saved as "filename i" (timestamped if not given)
+    cache - see make_maze and save_maze
+    encoders - threads that encode and write the pngs
+    params - see make_maze
+
+    returns: the report of batch.pipeline
+    """
+    seed = params.pop('seed', None)
+
+    def generate(i):
+        maze_params = dict(params, seed=None if seed is None else seed + i)
+        return i, maze_params, make_maze(cache=cache, **maze_params)
+
+    def render(made):
+        i, maze_params, maze = made
+        key, png = _cached_png(cache, maze_params)
+        image = maze.image(keep=False) if png is None else None
+        return i, maze, key, png, image
+
+    def encode_and_write(rendered):
+        i, maze, key, png, image = rendered
+        if png is None:
+            if image is None:
+                print('Maze {} appears to be empty. Not saving.'.format(i + 1))
+                return
+            png = _encoded_png(image, cache, key)
+        name = _png_filename(filename, maze_type, maze)
+        _write_png(png, u'{} {}'.format(name, i + 1))
+
+    stages = (('generate', generate, 1),  # one thread keeps seeds repeatable
+              ('render', render, 1),
+              ('encode', encode_and_write, encoders))
+    _, report = pipeline(range(count), stages)
+    return report
+
+
+def _cached_png(cache=None, cache_params=None):
+    """Return (cache key or None, cached png bytes or None)."""
+    seeded = bool(cache_params) and (cache_params.get('seed') is not None)
+    if (cache is None) or not seeded:
+        return None, None
+    key = cache_key(kind='png', scale=PolyViz.PX_PER_GRAPH_UNIT,
+                    **cache_params)
+    return key, cache.get(key, 'png')
+
+
+def _encoded_png(image, cache=None, key=None):
+    """Return image encoded as png bytes and store it in cache under key."""
+    encoded = io.BytesIO()
+    image.save(encoded, format='PNG')
+    png = encoded.getvalue()
+    if key is not None:
+        cache.put(key, 'png', png)
+    return png
+
+
+def _png_filename(filename, maze_type, maze):
+    """Return filename or a timestamped description of maze (no extension)."""
+    if filename is not None:
+        return filename
+    now_str = str(datetime.now().time())
+    clean_now_string = now_str.replace(':', '.').rsplit('.', 1)[0]
+    return '{} - {} made with {}'.format(clean_now_string, maze_type,
+                                         maze.shape_name())
+
+
+def _write_png(png, filename):
+    # force png... for your own good! png works well with this type
+    # of image, lossless AND smaller file size than jpg.
+    # If this is ever updated to work with original images remaining
+    # in the background of the maze, then jpg might make sense.
+    filename += '.png'
+    with open(filename, 'wb') as f:
+        f.write(png)
+    print(u'Saved {}'.format(filename))
+
+
+def _report_text(report):
+    """Return a summary of a batch.pipeline report."""
+    cpu = report['cpu']
+    stages = ', '.join('{} {:.2f}s'.format(name, cpu[name])
+                       for name in ('generate', 'render', 'encode'))
+    return ('Made {} mazes in {:.2f}s.\n'
+            'CPU work by stage: {}.\n'
+            '{:.2f}s of work in {:.2f}s is {:.2f}x of one CPU.'
+            ''.format(report['items'], report['elapsed'], stages,
+                      sum(cpu.values()), report['elapsed'],
+                      sum(cpu.values()) / report['elapsed']))
+
+
+def _maze_type(text=None, image_path=None):
+    if text:
+        return 'Text'
+    elif image_path:
+        return 'Image'
+    return 'Rectangle'
+
+
+def _decoded(value):
+    """Return value as text (py2 provides commandline args as bytes)."""
+    if isinstance(value, bytes):
+        return value.decode(sys.stdin.encoding)
+    return value
 
 
 def _parser():
-    parser = argparse.ArgumentParser(description='Make and save mazes.')
+    parser = argparse.ArgumentParser(description='Make and save mazes.'
+                                     ' Use "polymaze serve" to serve mazes'
+                                     ' over HTTP.')
     # optional top level type of maze to make
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-t', '--text',
@@ -104,6 +304,23 @@ def _parser():
                         help='Provide a font path for text mazes.')
     parser.add_argument('-o', '--output', type=str,
                         help='Output filename. The format will always be PNG.')
+    parser.add_argument('--seed', type=int,
+                        help='Seed for the random generator. The same seed'
+                             ' and options always make the same maze.')
+    parser.add_argument('--cache', type=str,
+                        help='Directory for caching mazes and images made'
+                             ' with a seed.')
+    parser.add_argument('-n', '--count', type=_count, default=1,
+                        help='Make COUNT mazes. Making, drawing and saving'
+                             ' overlap. With --seed, maze i uses seed + i.')
+    parser.add_argument('--pages', choices=sorted(PAGE_SIZES),
+                        help='Save a PDF for printing across pages of this'
+                             ' size instead of a PNG.')
+    parser.add_argument('--dpi', type=_count, default=150,
+                        help='Printed pixels per inch with --pages.')
+    parser.add_argument('--trace', type=str,
+                        help='Save a Chrome trace (JSON) of the steps to'
+                             ' TRACE. Open it in chrome://tracing.')
     return parser
 
 
@@ -117,5 +334,15 @@ def _positive(v):
     return number
 
 
+def _count(v):
+    try:
+        number = int(v)
+    except Exception:
+        raise argparse.ArgumentTypeError('{} is not a valid count'.format(v))
+    if number < 1:
+        raise argparse.ArgumentTypeError('{} must be at least 1'.format(number))
+    return number
+
+
 if __name__ == '__main__':
     commandline()
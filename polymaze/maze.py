@@ -1,33 +1,107 @@
+from array import array
 from collections import deque
 import random
 
-from .polygrid import PolyViz
+import PIL.ImageDraw
+
+from . import pages as _pages
+from . import plot as _plot
+from . import progress as _progress
+from . import tracing as _tracing
+from .polygrid import PolyGrid, PolyViz, _UnionFind, _csr, _map_jobs
+from .solver import Solver
+from .validator import validate
+
+
+def _create_attributes(maze, grid, processes=None, tile_size=None, carve=True,
+                       **kwargs):
+    """Return the tracing attributes of a Maze construction."""
+    return {'supershape': grid.supershape_name(),
+            'shape_count': len(grid._shapes), 'processes': processes,
+            'tile_size': tile_size, 'carve': carve}
+
+
+def _created_attributes(result, maze, *args, **kwargs):
+    return {'regions': len(maze._entrance_exit_pairs)}
+
+
+def _image_attributes(maze, *args, **kwargs):
+    """Return the tracing attributes of a Maze.image call."""
+    return {'supershape': maze.shape_name(),
+            'cached': maze._base_is_current()}
 
 
 class Maze(object):
     """A maze based on a shape pattern."""
-    def __init__(self, grid):
-        """Create a maze from a grid of shapes."""
+    # styles for the shapes
+    _FLOOR_STYLE = '<< floor >>'
+    _ENTRANCE_STYLE = '<< entrance >>'
+    _EXIT_STYLE = '<< exit >>'
+    # styles for the edges
+    _WALL_STYLE = '<< wall >>'
+    _PATH_STYLE = '<< path >>'
+
+    @_tracing.traced('maze.create', _create_attributes, _created_attributes)
+    def __init__(self, grid, processes=None, tile_size=None, carve=True,
+                 progress=None, cancel=None):
+        """Create a maze from a grid of shapes.
+
+        kwargs:
+        processes - when more than 1, mazify each region of connected shapes
+                    independently in a pool of this many worker processes
+        tile_size - (rows, cols) to split the grid into tiles which are
+                    mazified independently and then stitched together.
+                    sizes are rounded up to whole supershapes.
+        carve - when False, leave the grid as it is so it can be carved one
+                step at a time with carve_steps()
+        progress, cancel - report and stop the 'carve' phase (see progress)
+        """
+        self._setup(grid)
+        if not carve:
+            entrance_exit_pairs = ()
+        elif tile_size is not None:
+            entrance_exit_pairs = self._mazify_grid_tiled(tile_size, processes,
+                                                          progress, cancel)
+        elif processes is not None and processes > 1:
+            entrance_exit_pairs = self._mazify_grid_parallel(processes,
+                                                             progress, cancel)
+        else:
+            entrance_exit_pairs = self._mazify_grid(progress, cancel)
+        self._entrance_exit_pairs = tuple(entrance_exit_pairs)
+
+    @classmethod
+    def _from_carved_grid(cls, grid, entrance_exit_pairs):
+        """Return a maze for a grid that already has the maze styles."""
+        maze = cls.__new__(cls)
+        maze._setup(grid)
+        maze._entrance_exit_pairs = tuple(entrance_exit_pairs)
+        return maze
+
+    def _setup(self, grid):
+        """Link the grid and create the visual styles."""
         self._grid = grid
         self._viz = PolyViz(self._grid)
-        # create styles for the shapes
-        self._FLOOR_STYLE = '<< floor >>'
-        self._ENTRANCE_STYLE = '<< entrance >>'
-        self._EXIT_STYLE = '<< exit >>'
         white = (255, 255, 255, 255)
         light_red = (255, 128, 128, 255)
         light_green = (128, 255, 128, 255)
         self._viz.new_shape_style(self._FLOOR_STYLE, color=white)
         self._viz.new_shape_style(self._ENTRANCE_STYLE, color=light_green)
         self._viz.new_shape_style(self._EXIT_STYLE, color=light_red)
-        # create styles for the edges
-        self._WALL_STYLE = '<< wall >>'
-        self._PATH_STYLE = '<< path >>'
         black = (0, 0, 0, 255)
         transparent = (255, 255, 255, 0)
         self._viz.new_edge_style(self._WALL_STYLE, color=black)
         self._viz.new_edge_style(self._PATH_STYLE, color=transparent)
-        self._entrance_exit_pairs = tuple(self._mazify_grid())
+        self._base_render = None  # (image, frame) until anything changes
+        self._base_changes = None  # changes of grid and viz when rendered
+
+    def __reduce__(self):
+        """Pickle as the packed arrays of the storage format.
+
+        Only the indexes, passages and in/out pairs are sent and the shapes
+        are created lazily after unpickling. (see storage)
+        """
+        from . import storage  # storage depends on this module
+        return storage.loads, (storage.dumps(self),)
 
     def shape_name(self):
         return self._grid.supershape_name()
@@ -35,39 +109,253 @@ class Maze(object):
     def entrance_exit_pairs(self):
         return self._entrance_exit_pairs
 
-    def _mazify_grid(self):
+    def passages_csr(self, use_numpy=True):
+        """Return the carved passages as compressed sparse rows.
+
+        Same format as PolyGrid.to_csr() but only neighbors connected by a
+        passage are included.
+        """
+        return _csr(self._grid, edge_style=self._PATH_STYLE,
+                    use_numpy=use_numpy)
+
+    def solutions(self, method='bfs'):
+        """Return the entrance to exit path (shape indexes) of each pair."""
+        return Solver(self).solutions(method=method)
+
+    def metrics(self):
+        """Return difficulty metrics (solution length, dead ends, etc.)."""
+        return Solver(self).metrics()
+
+    def validate(self):
+        """Return a report on whether each region is a perfect maze."""
+        return validate(self)
+
+    def carve_steps(self):
+        """Carve the maze one step at a time (e.g. to animate the carving).
+
+        The in/out pairs are available when the generator is exhausted.
+
+        returns: generator of (kind, item) events:
+            ('start', None) - all walls are up and isolated shapes removed
+            ('shape', shape) - the style of shape changed
+            ('edge', edge) - a wall was broken down to make a path
+            ('pair', (entrance, exit)) - a region of shapes is complete
+        """
+        entrance_exit_pairs = list()
+        for event in self._mazify_grid_steps():
+            if event[0] == 'pair':
+                entrance_exit_pairs.append(event[1])
+            yield event
+        self._entrance_exit_pairs = tuple(entrance_exit_pairs)
+
+    def _mazify_grid(self, progress=None, cancel=None):
         """Mazify and generate in/out pairs for each connected set of shapes."""
+        tracker = None
+        carved = 0
+        for kind, item in self._mazify_grid_steps():
+            if kind == 'pair':
+                yield item
+            elif kind == 'start':
+                tracker = _progress.tracker('carve', len(self._grid._shapes),
+                                            progress, cancel)
+                if tracker is not None:
+                    tracker.update(0)
+            elif (kind == 'shape') and (tracker is not None):
+                carved += 1
+                tracker.update(carved)
+        if tracker is not None:
+            tracker.finish()
+
+    def _mazify_grid_steps(self):
+        """Mazify and generate the carving events (see carve_steps)."""
         # Set the edges of all spaces to wall status
         for edge in self._grid.edges():
             edge.viz_style = self._WALL_STYLE
         # get a list of all border shapes which is useful in several places
-        border_spaces = deque(self._grid.border_shapes())
-        random.shuffle(border_spaces)  # randomize to remove patterns
+        shuffled_spaces = list(self._grid.border_shapes())
+        random.shuffle(shuffled_spaces)  # randomize to remove patterns
+        # eliminate isolated single shapes (common on borders) up front
+        # so every later step only changes styles
+        border_spaces = deque()
+        for border_space in shuffled_spaces:
+            if all(neighbor is None for n_index, neighbor
+                   in border_space.neighbors()):
+                self._grid.remove(border_space.index())
+            else:
+                border_spaces.append(border_space)
+        yield 'start', None
         # Loop to ensure that a maze is created for each area of
-        # connected shapes (except single shapes which occur on borders often).
+        # connected shapes.
         while border_spaces:
             border_space = border_spaces.pop()
-            if all(neighbor is None for n_index, neighbor
-                   in border_space.neighbors()):
+            if self._has_paths(border_space):
+                # this space has already been pathed as part of a maze so ignore
+                continue
+            for event in self._mazify_connected_shapes(border_space,
+                                                       border_spaces):
+                yield event
+
+    def _mazify_grid_parallel(self, processes, progress=None, cancel=None):
+        """Mazify each region of connected shapes in a pool of processes.
+
+        note: only the carving runs in the workers. Labelling the regions
+              (the largest part), sending them out and setting the style of
+              every edge stay in this process and are linear in the size of
+              the grid. For 37696 squares in 15 regions that is about 0.35 s
+              of about 2.5 s of work, so no number of workers can make it
+              more than about 7x faster.
+
+        returns: a list of in/out pairs (one for each region)
+        """
+        # label the regions up front so they can be mazified independently
+        jobs = list()
+        for region in self._grid.connected_regions():
+            if len(region) == 1:
                 # eliminate isolated single shapes
-                self._grid.remove(border_space.index())
+                self._grid.remove(region[0])
                 continue
-            elif self._has_paths(border_space):
-                # this space has already been pathed as part of a maze so ignore
+            # each job gets its own seed so workers don't share a random state
+            jobs.append((self._grid._supershape, region,
+                         random.getrandbits(32)))
+        if len(jobs) < 2:
+            # nothing to gain from a pool
+            return list(self._mazify_grid(progress, cancel))
+        random.shuffle(jobs)  # randomize to remove patterns
+        # Set the edges of all spaces to wall status
+        for edge in self._grid.edges():
+            edge.viz_style = self._WALL_STYLE
+        tracker = _progress.tracker('carve', len(self._grid._shapes),
+                                    progress, cancel)
+        carved = 0
+        entrance_exit_pairs = list()
+        results = _map_jobs(_mazify_region, jobs, processes)
+        for (_, region, _), result in zip(jobs, results):
+            if tracker is not None:
+                tracker.update(carved)
+            entrance_exit_pairs.append(self._carve_region(region, *result))
+            carved += len(region)
+        if tracker is not None:
+            tracker.finish()
+        return entrance_exit_pairs
+
+    def _mazify_grid_tiled(self, tile_size, processes=None, progress=None,
+                           cancel=None):
+        """Mazify tiles of the grid independently and stitch them together.
+
+        Each tile is carved into a spanning tree of each of its connected
+        pieces. Then exactly one seam wall is opened for each edge of a random
+        spanning tree over the pieces so every region is still a perfect maze.
+
+        returns: a list of in/out pairs (one for each region)
+        """
+        grid = self._grid
+        ss = grid._supershape
+        # align tiles with the supershape so no supershape is split
+        tile_rows, tile_cols = _align_tile_size(tile_size, ss.period())
+        tiles = dict()
+        for space in grid.shapes():
+            index = space.index()
+            row, col = index
+            tile_key = row // tile_rows, col // tile_cols
+            tiles.setdefault(tile_key, list()).append(index)
+        jobs = [(ss, indexes, random.getrandbits(32))
+                for indexes in tiles.values()]
+        # Set the edges of all spaces to wall status
+        for edge in grid.edges():
+            edge.viz_style = self._WALL_STYLE
+        # carve each tile and record which piece each shape belongs to
+        piece_ids = dict()
+        passages = list()
+        seams = list()
+        border_indexes = list()
+        piece_count = 0
+        tracker = _progress.tracker('carve', len(grid._shapes), progress,
+                                    cancel)
+        carved = 0
+        results = _map_jobs(_carve_tile, jobs, processes)
+        for (_, indexes, _), (pieces, tile_passages, outside) in zip(jobs,
+                                                                     results):
+            if tracker is not None:
+                tracker.update(carved)
+            carved += len(indexes)
+            for piece in pieces:
+                for index in piece:
+                    piece_ids[index] = piece_count
+                piece_count += 1
+            passages.extend(tile_passages)
+            for index, n_index in outside:
+                if n_index not in grid._shapes:
+                    border_indexes.append(index)
+                elif index < n_index:
+                    seams.append((index, n_index))  # one report per seam
+        # stitch the pieces with a random spanning tree (Kruskal)
+        piece_sets = _UnionFind(range(piece_count))
+        random.shuffle(seams)
+        for index, n_index in seams:
+            if piece_sets.union(piece_ids[index], piece_ids[n_index]):
+                passages.append((index, n_index))
+        # apply all the passages and build the tree for finding exits
+        tree = dict((index, list()) for index in piece_ids)
+        for index, n_index in passages:
+            grid.get(index).edge(n_index).viz_style = self._PATH_STYLE
+            tree[index].append(n_index)
+            tree[n_index].append(index)
+        for space in grid.shapes():
+            space.viz_style = self._FLOOR_STYLE
+        # group the border shapes of each region (set removes duplicates)
+        region_borders = dict()
+        for index in set(border_indexes):
+            root = piece_sets.find(piece_ids[index])
+            region_borders.setdefault(root, list()).append(index)
+        if tracker is not None:
+            tracker.finish()
+        entrance_exit_pairs = list()
+        for borders in region_borders.values():
+            if len(borders) == 1 and not tree[borders[0]]:
+                # eliminate isolated single shapes
+                grid.remove(borders[0])
                 continue
-            else:
-                pass  # couldn't eliminate this border so need to make a maze
-            entrance_exit = self._mazify_connected_shapes(border_space,
-                                                          border_spaces)
-            yield entrance_exit
+            entrance_index = random.choice(borders)
+            exit_index = _farthest(tree, entrance_index, borders)
+            entrance_exit_pairs.append(self._make_entrance_exit(
+                grid.get(entrance_index), grid.get(exit_index)))
+        return entrance_exit_pairs
+
+    def _carve_region(self, region, positions, slots, entrance_index,
+                      exit_index):
+        """Apply the passages carved by a worker to one region of the grid.
+
+        Passage i leaves the shape at region[positions[i]] through the edge
+        in its clockwise order at slots[i] (see _mazify_region).
+        """
+        grid = self._grid
+        shapes = grid._shapes
+        floor_style, path_style = self._FLOOR_STYLE, self._PATH_STYLE
+        for index in region:
+            shapes[index].viz_style = floor_style
+        for position, slot in zip(positions, slots):
+            shape = shapes[region[position]]
+            shape.edge(shape._ordered_n_indexes[slot]).viz_style = path_style
+        return self._make_entrance_exit(grid.get(entrance_index),
+                                        grid.get(exit_index))
+
+    def _make_entrance_exit(self, entrance_space, exit_space):
+        """Open the border walls and set the styles of an in/out pair."""
+        self._open_border_wall(entrance_space)
+        self._open_border_wall(exit_space)
+        entrance_space.viz_style = self._ENTRANCE_STYLE
+        exit_space.viz_style = self._EXIT_STYLE
+        return entrance_space, exit_space
 
     def _mazify_connected_shapes(self, entrance_space, border_spaces):
+        """Generate the carving events of a maze through connected shapes.
+
+        The last event is the ('pair', (entrance, exit)) of the new maze.
+        """
+        floor_style = self._FLOOR_STYLE
+        wall_style, path_style = self._WALL_STYLE, self._PATH_STYLE
         # break down one border wall to make the entrance
-        for n_index, neighbor in entrance_space.neighbors():
-            if neighbor is None:
-                edge = entrance_space.edge(n_index)
-                edge.viz_style = self._PATH_STYLE
-                break  # done after making the exit path
+        yield 'edge', self._open_border_wall(entrance_space)
         # setup the path creation mechanism
         current_path = deque()
         current_path.append(entrance_space)
@@ -79,10 +367,12 @@ class Maze(object):
         space = entrance_space
         while current_path:
             # mark the path with the floor style
-            space.viz_style = self._FLOOR_STYLE
+            if space.viz_style != floor_style:
+                space.viz_style = floor_style
+                yield 'shape', space
             # consider all walls leading to new neighbors in random order
             for n_index, edge in space.edges(randomize=True):
-                if edge.viz_style != self._WALL_STYLE:
+                if edge.viz_style != wall_style:
                     continue  # ignore pathed edges. just looking for walls
                 new_space = self._grid.get(n_index)
                 if new_space is None:
@@ -90,7 +380,8 @@ class Maze(object):
                     continue
                 if not self._has_paths(new_space):
                     # space that hasn't been pathed yet ==> continue the path
-                    edge.viz_style = self._PATH_STYLE  # break down that wall
+                    edge.viz_style = path_style  # break down that wall
+                    yield 'edge', edge
                     # track the best potential exit
                     new_len = len(current_path)
                     old_len = potential_exit_and_length[1]
@@ -110,18 +401,154 @@ class Maze(object):
         exit_space = potential_exit_and_length[0]
 
         # break down one border wall to make the exit
-        for n_index, neighbor in exit_space.neighbors():
-            if neighbor is None:
-                edge = exit_space.edge(n_index)
-                edge.viz_style = self._PATH_STYLE
-                break  # done after making the exit path
+        exit_edge = self._open_border_wall(exit_space)
+        if exit_space is not entrance_space:
+            yield 'edge', exit_edge
         # set the special case entrance and exit space styles
         entrance_space.viz_style = self._ENTRANCE_STYLE
+        yield 'shape', entrance_space
         exit_space.viz_style = self._EXIT_STYLE
-        return entrance_space, exit_space
+        yield 'shape', exit_space
+        yield 'pair', (entrance_space, exit_space)
+
+    def _open_border_wall(self, space):
+        """Break down the first border wall of space and return it."""
+        for n_index, neighbor in space.neighbors():
+            if neighbor is None:
+                edge = space.edge(n_index)
+                edge.viz_style = self._PATH_STYLE
+                return edge  # done after making one path
+        return None
+
+    @_tracing.traced('maze.image', _image_attributes)
+    def image(self, progress=None, cancel=None, keep=True):
+        """Return an image of the maze. None if the grid is empty.
+
+        kwargs:
+        progress, cancel - report and stop the 'render' phase (see progress)
+        keep - cache the render until the maze changes its styles so
+               repeated calls only copy it. False for callers that only
+               save the image so it is neither copied nor kept in memory
+        """
+        if not (keep or self._base_is_current()):
+            (image, _), = self._viz._images((None,), progress, cancel)
+            return image
+        image, _ = self._base(progress, cancel)
+        if image is None:
+            return None
+        return image.copy()
+
+    def solution_image(self, method='bfs'):
+        """Return an image of the maze with the solution of each pair drawn.
+
+        Only the shapes along each solution and the line through them are
+        drawn on a copy of the cached maze image.
+
+        returns: None if the grid is empty
+        """
+        base, frame = self._base()
+        if base is None:
+            return None
+        image = base.copy()
+        drawer = PIL.ImageDraw.Draw(image)
+        viz, grid = self._viz, self._grid
+        cell_color = (255, 240, 160, 255)
+        line_color = (0, 0, 255, 255)
+        for path in self.solutions(method=method):
+            if path is None:
+                continue
+            spaces = [grid.get(index) for index in path]
+            # color the shapes between entrance and exit and redraw their walls
+            viz.draw_shapes(drawer, frame, spaces[1:-1], color=cell_color)
+            edges = dict()
+            for space in spaces:
+                for _, edge in space.edges():
+                    edges[id(edge)] = edge
+            viz.draw_edges(drawer, frame, edges.values())
+            # connect the shape centers
+            centers = list()
+            for space in spaces:
+                points = viz.shape_points(frame, space)
+                centers.append((sum(x for x, _ in points) / len(points),
+                                sum(y for _, y in points) / len(points)))
+            if len(centers) > 1:
+                drawer.line(centers, fill=line_color,
+                            width=max(1, int(round(frame.scale / 10))))
+        return image
+
+    def svg(self):
+        """Return an SVG document (text) of the maze. None if the grid is empty."""
+        return self._viz.svg()
+
+    def plot(self, optimize=True):
+        """Return the walls as polylines ordered for a pen plotter or laser.
+
+        See plot.plan for the result and plot.svg / plot.hpgl to save it.
+        None if the grid is empty.
+        """
+        return _plot.plan(self._viz, optimize=optimize)
+
+    def save_png(self, f, processes=None, progress=None, cancel=None):
+        """Write the image of the maze to the file object f as a PNG.
+
+        The image is drawn and written in bands so huge mazes never need the
+        whole image in memory. (see PolyViz.save_png)
 
-    def image(self):
-        return self._viz.image()
+        returns: False if the grid is empty (nothing written) otherwise True
+        """
+        return self._viz.save_png(f, processes=processes, progress=progress,
+                                  cancel=cancel)
+
+    def save_pages(self, path, **kwargs):
+        """Save the maze across pages for printing (see pages.save_pages).
+
+        returns: None if the grid is empty (nothing written)
+        """
+        return _pages.save_pages(self._viz, path, **kwargs)
+
+    def preview(self, size):
+        """Return a quick image of the walls that fits in size (width, height).
+
+        returns: None if the grid is empty
+        """
+        return self._viz.preview(size)
+
+    def image_and_preview(self, size):
+        """Return the image and a preview (see preview) of the maze.
+
+        Both are made with one pass over the grid when the image is not
+        cached yet.
+        """
+        if self._base_is_current():
+            preview = self._viz.preview(size)
+        else:
+            self._base_render, (preview, _) = self._viz._images((None, size))
+            self._base_changes = self._changes()
+        return self.image(), preview
+
+    def invalidate(self):
+        """Forget the cached image.
+
+        Changes of shapes, styles of shapes and edges and new styles are
+        noticed without this. Use it after changing the contents of a style
+        (e.g. the dict from PolyViz.get_shape_style) in place.
+        """
+        self._base_render = self._base_changes = None
+
+    def _base(self, progress=None, cancel=None):
+        """Return the cached (image, frame) of the maze. (None, None) if empty."""
+        if not self._base_is_current():
+            self._base_render, = self._viz._images((None,), progress, cancel)
+            # after drawing since shapes of a loaded maze are made by drawing
+            self._base_changes = self._changes()
+        return self._base_render
+
+    def _base_is_current(self):
+        return (self._base_render is not None) and\
+            (self._base_changes == self._changes())
+
+    def _changes(self):
+        return self._grid._changes, self._viz._changes
 
     def _has_paths(self, new_space):
         """Return True if new_space has any edges as paths. False otherwise."""
@@ -132,5 +559,97 @@ class Maze(object):
         return False
 
 
+def _mazify_region(job):
+    """Mazify one region of connected shapes (in a worker process).
+
+    arguments:
+    job - supershape, indexes of one connected region, random seed
+
+    returns: positions in the region and clockwise edge slots of the
+             internal passages (compact arrays are cheap to send back),
+             entrance index, exit index
+    """
+    supershape, region, seed = job
+    random.seed(seed)
+    grid = PolyGrid(supershape=supershape)
+    for index in region:
+        grid.create(index)
+    maze = Maze(grid)
+    (entrance_space, exit_space), = maze.entrance_exit_pairs()
+    # only report passages between shapes. border openings are rebuilt
+    shapes = grid._shapes
+    positions, slots = array('i'), array('B')  # shapes have few edges
+    for position, index in enumerate(region):
+        shape = shapes[index]
+        owned_edges = shape._owned_edges
+        for slot, n_index in enumerate(shape._ordered_n_indexes):
+            edge = owned_edges.get(n_index)
+            if (edge is not None) and (edge.viz_style == maze._PATH_STYLE)\
+                    and (n_index in shapes):
+                positions.append(position)
+                slots.append(slot)
+    return positions, slots, entrance_space.index(), exit_space.index()
+
+
+def _carve_tile(job):
+    """Carve a spanning tree in each connected piece of one tile.
+
+    arguments:
+    job - supershape, indexes of one tile, random seed
+
+    returns: pieces as index lists, passages as index pairs and
+             (index, n_index) pairs for each neighbor outside of the tile
+    """
+    supershape, indexes, seed = job
+    rng = random.Random(seed)
+    members = set(indexes)
+    visited = set()
+    pieces, passages, outside = list(), list(), list()
+    for index in indexes:
+        for n_index in supershape.n_indexes(index):
+            if n_index not in members:
+                outside.append((index, n_index))
+    for start in indexes:
+        if start in visited:
+            continue
+        # randomized depth first search just like the full maze
+        visited.add(start)
+        piece = [start]
+        path = [start]
+        while path:
+            index = path[-1]
+            candidates = [n_index for n_index in supershape.n_indexes(index)
+                          if (n_index in members) and (n_index not in visited)]
+            if not candidates:
+                path.pop()  # no usable neighbors ==> back up one step
+                continue
+            n_index = rng.choice(candidates)
+            visited.add(n_index)
+            piece.append(n_index)
+            passages.append((index, n_index))
+            path.append(n_index)
+        pieces.append(piece)
+    return pieces, passages, outside
+
+
+def _align_tile_size(tile_size, period):
+    """Return tile_size rounded up to a whole number of periods."""
+    return tuple(int(-(-max(size, 1) // step) * step)
+                 for size, step in zip(tile_size, period))
+
+
+def _farthest(tree, start, candidates):
+    """Return the candidate with the longest path from start through tree."""
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        index = queue.popleft()
+        for n_index in tree[index]:
+            if n_index not in distances:
+                distances[n_index] = distances[index] + 1
+                queue.append(n_index)
+    return max(candidates, key=lambda index: distances.get(index, -1))
+
+
 if __name__ == '__main__':
     pass
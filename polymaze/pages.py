@@ -0,0 +1,202 @@
+"""Print a grid across many pages at a fixed DPI (e.g. posters).
+
+Each page is drawn on its own from the geometry of only the shapes and
+walls that reach into it, then written and forgotten. Pixels are only worked
+out for the page being drawn, so besides the geometry of the grid (in graph
+units) only a list of item numbers for each page is kept. The image memory
+is about one page no matter how big the whole image is. Pages overlap a
+little so they can be trimmed and taped together. They are numbered row by
+row from the top left.
+"""
+from array import array
+import math
+import os
+
+import PIL.Image
+import PIL.ImageDraw
+
+from . import pdf
+from . import progress as _progress
+
+
+PAGE_SIZES = {'A3': (11.69, 16.54),  # (width, height) in inches
+              'A4': (8.27, 11.69),
+              'Legal': (8.5, 14.0),
+              'Letter': (8.5, 11.0)}
+_WHITE = (255, 255, 255, 255)
+
+
+def save_pages(viz, path, page_size='A4', dpi=150, overlap=0.25, margin=0.25,
+               scale=None, columns=None, progress=None, cancel=None):
+    """Save the image of viz.grid split into pages.
+
+    arguments:
+    path - a .pdf file for one document or a .png path which is numbered
+           for each page (maze.png ==> maze-1.png, maze-2.png, ...)
+
+    kwargs:
+    page_size - name in PAGE_SIZES or (width, height) in inches
+    dpi - printed pixels per inch
+    overlap - inches repeated on the neighboring pages
+    margin - inches at the edges of each page that printers can not print
+    scale - printed pixels per unit of the grid (default like image())
+    columns - fit the width of the grid to this many pages (overrides scale)
+    progress, cancel - report and stop the 'render' phase per page
+
+    returns: None if the grid is empty. otherwise a dict with:
+        rows, columns - number of pages down and across
+        page_pixels - (width, height) of the printed part of each page
+        paths - the files written
+    """
+    if isinstance(page_size, str):
+        page_size = PAGE_SIZES[page_size]
+    page_pixels = tuple(int(round((inches - 2 * margin) * dpi))
+                        for inches in page_size)
+    overlap_pixels = int(round(overlap * dpi))
+    steps = [pixels - overlap_pixels for pixels in page_pixels]
+    if min(steps) < 1:
+        raise ValueError('The overlap and margins leave no room on a page.')
+    bounds, polygons, walls = viz._geometry(merge=False)  # keeps pages small
+    if bounds is None:
+        return None
+    if columns is not None:
+        frame = viz._fit(bounds, (columns * steps[0] + overlap_pixels,
+                                  float('inf')))
+    elif scale is not None:
+        frame = viz._fit(bounds, _scaled_size(bounds, scale))
+    else:
+        frame = viz._fit(bounds)
+    counts = [max(1, int(math.ceil(float(pixels - overlap_pixels) / step)))
+              for pixels, step in zip(frame.size, steps)]
+    page_polygons, page_walls = _page_items(viz, frame, polygons, walls,
+                                            page_pixels, steps, counts)
+    root, extension = os.path.splitext(path)
+    as_pdf = extension.lower() == '.pdf'
+    page_count = counts[0] * counts[1]
+    tracker = _progress.tracker('render', page_count, progress, cancel)
+    paths = [path] if as_pdf else list()
+    f = open(path, 'wb') if as_pdf else None
+    try:
+        writer = pdf.PageWriter(f) if as_pdf else None
+        for number in range(page_count):
+            if tracker is not None:
+                tracker.update(number)
+            row, column = divmod(number, counts[0])
+            image = _draw_page(page_pixels, column * steps[0],
+                               row * steps[1],
+                               _page_polygons(viz, frame, polygons,
+                                              page_polygons.pop(number, ())),
+                               _page_walls(frame, walls,
+                                           page_walls.pop(number, ())),
+                               viz.EDGE_WIDTH)
+            if as_pdf:
+                writer.add_page(image, page_size, dpi, margin)
+            else:
+                page_path = u'{}-{:0{}d}{}'.format(root, number + 1,
+                                                   len(str(page_count)),
+                                                   extension)
+                image.save(page_path, 'PNG', dpi=(dpi, dpi))
+                paths.append(page_path)
+        if as_pdf:
+            writer.close()
+    finally:
+        if f is not None:
+            f.close()
+    if tracker is not None:
+        tracker.finish()
+    return {'rows': counts[1], 'columns': counts[0],
+            'page_pixels': page_pixels, 'paths': paths}
+
+
+def _scaled_size(bounds, scale):
+    """Return the size that makes _fit use scale."""
+    min_row, min_col, max_row, max_col = bounds
+    padding = 2.0  # one graph unit on each side (see PolyViz._fit)
+    return (scale * (max_col - min_col + padding),
+            scale * (max_row - min_row + padding))
+
+
+def _page_items(viz, frame, polygons, walls, page_pixels, steps, counts):
+    """Return the numbers of the polygons and walls that reach into each page.
+
+    returns: {page number: array of polygon numbers},
+             {page number: array of wall numbers}
+    """
+    point = frame.point
+    page_polygons, page_walls = dict(), dict()
+    for i, (_, vertexes) in enumerate(polygons):
+        points = [point(vertex) for vertex in vertexes]
+        for number in _pages(points, 0, page_pixels, steps, counts):
+            page_polygons.setdefault(number, array('l')).append(i)
+    for i, (_, vertex_a, vertex_b) in enumerate(walls):
+        for number in _pages((point(vertex_a), point(vertex_b)),
+                             viz.EDGE_WIDTH, page_pixels, steps, counts):
+            page_walls.setdefault(number, array('l')).append(i)
+    return page_polygons, page_walls
+
+
+def _page_polygons(viz, frame, polygons, numbers):
+    """Return [(color, points), ...] in image pixels for polygon numbers."""
+    point = frame.point
+    return [(viz.get_shape_style(polygons[i][0])['color'],
+             [point(vertex) for vertex in polygons[i][1]]) for i in numbers]
+
+
+def _page_walls(frame, walls, numbers):
+    """Return [(color, point, point), ...] in image pixels for wall numbers."""
+    point = frame.point
+    return [(walls[i][0], point(walls[i][1]), point(walls[i][2]))
+            for i in numbers]
+
+
+def _pages(points, margin, page_pixels, steps, counts):
+    """Generate the number of each page that the box around points touches."""
+    ranges = list()
+    for axis in (0, 1):
+        low = min(p[axis] for p in points) - margin
+        high = max(p[axis] for p in points) + margin
+        # page i shows pixels from i * step to i * step + page size
+        first = max(0, -(-(low - page_pixels[axis] + 1) // steps[axis]))
+        last = min(counts[axis] - 1, high // steps[axis])
+        ranges.append(range(int(first), int(last) + 1))
+    columns, rows = ranges
+    for row in rows:
+        for column in columns:
+            yield row * counts[0] + column
+
+
+def _draw_page(size, left, top, polygons, walls, wall_width):
+    """Return the RGB image of one page on white.
+
+    arguments:
+    size - pixels of the page
+    left, top - pixel of the full image at the top left of the page
+    polygons, walls - the items of the page in full image pixels
+
+    note: PIL draws wide lines a little differently at negative pixels so
+          the page is drawn with room for the items above and left of it
+    """
+    points = [p for _, item_points in polygons for p in item_points]
+    points.extend(p for _, point_a, point_b in walls
+                  for p in (point_a, point_b))
+    pad_x = max([0] + [left - x for x, _ in points]) + wall_width
+    pad_y = max([0] + [top - y for _, y in points]) + wall_width
+    left, top = left - pad_x, top - pad_y
+    width, height = size
+    image = PIL.Image.new('RGBA', (width + pad_x, height + pad_y))
+    drawer = PIL.ImageDraw.Draw(image)
+    # color spaces before other parts just like a full image
+    for color, item_points in polygons:
+        drawer.polygon([(x - left, y - top) for x, y in item_points],
+                       fill=color)
+    for color, (x_a, y_a), (x_b, y_b) in walls:
+        drawer.line(((x_a - left, y_a - top), (x_b - left, y_b - top)),
+                    fill=color, width=wall_width)
+    page = PIL.Image.new('RGBA', size, _WHITE)
+    page.alpha_composite(image.crop((pad_x, pad_y, pad_x + width,
+                                     pad_y + height)))
+    return page.convert('RGB')
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,108 @@
+"""Minimal PDF writing for documents of full-page images made one at a time."""
+import zlib
+
+
+_POINTS_PER_INCH = 72.0
+
+
+class PageWriter(object):
+    """Writes a PDF with one image on each page as the pages are made.
+
+    Each page is written (and can be forgotten) before the next one is made
+    so memory use does not depend on the number of pages. The page tree,
+    catalog and cross-reference table are written by close().
+    """
+    _PAGES = 1  # object number of the page tree
+    _CATALOG = 2
+
+    def __init__(self, f):
+        self._f = f
+        self._position = 0
+        self._offsets = dict()
+        self._pages = list()
+        self._next_object = 3
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def add_page(self, image, page_size, dpi, margin=0.0):
+        """Add a page with image placed at the top left inside margin.
+
+        arguments:
+        image - an RGB PIL image
+        page_size - (width, height) of the page in inches
+        dpi - pixels of image per inch on the page
+
+        kwargs:
+        margin - inches between the page edges and the image
+        """
+        width, height = image.size
+        image_number, content_number, page_number = self._reserve(3)
+        data = zlib.compress(image.tobytes())
+        self._object(image_number, (
+            '<< /Type /XObject /Subtype /Image /Width {} /Height {}'
+            ' /ColorSpace /DeviceRGB /BitsPerComponent 8'
+            ' /Filter /FlateDecode /Length {} >>'
+            ''.format(width, height, len(data))).encode('ascii'), data)
+        page_width, page_height = [_POINTS_PER_INCH * inches
+                                   for inches in page_size]
+        image_width = _POINTS_PER_INCH * width / dpi
+        image_height = _POINTS_PER_INCH * height / dpi
+        left = _POINTS_PER_INCH * margin
+        bottom = page_height - left - image_height
+        content = ('q {} 0 0 {} {} {} cm /Im0 Do Q'
+                   ''.format(_number(image_width), _number(image_height),
+                             _number(left), _number(bottom))).encode('ascii')
+        self._object(content_number,
+                     '<< /Length {} >>'.format(len(content)).encode('ascii'),
+                     content)
+        self._object(page_number, (
+            '<< /Type /Page /Parent {} 0 R /MediaBox [0 0 {} {}]'
+            ' /Resources << /XObject << /Im0 {} 0 R >> >> /Contents {} 0 R >>'
+            ''.format(self._PAGES, _number(page_width), _number(page_height),
+                      image_number, content_number)).encode('ascii'))
+        self._pages.append(page_number)
+
+    def close(self):
+        """Finish the document. At least one page must have been added."""
+        if not self._pages:
+            raise ValueError('A PDF needs at least one page.')
+        kids = ' '.join('{} 0 R'.format(number) for number in self._pages)
+        self._object(self._PAGES, '<< /Type /Pages /Kids [{}] /Count {} >>'
+                     ''.format(kids, len(self._pages)).encode('ascii'))
+        self._object(self._CATALOG, '<< /Type /Catalog /Pages {} 0 R >>'
+                     ''.format(self._PAGES).encode('ascii'))
+        xref_position = self._position
+        count = self._next_object
+        lines = ['xref', '0 {}'.format(count), '0000000000 65535 f ']
+        lines.extend('{:010d} 00000 n '.format(self._offsets[number])
+                     for number in range(1, count))
+        lines.extend(('trailer',
+                      '<< /Size {} /Root {} 0 R >>'.format(count,
+                                                            self._CATALOG),
+                      'startxref', str(xref_position), '%%EOF', ''))
+        self._write('\n'.join(lines).encode('ascii'))
+
+    def _reserve(self, count):
+        numbers = list(range(self._next_object, self._next_object + count))
+        self._next_object += count
+        return numbers
+
+    def _object(self, number, dictionary, stream=None):
+        self._offsets[number] = self._position
+        parts = ['{} 0 obj\n'.format(number).encode('ascii'), dictionary]
+        if stream is not None:
+            parts.extend((b'\nstream\n', stream, b'\nendstream'))
+        parts.append(b'\nendobj\n')
+        self._write(b''.join(parts))
+
+    def _write(self, data):
+        self._f.write(data)
+        self._position += len(data)
+
+
+def _number(value):
+    """Return value as short text (PDF numbers have no exponents)."""
+    return '{:.3f}'.format(value).rstrip('0').rstrip('.')
+
+
+if __name__ == '__main__':
+    pass
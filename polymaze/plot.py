@@ -0,0 +1,315 @@
+"""Vector paths of the walls for pen plotters and laser cutters.
+
+The walls are joined into as few continuous polylines as possible. Each
+connected group of walls needs one polyline for each pair of its odd
+vertexes (or one closed polyline when there are none) and Euler circuits
+find exactly that many. The polylines are then ordered so the head travels
+as little as possible between them: nearest neighbor (with a grid index of
+the polyline ends) followed by 2-opt, which may also reverse polylines.
+
+Coordinates are the pixels of PolyViz.image() as floats with y down.
+"""
+import math
+
+
+_DIGITS = 6  # shapes calculate shared vertexes with tiny differences
+_TWO_OPT_WINDOW = 32  # polylines after each one considered by 2-opt
+_TWO_OPT_PASSES = 8
+_HPGL_UNITS_PER_MM = 40
+
+
+def plan(viz, optimize=True):
+    """Return the walls of viz.grid as ordered polylines and their distances.
+
+    kwargs:
+    optimize - when False, the polylines are drawn in the order they are
+               found (still joined) to compare with the ordered ones
+
+    returns: None if the grid is empty. otherwise a dict with:
+        size - (width, height) of the drawing
+        layers - [(color, [polyline, ...]), ...] in drawing order where each
+                 polyline is a list of (x, y). one layer for each wall color
+        draw_distance - length of all polylines
+        travel_distance - distance moved with the pen up. starts at (0, 0)
+        pen_lifts - number of polylines
+        edge_order_travel_distance - travel when each wall is drawn on its
+                                     own in the order of the grid's edges
+    """
+    bounds, _, walls = viz._geometry(polygons=False)
+    if bounds is None:
+        return None
+    frame = viz._fit(bounds)
+
+    def point(vertex):
+        row, col = vertex
+        return (frame.scale * col + frame.horz_offset_px,
+                frame.scale * row + frame.vert_offset_px)
+    segments = dict()
+    for color, vertex_a, vertex_b in walls:
+        segments.setdefault(color, list()).append((point(vertex_a),
+                                                   point(vertex_b)))
+    position = edge_order_position = (0.0, 0.0)
+    layers, draw, travel, edge_order_travel = list(), 0.0, 0.0, 0.0
+    for color in sorted(segments):
+        edge_order_travel, edge_order_position = _travel(
+            segments[color], edge_order_travel, edge_order_position)
+        polylines = _polylines(segments[color])
+        if optimize:
+            polylines = _two_opt(_nearest_neighbor(polylines, position),
+                                 position)
+        draw += sum(_length(polyline) for polyline in polylines)
+        travel, position = _travel(polylines, travel, position)
+        layers.append((color, polylines))
+    return {'size': frame.size,
+            'layers': layers,
+            'draw_distance': draw,
+            'travel_distance': travel,
+            'pen_lifts': sum(len(polylines) for _, polylines in layers),
+            'edge_order_travel_distance': edge_order_travel}
+
+
+def svg(plotted, stroke_width=1):
+    """Return an SVG document (text) of a plan that keeps the drawing order.
+
+    Each layer is one path so plotting software draws the polylines in order.
+    """
+    width, height = plotted['size']
+    lines = ['<svg xmlns="http://www.w3.org/2000/svg" version="1.1"'
+             ' width="{0}" height="{1}" viewBox="0 0 {0} {1}">'
+             ''.format(width, height)]
+    for color, polylines in plotted['layers']:
+        path = ' '.join('M' + ' L'.join('{} {}'.format(_number(x), _number(y))
+                                        for x, y in polyline)
+                        for polyline in polylines)
+        lines.append('<path fill="none" stroke="rgb({},{},{})"'
+                     ' stroke-width="{}" d="{}"/>'
+                     ''.format(color[0], color[1], color[2], stroke_width,
+                               path))
+    lines.append('</svg>')
+    return '\n'.join(lines)
+
+
+def hpgl(plotted, mm_per_pixel=0.25):
+    """Return HPGL commands (text) of a plan. Each layer uses the next pen.
+
+    kwargs:
+    mm_per_pixel - size of the drawing on paper
+    """
+    scale = mm_per_pixel * _HPGL_UNITS_PER_MM
+    height = plotted['size'][1]
+
+    def units(point):
+        x, y = point
+        return '{},{}'.format(int(round(x * scale)),
+                              int(round((height - y) * scale)))  # y is up
+    commands = ['IN']
+    for pen, (_, polylines) in enumerate(plotted['layers'], 1):
+        commands.append('SP{}'.format(pen))
+        for polyline in polylines:
+            commands.append('PU' + units(polyline[0]))
+            commands.append('PD' + ','.join(units(point)
+                                            for point in polyline[1:]))
+    commands.extend(('PU', 'SP0'))
+    return ';'.join(commands) + ';\n'
+
+
+def _polylines(segments):
+    """Return the fewest polylines that draw each segment once.
+
+    Odd vertexes of each connected group are paired with virtual segments so
+    every vertex is even. An Euler circuit of each group is then split where
+    it follows a virtual segment.
+    """
+    ids, points, adjacency, ends = dict(), list(), list(), list()
+    for segment in segments:
+        segment_ids = list()
+        for point in segment:
+            key = (round(point[0], _DIGITS), round(point[1], _DIGITS))
+            if key not in ids:
+                ids[key] = len(points)
+                points.append(point)
+                adjacency.append(list())
+            segment_ids.append(ids[key])
+        a, b = segment_ids
+        if a == b:
+            continue  # nothing to draw
+        adjacency[a].append(len(ends))
+        adjacency[b].append(len(ends))
+        ends.append((a, b))
+    real_count = len(ends)
+    # pair the odd vertexes of each connected group
+    group = [None] * len(points)
+    for start in range(len(points)):
+        if group[start] is not None:
+            continue
+        group[start] = start
+        stack, odd = [start], list()
+        while stack:
+            v = stack.pop()
+            if len(adjacency[v]) % 2:
+                odd.append(v)
+            for edge in adjacency[v]:
+                a, b = ends[edge]
+                other = b if a == v else a
+                if group[other] is None:
+                    group[other] = start
+                    stack.append(other)
+        for a, b in zip(odd[::2], odd[1::2]):
+            adjacency[a].append(len(ends))
+            adjacency[b].append(len(ends))
+            ends.append((a, b))
+    # follow an euler circuit of each group (Hierholzer)
+    used = bytearray(len(ends))
+    next_edge = [0] * len(points)
+    polylines = list()
+    for start in range(len(points)):
+        if next_edge[start] == len(adjacency[start]):
+            continue
+        stack, circuit = [(start, None)], list()
+        while stack:
+            v, _ = stack[-1]
+            adjacent, i = adjacency[v], next_edge[v]
+            while i < len(adjacent) and used[adjacent[i]]:
+                i += 1
+            next_edge[v] = i
+            if i == len(adjacent):
+                circuit.append(stack.pop())
+                continue
+            edge = adjacent[i]
+            used[edge] = 1
+            a, b = ends[edge]
+            stack.append((b if a == v else a, edge))
+        circuit.reverse()
+        # split the circuit at virtual segments
+        pieces, piece = list(), [circuit[0][0]]
+        for v, edge in circuit[1:]:
+            if edge >= real_count:
+                pieces.append(piece)
+                piece = [v]
+            else:
+                piece.append(v)
+        pieces.append(piece)
+        if len(pieces) > 1 and len(pieces[-1]) > 1 and len(pieces[0]) > 1:
+            # the circuit is closed so the last piece continues with the first
+            pieces[0] = pieces.pop() + pieces[0][1:]
+        polylines.extend([points[v] for v in piece]
+                         for piece in pieces if len(piece) > 1)
+    return polylines
+
+
+def _nearest_neighbor(polylines, position):
+    """Return polylines ordered (and maybe reversed) by nearest next end."""
+    if not polylines:
+        return list()
+    xs = [x for polyline in polylines for x, _ in (polyline[0], polyline[-1])]
+    ys = [y for polyline in polylines for _, y in (polyline[0], polyline[-1])]
+    span = max(max(xs) - min(xs), max(ys) - min(ys), 1.0)
+    size = span / math.sqrt(len(polylines))  # about one polyline per cell
+    cells = dict()
+    for i, polyline in enumerate(polylines):
+        for reverse, (x, y) in enumerate((polyline[0], polyline[-1])):
+            cells.setdefault((int(x // size), int(y // size)),
+                             list()).append((i, reverse))
+    max_ring = int(span // size) + 2 + int(max(abs(position[0]),
+                                               abs(position[1])) // size)
+    drawn = bytearray(len(polylines))
+    ordered = list()
+    for _ in range(len(polylines)):
+        x, y = position
+        cx, cy = int(x // size), int(y // size)
+        best, best_distance = None, None
+        for ring in range(max_ring + 1):
+            if (best is not None) and (best_distance <= (ring - 1) * size):
+                break  # no closer end can be in this or further rings
+            for cell in _ring(cx, cy, ring):
+                candidates = cells.get(cell)
+                if not candidates:
+                    continue
+                alive = [c for c in candidates if not drawn[c[0]]]
+                if len(alive) != len(candidates):
+                    cells[cell] = alive
+                for i, reverse in alive:
+                    end_x, end_y = polylines[i][-1 if reverse else 0]
+                    distance = math.hypot(end_x - x, end_y - y)
+                    if (best_distance is None) or (distance < best_distance):
+                        best, best_distance = (i, reverse), distance
+        i, reverse = best
+        drawn[i] = 1
+        polyline = polylines[i][::-1] if reverse else polylines[i]
+        ordered.append(polyline)
+        position = polyline[-1]
+    return ordered
+
+
+def _ring(cx, cy, ring):
+    """Generate the cells at a chessboard distance of ring from (cx, cy)."""
+    if ring == 0:
+        yield cx, cy
+        return
+    for dx in range(-ring, ring + 1):
+        yield cx + dx, cy - ring
+        yield cx + dx, cy + ring
+    for dy in range(-ring + 1, ring):
+        yield cx - ring, cy + dy
+        yield cx + ring, cy + dy
+
+
+def _two_opt(polylines, position):
+    """Return polylines with blocks reversed while that shortens the travel.
+
+    Reversing a block of polylines also reverses each of them so only the
+    travel into and out of the block changes. Blocks are limited to
+    _TWO_OPT_WINDOW polylines.
+    """
+    polylines = list(polylines)
+    count = len(polylines)
+    starts = [polyline[0] for polyline in polylines]
+    ends = [polyline[-1] for polyline in polylines]
+    for _ in range(_TWO_OPT_PASSES):
+        improved = False
+        for i in range(count):
+            before = position if i == 0 else ends[i - 1]
+            for j in range(i, min(count, i + _TWO_OPT_WINDOW)):
+                if j + 1 < count:
+                    after = starts[j + 1]
+                    old = _distance(before, starts[i]) +\
+                        _distance(ends[j], after)
+                    new = _distance(before, ends[j]) +\
+                        _distance(starts[i], after)
+                else:
+                    old = _distance(before, starts[i])
+                    new = _distance(before, ends[j])
+                if new < old - 1e-9:
+                    polylines[i:j + 1] = [polyline[::-1] for polyline
+                                          in reversed(polylines[i:j + 1])]
+                    starts[i:j + 1] = [p[0] for p in polylines[i:j + 1]]
+                    ends[i:j + 1] = [p[-1] for p in polylines[i:j + 1]]
+                    improved = True
+        if not improved:
+            break
+    return polylines
+
+
+def _travel(polylines, travel, position):
+    """Return travel plus the moves between polylines and the last point."""
+    for polyline in polylines:
+        travel += _distance(position, polyline[0])
+        position = polyline[-1]
+    return travel, position
+
+
+def _length(polyline):
+    return sum(_distance(a, b) for a, b in zip(polyline, polyline[1:]))
+
+
+def _distance(a, b):
+    return math.hypot(b[0] - a[0], b[1] - a[1])
+
+
+def _number(value):
+    """Return value as short text for coordinates (3 decimals at most)."""
+    return '{:.3f}'.format(value).rstrip('0').rstrip('.')
+
+
+if __name__ == '__main__':
+    pass
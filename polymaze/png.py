@@ -0,0 +1,90 @@
+"""Minimal PNG writing for RGBA images that are made in pieces."""
+import struct
+import zlib
+
+import PIL.Image
+import PIL.ImageChops
+
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_UP_FILTER = b'\2'
+
+
+def chunk(chunk_type, data):
+    """Return one PNG chunk (length, type, data, crc)."""
+    checksum = zlib.crc32(chunk_type + data) & 0xffffffff
+    return b''.join((struct.pack('>I', len(data)), chunk_type, data,
+                     struct.pack('>I', checksum)))
+
+
+def header(size):
+    """Return the IHDR chunk of an 8 bit RGBA image of size."""
+    width, height = size
+    return chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+
+def scanlines(image, above=None):
+    """Return the rows of an RGBA image filtered and ready to compress.
+
+    Each row is stored as the difference to the row above ('Up' filter)
+    which makes the repetitive rows of mazes compress much better.
+
+    kwargs:
+    above - 1 pixel high image of the row above image (default: zeros)
+    """
+    width, height = image.size
+    shifted = PIL.Image.new('RGBA', (width, height))
+    if above is not None:
+        shifted.paste(above, (0, 0))
+    shifted.paste(image.crop((0, 0, width, height - 1)), (0, 1))
+    raw = PIL.ImageChops.subtract_modulo(image, shifted).tobytes()
+    stride = 4 * width
+    return b''.join(_UP_FILTER + raw[i:i + stride]
+                    for i in range(0, stride * height, stride))
+
+
+def image_data(image):
+    """Return the compressed rows of an RGBA image."""
+    return zlib.compress(scanlines(image))
+
+
+class BandWriter(object):
+    """Writes a PNG one horizontal band of rows at a time.
+
+    Only the compressor state is kept between bands so memory use does not
+    depend on the size of the whole image.
+    """
+    def __init__(self, f, size):
+        self._f = f
+        self._width, self._height = size
+        self._rows = 0
+        self._last_row = None
+        self._compressor = zlib.compressobj()
+        f.write(SIGNATURE)
+        f.write(header(size))
+
+    def write(self, band):
+        """Write the next band (an RGBA image as wide as the whole image)."""
+        if band.size[0] != self._width:
+            raise ValueError('Band width {} does not match image width {}.'
+                             ''.format(band.size[0], self._width))
+        self._rows += band.size[1]
+        if self._rows > self._height:
+            raise ValueError('Bands are taller than the image.')
+        data = self._compressor.compress(scanlines(band, self._last_row))
+        width, height = band.size
+        self._last_row = band.crop((0, height - 1, width, height))
+        if data:
+            self._f.write(chunk(b'IDAT', data))
+
+    def close(self):
+        """Finish the file. All rows must have been written."""
+        if self._rows != self._height:
+            raise ValueError('Only {} of {} rows were written.'
+                             ''.format(self._rows, self._height))
+        self._f.write(chunk(b'IDAT', self._compressor.flush()))
+        self._f.write(chunk(b'IEND', b''))
+
+
+if __name__ == '__main__':
+    pass
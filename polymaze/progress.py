@@ -0,0 +1,89 @@
+"""Progress reports and cooperative cancellation for long-running work.
+
+Long-running methods accept two optional kwargs:
+
+progress - callable(fraction done, phase name, items processed) called at
+           most about every _SECONDS_PER_REPORT seconds and when a phase ends
+cancel - a CancelToken. the work raises Cancelled soon after it is cancelled
+
+Phases are 'grid' (creating shapes), 'carve' (making the maze) and 'render'
+(drawing the image).
+"""
+import time
+
+
+_ITEMS_PER_CHECK = 256  # items between looking at the clock and the token
+_SECONDS_PER_REPORT = 0.1
+
+
+class Cancelled(Exception):
+    """Raised by long-running work when its CancelToken was cancelled."""
+
+
+class CancelToken(object):
+    """Shared flag that asks long-running work to stop (see Cancelled).
+
+    note: may be cancelled from any thread
+    """
+    def __init__(self):
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def cancelled(self):
+        return self._cancelled
+
+    def check(self):
+        """Raise Cancelled if cancel() was called."""
+        if self._cancelled:
+            raise Cancelled()
+
+
+def tracker(phase, total, progress=None, cancel=None):
+    """Return a tracker for total items of phase.
+
+    returns: None when there is nothing to report or check so loops only
+             pay for a test of None
+    """
+    if (progress is None) and (cancel is None):
+        return None
+    return _Tracker(phase, total, progress, cancel)
+
+
+class _Tracker(object):
+    def __init__(self, phase, total, progress, cancel):
+        self._phase = phase
+        self._total = total
+        self._progress = progress
+        self._cancel = cancel
+        self._next_check = 0
+        self._last_report = None
+
+    def update(self, done):
+        """Record that done items are finished. Cheap between checks."""
+        if done < self._next_check:
+            return
+        self._next_check = done + _ITEMS_PER_CHECK
+        if self._cancel is not None:
+            self._cancel.check()
+        if self._progress is not None:
+            now = time.time()
+            if (self._last_report is None) or\
+                    (now - self._last_report >= _SECONDS_PER_REPORT):
+                self._last_report = now
+                fraction = min(1.0, float(done) / self._total)\
+                    if self._total else 0.0
+                self._progress(fraction, self._phase, done)
+
+    def finish(self, done=None):
+        """Record the end of the phase (always reported)."""
+        if self._cancel is not None:
+            self._cancel.check()
+        if self._progress is not None:
+            self._progress(1.0, self._phase,
+                           self._total if done is None else done)
+
+
+if __name__ == '__main__':
+    pass
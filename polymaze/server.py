@@ -0,0 +1,427 @@
+"""Serve mazes over HTTP from a pool of warm worker processes.
+
+POST a JSON object of maze parameters to /maze and the PNG (or SVG) comes
+back. For example:
+
+    {"text": "Hi", "shape": "Hexagon", "seed": 3, "complexity": 2,
+     "format": "svg"}
+
+Workers load the supershapes and the default font once when they start so
+requests only pay for the maze itself. Results of seeded requests are kept
+in memory so repeated requests are answered without any work.
+
+Parameters that set the size of a maze have upper limits and so does the
+size of the grid they make together. Each maze must be made within a
+deadline (504 otherwise). Workers stop making a maze when its deadline
+passes. When every worker is busy and enough requests are waiting, new
+requests are turned away (503).
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import threading
+import time
+
+# silly workaround to allow py2 or py3
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from . import cli
+from . import polygrid
+from .cache import cache_key
+from .progress import CancelToken, Cancelled
+
+
+_DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+_MAX_REQUEST_BYTES = 64 * 1024
+_DEFAULT_TIMEOUT_SECONDS = 30
+_WAITING_PER_PROCESS = 2  # requests waiting for each worker before 503
+_MAX_COMPLEXITY = 100
+_MAX_SIDE = 1000  # width and height
+_MAX_ASPECT = 100  # and 1 / _MAX_ASPECT at least
+_MAX_TEXT_LENGTH = 100
+_MAX_INDEXES = 100000  # rows * cols of the grid (about 7s to make 100000)
+_PAST_DEADLINE = 'The maze was not made before its deadline.'
+_CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+class MazeServer(ThreadingMixIn, HTTPServer):
+    """HTTP server that makes mazes in a pool of worker processes."""
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 8000), processes=None,
+                 cache_bytes=None, verbose=False, timeout=None):
+        """Listen on address (host, port). Port 0 picks a free port.
+
+        kwargs:
+        processes - number of worker processes (default: number of CPUs)
+        cache_bytes - most bytes of results kept in memory
+        verbose - log each request to stderr
+        timeout - seconds a request waits for its maze
+        """
+        HTTPServer.__init__(self, address, _MazeRequestHandler)
+        self.verbose = verbose
+        self.timeout_seconds = timeout or _DEFAULT_TIMEOUT_SECONDS
+        self._results = _ResultCache(cache_bytes or _DEFAULT_CACHE_BYTES)
+        processes = processes or multiprocessing.cpu_count()
+        self._pool = multiprocessing.Pool(processes, initializer=_warm_up)
+        # jobs that are made or waiting. a job that passed its deadline gives
+        # its slot back right away since its worker stops at the next check
+        self._slots = threading.Semaphore(processes * _WAITING_PER_PROCESS)
+
+    def maze(self, params, output_format='png'):
+        """Return (maze bytes or None if empty, True if cached).
+
+        Requests with a seed are answered from memory when possible.
+
+        raises: ServerBusy if too many requests are waiting and
+                multiprocessing.TimeoutError if the maze is not made in time
+        """
+        key = None
+        if params.get('seed') is not None:
+            key = cache_key(output_format=output_format, **params)
+            data = self._results.get(key)
+            if data is not None:
+                return data, True
+        if not self._slots.acquire(False):
+            raise ServerBusy('Too many mazes are being made. Try again later.')
+        release = _release_once(self._slots)
+        deadline = time.time() + self.timeout_seconds
+        job = self._pool.apply_async(_job, (params, output_format, deadline),
+                                     callback=release)
+        try:
+            data, error = job.get(self.timeout_seconds)
+        except multiprocessing.TimeoutError:
+            release()
+            raise
+        if error == _PAST_DEADLINE:
+            raise multiprocessing.TimeoutError()
+        if error is not None:
+            raise RuntimeError(error)
+        if (key is not None) and (data is not None):
+            self._results.put(key, data)
+        return data, False
+
+    def status(self):
+        """Return counts that show how the cache is doing."""
+        return self._results.status()
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self._pool.terminate()
+        self._pool.join()
+
+
+def serve(host='127.0.0.1', port=8000, processes=None, cache_bytes=None,
+          timeout=None):
+    """Serve mazes until interrupted (Ctrl-C)."""
+    server = MazeServer((host, port), processes=processes,
+                        cache_bytes=cache_bytes, verbose=True, timeout=timeout)
+    print(u'Serving mazes at http://{}:{}/maze'.format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def commandline(args=None):
+    """Run the server with options from the command line (polymaze serve)."""
+    parser = argparse.ArgumentParser(prog='polymaze serve',
+                                     description='Serve mazes over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on.')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port to listen on.')
+    parser.add_argument('--processes', type=int,
+                        help='Number of worker processes. Default is one'
+                             ' for each CPU.')
+    parser.add_argument('--cache-mb', type=cli._positive,
+                        help='Megabytes of recent results kept in memory.')
+    parser.add_argument('--timeout', type=cli._positive,
+                        help='Seconds to make each maze before giving up.'
+                             ' Default is {}.'
+                             ''.format(_DEFAULT_TIMEOUT_SECONDS))
+    kwargs = vars(parser.parse_args(args))
+    cache_mb = kwargs.pop('cache_mb')
+    cache_bytes = int(cache_mb * 1024 * 1024) if cache_mb else None
+    serve(cache_bytes=cache_bytes, **kwargs)
+
+
+class ServerBusy(Exception):
+    """Raised when a request can not be queued for a worker."""
+
+
+class _MazeRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/status':
+            self._send_json(200, self.server.status())
+        else:
+            self._send_json(404, {'error': 'Unknown path.'})
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0] != '/maze':
+            self._send_json(404, {'error': 'Unknown path.'})
+            return
+        try:
+            params, output_format = _request_params(self._read_json())
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        try:
+            data, cached = self.server.maze(params, output_format)
+        except ServerBusy as e:
+            self._send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+            return
+        except multiprocessing.TimeoutError:
+            seconds = self.server.timeout_seconds
+            self._send_json(504, {'error': 'The maze was not made in {}'
+                                           ' seconds.'.format(seconds)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        if data is None:
+            self._send_json(422, {'error': 'This maze appears to be empty.'})
+            return
+        self._send(200, _CONTENT_TYPES[output_format], data,
+                   {'X-Polymaze-Cache': 'hit' if cached else 'miss'})
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, *args)
+
+    def _read_json(self):
+        """Return the JSON object in the request body."""
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise ValueError('Invalid Content-Length.')
+        if length > _MAX_REQUEST_BYTES:
+            raise ValueError('Request is too large.')
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+        except (UnicodeDecodeError, ValueError):
+            raise ValueError('The request body must be JSON.')
+        if not isinstance(body, dict):
+            raise ValueError('The request body must be a JSON object.')
+        return body
+
+    def _send_json(self, code, content, headers=None):
+        self._send(code, 'application/json',
+                   json.dumps(content).encode('utf-8'), headers)
+
+    def _send(self, code, content_type, data, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _ResultCache(object):
+    """Size-bounded, least recently used cache of bytes in memory."""
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is None:
+                self._misses += 1
+                return None
+            self._entries[key] = data  # now the most recently used
+            self._hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self._max_bytes:
+            return  # would evict everything else
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def status(self):
+        with self._lock:
+            return {'cached': len(self._entries), 'bytes': self._size,
+                    'hits': self._hits, 'misses': self._misses}
+
+
+def _request_params(body):
+    """Return (make_maze parameters, output format) from a request body.
+
+    raises: ValueError for unknown or invalid parameters and for mazes
+            that are too large
+    """
+    body = dict(body)
+    output_format = body.pop('format', 'png')
+    if output_format not in _CONTENT_TYPES:
+        raise ValueError('format must be one of {}.'
+                         ''.format(', '.join(sorted(_CONTENT_TYPES))))
+    params = dict()
+    for name, value in body.items():
+        try:
+            convert = _PARAM_TYPES[name]
+        except KeyError:
+            raise ValueError('Unknown parameter: {}'.format(name))
+        if value is None:
+            continue
+        try:
+            params[name] = convert(value)
+        except (TypeError, ValueError, argparse.ArgumentTypeError) as e:
+            raise ValueError('Invalid {}: {}'.format(name, e))
+    _check_size(params)
+    return params, output_format
+
+
+def _check_size(params):
+    """Raise ValueError if the grid of params could be too large.
+
+    The grid of a random shape must fit for every shape.
+    """
+    shape = params.get('shape')
+    supershapes = [cli.ss_dict[shape]] if shape else cli.ss_dict.values()
+    size_params = dict((name, params[name]) for name in
+                       ('text', 'complexity', 'aspect', 'width', 'height')
+                       if name in params)
+    string = size_params.pop('text', None)
+    for supershape in supershapes:
+        grid = polygrid.PolyGrid(supershape=supershape)
+        try:
+            count = grid.index_count(string=string, **size_params)
+        except RuntimeError:
+            return  # no font. the worker reports it
+        if count > _MAX_INDEXES:
+            raise ValueError('The maze would be too large: {} shapes with {}'
+                             ' (at most {}).'.format(count, supershape.name(),
+                                                    _MAX_INDEXES))
+
+
+def _text(value):
+    if not isinstance(value, type(u'')):
+        raise ValueError('{} is not text'.format(value))
+    if len(value) > _MAX_TEXT_LENGTH:
+        raise ValueError('text is longer than {} characters'
+                         ''.format(_MAX_TEXT_LENGTH))
+    return value
+
+
+def _shape(value):
+    if value not in cli.ss_dict:
+        raise ValueError('{} is not a known shape'.format(value))
+    return value
+
+
+def _seed(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError('{} is not an integer'.format(value))
+    return value
+
+
+def _limited(minimum, maximum):
+    """Return a converter of positive numbers from minimum to maximum."""
+    def convert(value):
+        number = cli._positive(value)
+        if not minimum <= number <= maximum:
+            raise ValueError('{} is not between {} and {}'
+                             ''.format(number, minimum, maximum))
+        return number
+    return convert
+
+
+_PARAM_TYPES = {'text': _text, 'shape': _shape, 'seed': _seed,
+                'complexity': _limited(0, _MAX_COMPLEXITY),
+                'width': _limited(0, _MAX_SIDE),
+                'height': _limited(0, _MAX_SIDE),
+                'aspect': _limited(1.0 / _MAX_ASPECT, _MAX_ASPECT)}
+
+
+def _warm_up():
+    """Load everything a worker needs before the first request arrives."""
+    try:
+        polygrid._font()
+    except RuntimeError:
+        pass  # text mazes will report the missing font
+
+
+def _job(params, output_format, deadline):
+    """Return (maze bytes, None) or (None, error message) for the pool.
+
+    The work stops soon after deadline (time.time() seconds).
+
+    note: errors are returned so the server always hears that a job is done
+    """
+    try:
+        return _make_maze_bytes(params, output_format,
+                                _DeadlineToken(deadline)), None
+    except Cancelled:
+        return None, _PAST_DEADLINE
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def _make_maze_bytes(params, output_format, cancel=None):
+    """Return the maze for params as png or svg bytes. None if empty."""
+    if cancel is not None:
+        cancel.check()  # e.g. waited for a worker past the deadline
+    maze = cli.make_maze(cancel=cancel, **params)
+    if output_format == 'svg':
+        if cancel is not None:
+            cancel.check()
+        svg = maze.svg()
+        return None if svg is None else svg.encode('utf-8')
+    image = maze.image(cancel=cancel, keep=False)
+    return None if image is None else cli._encoded_png(image)
+
+
+class _DeadlineToken(CancelToken):
+    """CancelToken that is cancelled when its deadline passes."""
+    def __init__(self, deadline):
+        CancelToken.__init__(self)
+        self._deadline = deadline
+
+    def cancelled(self):
+        return self._cancelled or (time.time() >= self._deadline)
+
+    def check(self):
+        if self.cancelled():
+            raise Cancelled()
+
+
+def _release_once(semaphore):
+    """Return a function that releases semaphore the first time it is called.
+
+    note: called by the request thread or a pool thread (whichever is first)
+    """
+    lock = threading.Lock()
+    released = list()
+
+    def release(_=None):
+        with lock:
+            if not released:
+                released.append(True)
+                semaphore.release()
+    return release
+
+
+if __name__ == '__main__':
+    pass
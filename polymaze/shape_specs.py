@@ -0,0 +1,381 @@
+"""Supershapes described by JSON specs instead of code.
+
+A spec is validated once and compiled into the same component tables that
+the built-in supershapes make. Compiled specs can be cached on disk (keyed
+by a hash of the spec) so later runs skip the validation.
+
+Spec format ((row, col) pairs are lists of 2 numbers):
+    {"name": "Brick",
+     "reference_length": 1.0,             optional. typical edge length
+     "graph_offset_per_row": [1.0, 0.5],  graph move for each row of indexes
+     "graph_offset_per_col": [0.0, 1.0],  graph move for each col of indexes
+     "period": [1, 1],                    optional. rows and cols after which
+                                          the pattern repeats
+     "components": [
+         {"origin_index": [0, 0],
+          "name": "brick",
+          "edges": [                      clockwise (y is down)
+              {"name": "top", "neighbor": [-1, 0],
+               "counter_vertex": [0.0, 0.0]},
+              ...]}]}
+
+The neighbor of each edge is the index of the shape on the other side when
+the supershape is at the origin. The counter vertex of an edge is where the
+edge starts when going clockwise. Components must have the origin indexes
+(0 .. period - 1, 0 .. period - 1) and different names.
+
+Validation confirms that each neighbor has the matching edge back with the
+same vertexes, that the edges of each component go clockwise around a
+polygon and that the components fill the area of the pattern exactly.
+
+Loaded supershapes are added to shapes.supershapes_dict() (unless another
+supershape has the name) so saved, pickled and shared mazes of them can be
+loaded again in the same process. Files listed in the POLYMAZE_SHAPES
+environment variable (separated like PATH; directories load all of their
+.json files) are added the first time the supershapes are used. Their
+compiled forms are cached in POLYMAZE_CACHE (default ~/.polymaze_cache).
+"""
+import glob
+import hashlib
+import json
+import os
+
+from . import shapes as _shapes
+
+
+_COMPILER_VERSION = 1  # change when the compiled form changes
+_TOLERANCE = 1e-6  # relative to reference_length
+_text_types = (type(u''), type(''))
+_compiled = dict()  # compiled specs by spec hash. validated once per process
+
+
+def load(path, cache=None):
+    """Return the supershape of the JSON spec at path (see loads)."""
+    with open(path, 'rb') as f:
+        return loads(f.read(), cache=cache)
+
+
+def loads(data, cache=None):
+    """Return the supershape of a JSON spec (text or utf-8 bytes).
+
+    kwargs:
+    cache - a MazeCache that keeps the compiled spec so it is only validated
+            the first time
+
+    raises: ValueError if the spec is not valid
+    """
+    return _shapes._register(_loads(data, cache))
+
+
+def _loads(data, cache=None):
+    """Return the supershape of a JSON spec without registering it."""
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    key = hashlib.sha256(data).hexdigest()
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = _cached(cache, key)
+    if compiled is None:
+        try:
+            spec = json.loads(data.decode('utf-8'))
+        except ValueError as e:
+            raise ValueError('Supershape spec is not valid JSON: {}'
+                             ''.format(e))
+        compiled = compile_spec(spec)
+        if cache is not None:
+            cache.put(_cache_key(key), 'shape',
+                      json.dumps(compiled).encode('utf-8'))
+    _compiled[key] = compiled
+    return _SpecSuperShape(compiled)
+
+
+def dumps(supershape):
+    """Return the JSON spec of any supershape (e.g. to start a new one)."""
+    components = list()
+    for origin_index in sorted(supershape.components()):
+        component = supershape.components()[origin_index]
+        edges = dict((edge['name'], (n_index, edge['counter_vertex']))
+                     for n_index, edge in component['edges'].items())
+        components.append({
+            'origin_index': list(origin_index),
+            'name': component['name'],
+            'edges': [{'name': name,
+                       'neighbor': list(edges[name][0]),
+                       'counter_vertex': list(edges[name][1])}
+                      for name in component['clockwise_edge_names']]})
+    return json.dumps({'name': supershape.name(),
+                       'reference_length': supershape.reference_length(),
+                       'graph_offset_per_row':
+                           list(supershape.graph_offset_per_row()),
+                       'graph_offset_per_col':
+                           list(supershape.graph_offset_per_col()),
+                       'period': list(supershape.period()),
+                       'components': components}, indent=1, sort_keys=True)
+
+
+def compile_spec(spec):
+    """Return the compiled form of a spec (parsed JSON) after validating it.
+
+    raises: ValueError describing the first problem found
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('Supershape spec must be a JSON object.')
+    name = spec.get('name')
+    if not isinstance(name, _text_types) or not name:
+        raise ValueError('Supershape spec needs a name.')
+
+    def fail(message, *args):
+        raise ValueError(u'Supershape spec "{}": {}'
+                         u''.format(name, message.format(*args)))
+    reference_length = spec.get('reference_length', 1.0)
+    if not _is_number(reference_length) or reference_length <= 0:
+        fail('reference_length must be a positive number')
+    row_offset = _pair(spec.get('graph_offset_per_row'), _is_number,
+                       'graph_offset_per_row', fail)
+    col_offset = _pair(spec.get('graph_offset_per_col'), _is_number,
+                       'graph_offset_per_col', fail)
+    components = _components(spec.get('components'), fail)
+    rows = max(row for row, _ in components) + 1
+    cols = max(col for _, col in components) + 1
+    period = spec.get('period')
+    if period is not None and _pair(period, _is_integer, 'period',
+                                    fail) != (rows, cols):
+        fail('period {} does not match the component origin indexes {}',
+             tuple(period), (rows, cols))
+    for row in range(rows):
+        for col in range(cols):
+            if (row, col) not in components:
+                fail('no component at origin index {}', (row, col))
+    tolerance = _TOLERANCE * reference_length
+
+    def placed(vertex, anchor):
+        """Return vertex of the supershape at anchor (index offset)."""
+        return (vertex[0] + anchor[0] * row_offset[0]
+                + anchor[1] * col_offset[0],
+                vertex[1] + anchor[0] * row_offset[1]
+                + anchor[1] * col_offset[1])
+    total_area = 0.0
+    for origin_index, (component_name, edges) in sorted(components.items()):
+        vertexes = [vertex for _, _, vertex in edges]
+        for i in range(len(vertexes)):
+            if _distance(vertexes[i - 1], vertexes[i]) <= tolerance:
+                fail('component {} edge "{}" has no length', origin_index,
+                     edges[i - 1][0])
+        area = _signed_area(vertexes)
+        if area >= -tolerance ** 2:
+            fail('edges of component {} do not go clockwise', origin_index)
+        total_area -= area
+        # each neighbor must share the edge back with the same vertexes
+        for i, (edge_name, n_index, vertex) in enumerate(edges):
+            n_origin = (n_index[0] % rows, n_index[1] % cols)
+            anchor = (n_index[0] - n_origin[0], n_index[1] - n_origin[1])
+            back_index = (origin_index[0] - anchor[0],
+                          origin_index[1] - anchor[1])
+            n_edges = components[n_origin][1]
+            matches = [j for j, (_, index, _) in enumerate(n_edges)
+                       if index == back_index]
+            if not matches:
+                fail('component {} edge "{}" leads to {} which has no edge'
+                     ' back', origin_index, edge_name, n_index)
+            j = matches[0]
+            n_counter = placed(n_edges[j][2], anchor)
+            n_clock = placed(n_edges[(j + 1) % len(n_edges)][2], anchor)
+            clock = vertexes[(i + 1) % len(vertexes)]
+            if _distance(vertex, n_clock) > tolerance or\
+                    _distance(clock, n_counter) > tolerance:
+                fail('component {} edge "{}" and the edge back from {} have'
+                     ' different vertexes', origin_index, edge_name, n_index)
+    pattern_area = abs(rows * row_offset[0] * cols * col_offset[1]
+                       - rows * row_offset[1] * cols * col_offset[0])
+    if abs(total_area - pattern_area) > tolerance * max(1.0, pattern_area):
+        fail('components cover an area of {:.6f} but the repeating pattern'
+             ' has an area of {:.6f} (gaps or overlaps)', total_area,
+             pattern_area)
+    return {'version': _COMPILER_VERSION,
+            'name': name,
+            'reference_length': reference_length,
+            'graph_offset_per_row': list(row_offset),
+            'graph_offset_per_col': list(col_offset),
+            'period': [rows, cols],
+            'components': [[list(origin_index), component_name,
+                            [[edge_name, list(n_index), list(vertex)]
+                             for edge_name, n_index, vertex in edges]]
+                           for origin_index, (component_name, edges)
+                           in sorted(components.items())]}
+
+
+def environment_supershapes(environ=None):
+    """Return the supershapes of the specs listed in POLYMAZE_SHAPES.
+
+    raises: ValueError if any of them can not be loaded
+    """
+    supershapes, errors = _environment_supershapes(environ)
+    if errors:
+        raise ValueError(errors[0])
+    return supershapes
+
+
+def _environment_supershapes(environ=None):
+    """Return the supershapes in POLYMAZE_SHAPES and a list of errors."""
+    environ = os.environ if environ is None else environ
+    paths = list()
+    for entry in environ.get('POLYMAZE_SHAPES', '').split(os.pathsep):
+        if os.path.isdir(entry):
+            paths.extend(sorted(glob.glob(os.path.join(entry, '*.json'))))
+        elif entry:
+            paths.append(entry)
+    if not paths:
+        return list(), list()
+    cache = _environment_cache(environ)
+    supershapes, errors = list(), list()
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                supershapes.append(_loads(f.read(), cache=cache))
+        except (IOError, ValueError) as e:
+            errors.append(u'Unable to load supershape {} from'
+                          u' POLYMAZE_SHAPES: {}'.format(path, e))
+    return supershapes, errors
+
+
+class _SpecSuperShape(_shapes._SuperShape):
+    """A supershape made from a compiled spec (see compile_spec)."""
+    def __init__(self, compiled):
+        self._compiled = compiled
+        self._period = tuple(compiled['period'])
+        super(_SpecSuperShape, self).__init__()
+
+    def _identity(self):
+        return json.dumps(self._compiled, sort_keys=True)
+
+    def _make_specification(self):
+        compiled = self._compiled
+        components = dict()
+        for origin_index, name, edges in compiled['components']:
+            components[tuple(origin_index)] = {
+                'name': name,
+                'clockwise_edge_names': tuple(edge_name for edge_name, _, _
+                                              in edges),
+                'edges': dict((tuple(n_index), {'name': edge_name,
+                                                'counter_vertex':
+                                                    tuple(vertex)})
+                              for edge_name, n_index, vertex in edges)}
+        return {'name': compiled['name'],
+                'reference_length': compiled['reference_length'],
+                'graph_offset_per_row':
+                    tuple(compiled['graph_offset_per_row']),
+                'graph_offset_per_col':
+                    tuple(compiled['graph_offset_per_col']),
+                'components': components}
+
+    def origin_index(self, index):
+        """Return the equivalent index when the supershape is at the origin."""
+        rows, cols = self._period
+        return index[0] % rows, index[1] % cols
+
+
+def _components(components, fail):
+    """Return {origin index: (name, [(edge name, n_index, vertex), ...])}."""
+    if not isinstance(components, list) or not components:
+        fail('components must be a non-empty list')
+    result = dict()
+    for component in components:
+        if not isinstance(component, dict):
+            fail('each component must be an object')
+        origin_index = _pair(component.get('origin_index'), _is_integer,
+                             'origin_index', fail)
+        if min(origin_index) < 0:
+            fail('origin_index {} is negative', origin_index)
+        if origin_index in result:
+            fail('more than one component at origin index {}', origin_index)
+        component_name = component.get('name')
+        if not isinstance(component_name, _text_types) or not component_name:
+            fail('component {} needs a name', origin_index)
+        if component_name in [n for n, _ in result.values()]:
+            fail('more than one component is named {}', component_name)
+        edges = component.get('edges')
+        if not isinstance(edges, list) or len(edges) < 3:
+            fail('component {} needs a list of at least 3 edges',
+                 origin_index)
+        parsed = list()
+        for i, edge in enumerate(edges):
+            if not isinstance(edge, dict):
+                fail('component {} edge {} must be an object', origin_index,
+                     i)
+            edge_name = edge.get('name', u'edge {}'.format(i))
+            n_index = _pair(edge.get('neighbor'), _is_integer, 'neighbor',
+                            fail)
+            vertex = _pair(edge.get('counter_vertex'), _is_number,
+                           'counter_vertex', fail)
+            parsed.append((edge_name, n_index, vertex))
+        for what, values in (('edge names', [e[0] for e in parsed]),
+                             ('neighbors', [e[1] for e in parsed])):
+            if len(set(values)) != len(values):
+                fail('component {} has repeated {}', origin_index, what)
+        if origin_index in [n_index for _, n_index, _ in parsed]:
+            fail('component {} is its own neighbor', origin_index)
+        result[origin_index] = (component_name, parsed)
+    return result
+
+
+def _pair(value, check, what, fail):
+    if not isinstance(value, list) or len(value) != 2 or\
+            not all(check(v) for v in value):
+        fail('{} must be a list of 2 {}', what,
+             'integers' if check is _is_integer else 'numbers')
+    return tuple(value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _signed_area(vertexes):
+    """Return the area of (row, col) vertexes. negative when clockwise."""
+    return sum(0.5 * (vertexes[i + 1][1] * vertexes[i][0]
+                      - vertexes[i + 1][0] * vertexes[i][1])
+               for i in range(-1, len(vertexes) - 1))
+
+
+def _distance(a, b):
+    return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
+
+
+def _cache_key(spec_hash):
+    return hashlib.sha256('{} {}'.format(_COMPILER_VERSION, spec_hash)
+                          .encode('ascii')).hexdigest()
+
+
+def _cached(cache, spec_hash):
+    """Return the compiled spec from cache or None."""
+    if cache is None:
+        return None
+    data = cache.get(_cache_key(spec_hash), 'shape')
+    if data is None:
+        return None
+    try:
+        compiled = json.loads(data.decode('utf-8'))
+    except ValueError:
+        return None  # damaged. compile again
+    if compiled.get('version') != _COMPILER_VERSION:
+        return None
+    return compiled
+
+
+def _environment_cache(environ):
+    """Return the MazeCache for specs from the environment or None."""
+    from .cache import MazeCache  # the cache depends on the shapes
+    directory = environ.get('POLYMAZE_CACHE') or\
+        os.path.join(os.path.expanduser('~'), '.polymaze_cache')
+    try:
+        return MazeCache(directory)
+    except OSError:
+        return None  # caching is only an optimization
+
+
+if __name__ == '__main__':
+    pass
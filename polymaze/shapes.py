@@ -2,19 +2,121 @@ import inspect
 import math
 import random
 import sys
+import warnings
+
+
+_supershapes = None  # the dict shared by all modules (see supershapes_dict)
 
 
 def supershapes_dict():
-    """Return a dict of all supershapes in this module keyed by name."""
-    current_module = sys.modules[__name__]
-    supershapes = dict()
-    for name, obj in inspect.getmembers(current_module):
-        try:
-            if issubclass(obj, _SuperShape) and (name[0] != '_'):
-                supershapes[name] = obj()
-        except TypeError:
-            pass  # issubclass complains for non class obj
-    return supershapes
+    """Return the dict of all supershapes keyed by name.
+
+    Includes the supershapes in this module, those of the JSON specs listed
+    in the POLYMAZE_SHAPES environment variable (loaded the first time the
+    dict is used) and those loaded later with shape_specs. The same dict is
+    returned every time so saved and shared grids can find their supershape
+    by name.
+    """
+    global _supershapes
+    if _supershapes is None:
+        _supershapes = _SuperShapes()
+    return _supershapes
+
+
+def _register(supershape):
+    """Add supershape to supershapes_dict() if its name is free.
+
+    returns: the registered supershape when it has the same shapes (so
+             loading a spec twice gives one supershape). otherwise
+             supershape itself, which can not be found by name
+    """
+    registered = supershapes_dict().setdefault(supershape.name(), supershape)
+    if registered._identity() == supershape._identity():
+        return registered
+    return supershape
+
+
+def _require_registered(supershape):
+    """Raise ValueError unless the name of supershape finds the same shapes.
+
+    note: saved and shared grids only keep the name of their supershape
+    """
+    registered = supershapes_dict().get(supershape.name())
+    if (registered is None) or\
+            (registered._identity() != supershape._identity()):
+        raise ValueError(u'Supershape {} is not the one registered with its'
+                         u' name so it can not be found again by name.'
+                         u''.format(supershape.name()))
+
+
+class _SuperShapes(dict):
+    """Supershapes by name. Those of POLYMAZE_SHAPES are loaded on first use.
+
+    Bad or duplicate specs in POLYMAZE_SHAPES are skipped with a warning so
+    they do not break everything else.
+    """
+    def __init__(self, environ=None):
+        super(_SuperShapes, self).__init__()
+        current_module = sys.modules[__name__]
+        for name, obj in inspect.getmembers(current_module):
+            try:
+                if issubclass(obj, _SuperShape) and (name[0] != '_'):
+                    dict.__setitem__(self, name, obj())
+            except TypeError:
+                pass  # issubclass complains for non class obj
+        self._environ = environ
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True  # before loading since loading registers
+        from . import shape_specs  # shape_specs depends on this module
+        loaded, errors = shape_specs._environment_supershapes(self._environ)
+        for supershape in loaded:
+            if dict.get(self, supershape.name()) is None:
+                dict.__setitem__(self, supershape.name(), supershape)
+            else:
+                errors.append(u'Supershape {} from POLYMAZE_SHAPES is already'
+                              u' defined.'.format(supershape.name()))
+        for error in errors:
+            warnings.warn(error)
+
+    def __getitem__(self, name):
+        self._load()
+        return dict.__getitem__(self, name)
+
+    def __contains__(self, name):
+        self._load()
+        return dict.__contains__(self, name)
+
+    def __iter__(self):
+        self._load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._load()
+        return dict.__len__(self)
+
+    def get(self, name, default=None):
+        self._load()
+        return dict.get(self, name, default)
+
+    def setdefault(self, name, default=None):
+        self._load()
+        return dict.setdefault(self, name, default)
+
+    def keys(self):
+        self._load()
+        return dict.keys(self)
+
+    def values(self):
+        self._load()
+        return dict.values(self)
+
+    def items(self):
+        self._load()
+        return dict.items(self)
 
 
 class _SuperShape(object):
@@ -57,6 +159,16 @@ class _SuperShape(object):
         self._components = d.pop('components')
         self._graph_offset_per_row = d.pop('graph_offset_per_row')
         self._graph_offset_per_col = d.pop('graph_offset_per_col')
+        # neighbor index offsets of each component in clockwise order
+        self._n_index_offsets = dict()
+        for origin_index, component_spec in self._components.items():
+            offsets = dict()
+            for origin_n_index, edge_spec in component_spec['edges'].items():
+                offset = _diff_tuples(origin_n_index, origin_index)
+                offsets[edge_spec['name']] = offset
+            self._n_index_offsets[origin_index] = tuple(
+                offsets[name]
+                for name in component_spec['clockwise_edge_names'])
 
     def name(self):
         return self._name
@@ -73,10 +185,55 @@ class _SuperShape(object):
     def graph_offset_per_col(self):
         return self._graph_offset_per_col
 
+    def period(self):
+        """Return the number of rows and cols after which the pattern repeats.
+
+        note: with the supershape at the origin, row / col indexes that are
+              multiples of these values start a new supershape
+        """
+        origin_indexes = self._components.keys()
+        rows = max(row for row, _ in origin_indexes) + 1
+        cols = max(col for _, col in origin_indexes) + 1
+        return rows, cols
+
+    def n_indexes(self, index):
+        """Return the clockwise neighbor indexes of the shape at index.
+
+        note: this only needs the index so it works without any grid
+        """
+        row, col = index
+        return [(row + row_offset, col + col_offset)
+                for row_offset, col_offset
+                in self._n_index_offsets[self.origin_index(index)]]
+
     def create_component(self, grid, index):
         """Return a new shape for the given index."""
         return _ComponentShape(self, grid, index)
 
+    def _identity(self):
+        """Return what supershapes with the same shapes have in common."""
+        return type(self)
+
+    def _final_data(self, index):
+        """Return name, final edge data and clockwise neighbors at index.
+
+        note: regular tilings override this (and n_indexes) with closed forms
+              that skip the lookups of the general specification
+        """
+        return _ComponentShape._calc_final_data(self, index)
+
+    def _fill_polygons(self, shapes, color):
+        """Return [(shape, [vertex, ...]), ...] that fill shapes.
+
+        arguments:
+        shapes - the shapes of a grid in drawing order
+        color - function that returns the fill color of a shape
+
+        note: each polygon is filled with the color of its shape. by default
+              there is one polygon for each shape
+        """
+        return _shape_polygons(shapes)
+
     def avg_edge_count(self):
         """Return the average number of edges per shape.
 
@@ -113,10 +270,20 @@ class _ComponentShape(object):
         self._grid = grid
         self._index = index
         self._name, self._edge_data, self._ordered_n_indexes =\
-            self._calc_final_data(supershape, index)
+            supershape._final_data(index)
         self._owned_edges = self._grab_edges(dict())
         self.viz_style = None
 
+    @property
+    def viz_style(self):
+        return self._viz_style
+
+    @viz_style.setter
+    def viz_style(self, style):
+        self._viz_style = style
+        if self._grid is not None:
+            self._grid._changes += 1  # images of the grid are out of date
+
     @staticmethod
     def _calc_final_data(ss, index):
         """Return name, final edge data and sorted neighbors."""
@@ -154,6 +321,26 @@ class _ComponentShape(object):
             edges_data[primary_n_index]['clock_vertex'] = next_vertex
         return component_spec['name'], edges_data, ordered_n_indexes
 
+    def _copy(self, grid):
+        """Return a copy of this shape for grid.
+
+        The name, edge data and neighbor order never change after creation so
+        they are shared. Only owned edges and styles are new.
+        """
+        shape = type(self).__new__(type(self))
+        shape._ss = self._ss
+        shape._grid = grid
+        shape._index = self._index
+        shape._name = self._name
+        shape._edge_data = self._edge_data
+        shape._ordered_n_indexes = self._ordered_n_indexes
+        shape._owned_edges = dict((n_index, edge._copy(grid))
+                                  for n_index, edge
+                                  in self._owned_edges.items())
+        # set directly. a new grid has no images to mark as out of date
+        shape._viz_style = self._viz_style
+        return shape
+
     def index(self):
         return self._index
 
@@ -219,7 +406,10 @@ class _ComponentShape(object):
         return: {neighbor_index: edge, ...}
         """
         grabbed_edges = dict()
-        for n_index, neighbor in self.neighbors():
+        # only look at existing shapes (don't trigger lazy creation)
+        existing_shapes = self._grid._shapes
+        for n_index in self._ordered_n_indexes:
+            neighbor = existing_shapes.get(n_index)
             # ignore self owned edges
             if n_index in currently_owned:
                 continue
@@ -248,6 +438,25 @@ class Edge(object):
         self._neighbor_2_index = neighbor_2_index
         self.viz_style = None
 
+    @property
+    def viz_style(self):
+        return self._viz_style
+
+    @viz_style.setter
+    def viz_style(self, style):
+        self._viz_style = style
+        if self._grid is not None:
+            self._grid._changes += 1  # images of the grid are out of date
+
+    def _copy(self, grid):
+        """Return a copy of this edge (including style) for grid."""
+        edge = Edge.__new__(Edge)
+        edge._grid = grid
+        edge._neighbor_1_index = self._neighbor_1_index
+        edge._neighbor_2_index = self._neighbor_2_index
+        edge._viz_style = self._viz_style  # new grid. nothing out of date
+        return edge
+
     def endpoints(self, requesting_shape_index=None):
         """Return the xy, xy end points of this edge.
 
@@ -294,6 +503,76 @@ def _scale_tuple(t, scale):
     return scale * t[0], scale * t[1]
 
 
+def _closed_form_data(name, edge_names, n_indexes, vertexes):
+    """Return the final data of a shape (see _calc_final_data).
+
+    arguments:
+    edge_names, n_indexes, vertexes - clockwise. each vertex is the counter
+                                      vertex of the edge at the same position
+    """
+    clock_vertexes = vertexes[1:] + vertexes[:1]
+    edges_data = dict()
+    for edge_name, n_index, vertex, clock_vertex in zip(
+            edge_names, n_indexes, vertexes, clock_vertexes):
+        edges_data[n_index] = {'name': edge_name, 'counter_vertex': vertex,
+                               'clock_vertex': clock_vertex}
+    return name, edges_data, n_indexes
+
+
+def _shape_polygons(shapes):
+    """Return [(shape, [vertex, ...]), ...] with one polygon for each shape."""
+    return [(shape, [shape._edge_data[n_index]['counter_vertex']
+                     for n_index in shape._ordered_n_indexes])
+            for shape in shapes]
+
+
+def _row_runs(shapes, color):
+    """Generate lists of side by side shapes in a row that have one color.
+
+    Runs are in the order of their first (leftmost) shape so a grid made
+    row by row is still drawn row by row.
+    """
+    shapes = list(shapes)
+    by_index = dict((shape.index(), (color(shape), shape)) for shape in shapes)
+    for shape in shapes:
+        row, col = shape.index()
+        run_color = by_index[(row, col)][0]
+        left = by_index.get((row, col - 1))
+        if left is not None and left[0] == run_color:
+            continue  # part of the run that started on the left
+        run = [shape]
+        right = by_index.get((row, col + 1))
+        while right is not None and right[0] == run_color:
+            run.append(right[1])
+            col += 1
+            right = by_index.get((row, col + 1))
+        yield run
+
+
+def _fill_row_runs(shapes, color, run_polygon):
+    """Return one polygon for each run of shapes (see _fill_polygons)."""
+    polygons = list()
+    for run in _row_runs(shapes, color):
+        if len(run) == 1:
+            shape = run[0]
+            vertexes = [shape._edge_data[n_index]['counter_vertex']
+                        for n_index in shape._ordered_n_indexes]
+        else:
+            vertexes = run_polygon(run)
+        polygons.append((run[0], vertexes))
+    return polygons
+
+
+def _left_right_polygon(run):
+    """Return the outline of a run of shapes with left and right edges."""
+    row, col = run[0].index()
+    left = run[0]._edge_data[(row, col - 1)]
+    row, col = run[-1].index()
+    right = run[-1]._edge_data[(row, col + 1)]
+    return [left['counter_vertex'], left['clock_vertex'],
+            right['counter_vertex'], right['clock_vertex']]
+
+
 class Square(_SuperShape):
     """A simple square supershape."""
     @classmethod
@@ -323,6 +602,25 @@ class Square(_SuperShape):
         """Return the equivalent index when the supershape is at the origin."""
         return 0, 0
 
+    def n_indexes(self, index):
+        """Return the clockwise neighbor indexes of the shape at index."""
+        row, col = index
+        return [(row - 1, col), (row, col + 1), (row + 1, col), (row, col - 1)]
+
+    def _final_data(self, index):
+        """Return name, final edge data and clockwise neighbors at index."""
+        row, col = index
+        top, bottom = 0.0 + row, 1.0 + row  # unit squares
+        left, right = 0.0 + col, 1.0 + col
+        return _closed_form_data(
+            'square', ('top', 'right', 'bottom', 'left'),
+            self.n_indexes(index),
+            [(top, left), (top, right), (bottom, right), (bottom, left)])
+
+    def _fill_polygons(self, shapes, color):
+        """Return one rectangle for each run of shapes in a row."""
+        return _fill_row_runs(shapes, color, _left_right_polygon)
+
 
 class Hexagon(_SuperShape):
     """A gridded hexagon."""
@@ -377,6 +675,58 @@ class Hexagon(_SuperShape):
         origin_row, origin_col = 0, 0  # there's only one shape so always origin
         return origin_row, origin_col
 
+    def n_indexes(self, index):
+        """Return the clockwise neighbor indexes of the shape at index."""
+        row, col = index
+        return [(row - 1, col), (row, col + 1), (row + 1, col + 1),
+                (row + 1, col), (row, col - 1), (row - 1, col - 1)]
+
+    def _final_data(self, index):
+        """Return name, final edge data and clockwise neighbors at index.
+
+        note: sums are in the same order as the general calculation so the
+              vertexes are exactly equal
+        """
+        row, col = index
+        h = math.sin(math.pi / 3.0)
+        row_y, col_y = row * (2.0 * h), col * (-1.0 * h)
+        top = row_y + col_y
+        middle = (h + row_y) + col_y
+        bottom = (2.0 * h + row_y) + col_y
+        col_x = col * 1.5
+        left, middle_left = -1.5 + col_x, -1.0 + col_x
+        middle_right, right = 0.0 + col_x, 0.5 + col_x
+        return _closed_form_data(
+            'hexagon', ('top', 'top right', 'bottom right', 'bottom',
+                        'bottom left', 'top left'),
+            self.n_indexes(index),
+            [(top, middle_left), (top, middle_right), (middle, right),
+             (bottom, middle_right), (bottom, middle_left), (middle, left)])
+
+    def _fill_polygons(self, shapes, color):
+        """Return one polygon for each run of shapes in a row."""
+        return _fill_row_runs(shapes, color, self._run_polygon)
+
+    @staticmethod
+    def _run_polygon(run):
+        """Return the outline of hexagons that step up and right in a row."""
+        vertexes = list()
+        for shape in run:  # top left side from left to right
+            row, col = shape.index()
+            data = shape._edge_data
+            vertexes.append(data[(row - 1, col - 1)]['counter_vertex'])
+            vertexes.append(data[(row - 1, col)]['counter_vertex'])
+        row, col = run[-1].index()
+        vertexes.append(run[-1]._edge_data[(row, col + 1)]['counter_vertex'])
+        for shape in reversed(run):  # bottom right side back to the left
+            row, col = shape.index()
+            data = shape._edge_data
+            vertexes.append(data[(row + 1, col + 1)]['counter_vertex'])
+            vertexes.append(data[(row + 1, col)]['counter_vertex'])
+        row, col = run[0].index()
+        vertexes.append(run[0]._edge_data[(row, col - 1)]['counter_vertex'])
+        return vertexes
+
 
 class Triangle(_SuperShape):
     """A horizontal arrangement of triangles pointing up / down."""
@@ -432,6 +782,39 @@ class Triangle(_SuperShape):
         origin_col = col % 2
         return origin_row, origin_col
 
+    def n_indexes(self, index):
+        """Return the clockwise neighbor indexes of the shape at index."""
+        row, col = index
+        if col % 2:  # down
+            return [(row, col - 1), (row - 1, col + 1), (row, col + 1)]
+        return [(row, col - 1), (row, col + 1), (row + 1, col - 1)]  # up
+
+    def _final_data(self, index):
+        """Return name, final edge data and clockwise neighbors at index.
+
+        note: sums are in the same order as the general calculation so the
+              vertexes are exactly equal
+        """
+        row, col = index
+        h = math.sin(math.pi / 3.0)
+        top, bottom = 0.0 + row * h, h + row * h
+        row_x, col_x = row * 0.5, (col - col % 2) * 0.5
+        middle_left = (0.0 + row_x) + col_x
+        middle_right = (0.5 + row_x) + col_x
+        if col % 2:
+            right = (1.0 + row_x) + col_x
+            return _closed_form_data(
+                'down', ('left', 'top', 'right'), self.n_indexes(index),
+                [(bottom, middle_right), (top, middle_left), (top, right)])
+        left = (-0.5 + row_x) + col_x
+        return _closed_form_data(
+            'up', ('left', 'right', 'bottom'), self.n_indexes(index),
+            [(bottom, left), (top, middle_left), (bottom, middle_right)])
+
+    def _fill_polygons(self, shapes, color):
+        """Return one polygon (a strip) for each run of shapes in a row."""
+        return _fill_row_runs(shapes, color, _left_right_polygon)
+
 
 class OctaDiamond(_SuperShape):
     """Octagons and diamonds living together. Oh my!"""
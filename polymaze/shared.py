@@ -0,0 +1,287 @@
+"""Grids in shared memory that any number of processes can read without copies.
+
+One process packs a grid (or maze) into a shared memory block and the
+others attach to it by name. Attached grids read the arrays in the block
+directly so memory use does not grow with the number of workers.
+
+Block layout (native byte order, each section padded to 8 bytes):
+    header          magic b'PMZS', uint16 version, uint16 name length,
+                    uint32 shape count, uint32 vertex count, uint32 pair count
+    name            utf-8 supershape name
+    rows, cols      int32 index of each shape (shapes sorted by index)
+    passages        uint16 for each shape with bit i set when the i-th
+                    clockwise edge is a path (always 0 for plain grids)
+    components      uint8 component id of each shape in its supershape
+    vertex offsets  uint32 (shape count + 1). the vertexes of shape i are
+                    vertexes[offsets[i]:offsets[i + 1]]
+    vertexes        float64 (row, col) of each clockwise counter vertex
+    pairs           int32 entrance shape id, exit shape id of each pair
+
+note: needs multiprocessing.shared_memory (python 3.8 or later)
+"""
+from array import array
+import os
+import struct
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None  # optional. python 3.8 or later
+
+from . import shapes as _shapes
+from .maze import Maze
+from .polygrid import _SS_DICT
+from .storage import _passage_bits, _shape_id
+
+
+_MAGIC = b'PMZS'
+_VERSION = 1
+_HEADER = struct.Struct('=4sHHIII')
+_ALIGNMENT = 8
+
+
+class SharedGrid(object):
+    """Read-only view of a grid whose arrays are in shared memory.
+
+    Use create() in one process and attach() with its name() in the others.
+    Shapes are small views (see get) so reading never copies the arrays.
+    """
+    def __init__(self, memory, owner=False):
+        """Use create() or attach() instead."""
+        self._memory = memory
+        self._owner = owner
+        view = memory.buf.toreadonly()
+        self._views = [view]
+        try:
+            self._read(view)
+        except Exception:
+            # nothing may use the block or it can not be closed
+            for view in reversed(self._views):
+                view.release()
+            raise
+
+    def _read(self, view):
+        """Find the supershape and the sections of the block."""
+        magic, version, name_length, shape_count, vertex_count, pair_count =\
+            _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError('Not a shared grid.')
+        if version != _VERSION:
+            raise ValueError('Unsupported shared grid version: {}'
+                             ''.format(version))
+        position = _HEADER.size
+        name = view[position:position + name_length].tobytes()
+        try:
+            self._supershape = _SS_DICT[name.decode('utf-8')]
+        except KeyError:
+            raise ValueError(u'Unknown supershape in shared grid: {}'
+                             u''.format(name.decode('utf-8')))
+        position = _padded_length(position + name_length)
+        sections = dict()
+        for section, typecode, count in _sections(shape_count, vertex_count,
+                                                  pair_count):
+            size = count * struct.calcsize(typecode)
+            part = view[position:position + size].cast(typecode)
+            self._views.append(part)
+            sections[section] = part
+            position = _padded_length(position + size)
+        self._rows, self._cols = sections['rows'], sections['cols']
+        self._passages = sections['passages']
+        self._components = sections['components']
+        self._vertex_offsets = sections['vertex_offsets']
+        self._vertexes = sections['vertexes']
+        pairs = sections['pairs']
+        self._pairs = [(pairs[2 * i], pairs[2 * i + 1])
+                       for i in range(pair_count)]
+        components = self._supershape.components()
+        self._component_names = [components[origin_index]['name']
+                                 for origin_index in sorted(components)]
+
+    @classmethod
+    def create(cls, source):
+        """Return a new shared grid with the shapes of source.
+
+        arguments:
+        source - a PolyGrid or a Maze (passages and in/out pairs are kept)
+
+        note: the creator should unlink() the block when no process needs it
+        """
+        _require_shared_memory()
+        if isinstance(source, Maze):
+            grid, path_style = source._grid, source._PATH_STYLE
+            entrance_exit_pairs = source.entrance_exit_pairs()
+        else:
+            grid, path_style, entrance_exit_pairs = source, None, ()
+        ss = grid._supershape
+        _shapes._require_registered(ss)  # attached by name
+        component_ids = dict((origin_index, i) for i, origin_index
+                             in enumerate(sorted(ss.components())))
+        shapes = sorted(grid.shapes(), key=lambda shape: shape.index())
+        ids = dict((shape.index(), i) for i, shape in enumerate(shapes))
+        values = dict((section, array(typecode)) for section, typecode, _
+                      in _sections(0, 0, 0))
+        values['vertex_offsets'].append(0)
+        for shape in shapes:
+            index = shape.index()
+            values['rows'].append(index[0])
+            values['cols'].append(index[1])
+            values['passages'].append(0 if path_style is None
+                                      else _passage_bits(shape, path_style))
+            values['components'].append(component_ids[ss.origin_index(index)])
+            for n_index in shape._ordered_n_indexes:
+                values['vertexes'].extend(
+                    shape._edge_data[n_index]['counter_vertex'])
+            values['vertex_offsets'].append(len(values['vertexes']) // 2)
+        for entrance, exit_space in entrance_exit_pairs:
+            values['pairs'].append(ids[entrance.index()])
+            values['pairs'].append(ids[exit_space.index()])
+        # lay out the block
+        name = ss.name().encode('utf-8')
+        header = _HEADER.pack(_MAGIC, _VERSION, len(name), len(shapes),
+                              len(values['vertexes']) // 2,
+                              len(values['pairs']) // 2)
+        parts = [header + name]
+        for section, _, _ in _sections(0, 0, 0):
+            parts.append(values[section].tobytes())
+        size = sum(_padded_length(len(part)) for part in parts)
+        memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+        position = 0
+        for part in parts:
+            memory.buf[position:position + len(part)] = part
+            position = _padded_length(position + len(part))
+        try:
+            return cls(memory, owner=True)
+        except Exception:
+            memory.close()
+            memory.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name):
+        """Return the shared grid in the block called name (read-only)."""
+        _require_shared_memory()
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            memory = shared_memory.SharedMemory(name=name)
+            if os.name == 'posix':
+                # before python 3.13 attaching also registers the block so
+                # this process would remove it when it ends. undo that
+                resource_tracker.unregister(memory._name, 'shared_memory')
+        try:
+            return cls(memory)
+        except Exception:
+            memory.close()
+            raise
+
+    def name(self):
+        """Return the name other processes attach with."""
+        return self._memory.name
+
+    def supershape_name(self):
+        return self._supershape.name()
+
+    def shape_count(self):
+        return len(self._rows)
+
+    def get(self, index):
+        """Return a view of the shape at index or None if no shape there."""
+        shape_id = _shape_id(self._rows, self._cols, index)
+        if shape_id is None:
+            return None
+        return _SharedShape(self, shape_id)
+
+    def shapes(self):
+        """Generate a view of each shape in order of index."""
+        for shape_id in range(len(self._rows)):
+            yield _SharedShape(self, shape_id)
+
+    def entrance_exit_pairs(self):
+        """Return the (entrance index, exit index) of each maze region."""
+        index = self._index
+        return [(index(entrance_id), index(exit_id))
+                for entrance_id, exit_id in self._pairs]
+
+    def close(self):
+        """Stop using the block in this process."""
+        for view in reversed(self._views):
+            view.release()
+        self._views = list()
+        self._memory.close()
+
+    def unlink(self):
+        """Free the block once every process closed it (creator only)."""
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        if self._owner:
+            self.unlink()
+
+    def _index(self, shape_id):
+        return self._rows[shape_id], self._cols[shape_id]
+
+
+class _SharedShape(object):
+    """Read-only view of one shape of a SharedGrid."""
+    def __init__(self, grid, shape_id):
+        self._grid = grid
+        self._id = shape_id
+
+    def index(self):
+        return self._grid._index(self._id)
+
+    def name(self):
+        grid = self._grid
+        return grid._component_names[grid._components[self._id]]
+
+    def n_indexes(self):
+        """Return the clockwise neighbor indexes."""
+        return self._grid._supershape.n_indexes(self.index())
+
+    def neighbors(self):
+        """Generate n_index, neighbor view (or None) in clockwise order."""
+        get = self._grid.get
+        for n_index in self.n_indexes():
+            yield n_index, get(n_index)
+
+    def paths(self):
+        """Return the neighbor indexes that are reached through a path."""
+        bits = self._grid._passages[self._id]
+        return [n_index for i, n_index in enumerate(self.n_indexes())
+                if (bits >> i) & 1]
+
+    def vertexes(self):
+        """Return the (row, col) graph vertexes in clockwise order."""
+        grid = self._grid
+        offsets, vertexes = grid._vertex_offsets, grid._vertexes
+        return [(vertexes[2 * i], vertexes[2 * i + 1])
+                for i in range(offsets[self._id], offsets[self._id + 1])]
+
+
+def _sections(shape_count, vertex_count, pair_count):
+    """Return (name, typecode, item count) of each section in block order."""
+    return (('rows', 'i', shape_count),
+            ('cols', 'i', shape_count),
+            ('passages', 'H', shape_count),
+            ('components', 'B', shape_count),
+            ('vertex_offsets', 'I', shape_count + 1),
+            ('vertexes', 'd', 2 * vertex_count),
+            ('pairs', 'i', 2 * pair_count))
+
+
+def _padded_length(length):
+    return (length + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise RuntimeError('Shared grids need multiprocessing.shared_memory'
+                           ' (python 3.8 or later).')
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,252 @@
+from array import array
+import heapq
+import math
+
+from .polygrid import _UnionFind
+
+
+_UNREACHED = -1
+
+
+class Solver(object):
+    """Shortest paths through the passages of a maze.
+
+    The passages are stored once as compact arrays (compressed sparse rows)
+    with a node id for each shape so searches don't touch shapes or edges.
+    """
+    def __init__(self, maze):
+        self._maze = maze
+        # plain arrays since numpy is slow for element by element access
+        csr = maze.passages_csr(use_numpy=False)
+        self._indexes = list(zip(csr['rows'], csr['cols']))
+        self._ids = csr['ids']
+        self._offsets, self._neighbors = csr['offsets'], csr['neighbors']
+        self._centers = None  # only calculated when needed by A*
+
+    def node_count(self):
+        return len(self._indexes)
+
+    def indexes(self):
+        """Return the shape index of each node id."""
+        return self._indexes
+
+    def node_id(self, index):
+        """Return the node id of the shape at index."""
+        return self._ids[index]
+
+    def distances(self, start_index):
+        """Return the path length from start to every node (BFS).
+
+        returns: array of distances by node id. -1 for unreachable nodes
+        """
+        distances, _ = self._bfs(self._ids[start_index])
+        return distances
+
+    def path(self, start_index, end_index, method='bfs'):
+        """Return the list of shape indexes from start to end.
+
+        kwargs:
+        method - 'bfs' (breadth first) or 'astar' (A* with graph distance)
+
+        returns: None if end can not be reached from start
+        """
+        start, end = self._ids[start_index], self._ids[end_index]
+        if method == 'bfs':
+            _, parents = self._bfs(start, end)
+        elif method == 'astar':
+            parents = self._astar(start, end)
+        else:
+            raise ValueError('Unknown solving method: {}'.format(method))
+        if parents[end] == _UNREACHED:
+            return None
+        # walk back from the end to the start
+        path = [end]
+        while path[-1] != start:
+            path.append(parents[path[-1]])
+        path.reverse()
+        return [self._indexes[node] for node in path]
+
+    def solutions(self, method='bfs'):
+        """Return the entrance to exit path of each in/out pair."""
+        return [self.path(entrance.index(), exit_space.index(), method=method)
+                for entrance, exit_space in self._maze.entrance_exit_pairs()]
+
+    def metrics(self):
+        """Return difficulty metrics of the maze.
+
+        returns: {'shapes': number of shapes,
+                  'solution_lengths': shapes on each entrance to exit path
+                                      (None if the exit can not be reached),
+                  'solution_length': total of solution_lengths (None if any
+                                     exit can not be reached),
+                  'dead_ends': shapes with exactly one way in / out,
+                  'branching': {passage count: number of shapes, ...},
+                  'longest_corridor': most shapes in an unbranched chain,
+                  'river': fraction of shapes that are corridors (higher
+                           means longer flowing passages, fewer branches)}
+
+        note: in/out border openings count as passages of their shapes
+        """
+        offsets, neighbors = self._offsets, self._neighbors
+        node_count = len(self._indexes)
+        pairs = [(self._ids[entrance.index()], self._ids[exit_space.index()])
+                 for entrance, exit_space in self._maze.entrance_exit_pairs()]
+        # passage count of each node
+        degrees = array('l', [0]) * node_count
+        for node in range(node_count):
+            degrees[node] = offsets[node + 1] - offsets[node]
+        for entrance_id, exit_id in pairs:
+            degrees[entrance_id] += 1
+            if exit_id != entrance_id:
+                degrees[exit_id] += 1
+        # one breadth first search from all entrances at once (each region
+        # has its own) and then from any shape that is still not reached.
+        # corridor (2 passages) nodes take the chain of the corridor they are
+        # reached from. chains that meet again (cycles) are joined after
+        distances = array('l', [_UNREACHED]) * node_count
+        sources = array('l', [_UNREACHED]) * node_count  # starting node
+        chains = array('l', [_UNREACHED]) * node_count
+        joins = list()
+        roots = [entrance_id for entrance_id, _ in pairs]
+        roots.extend(range(node_count))
+        queue = list()
+        position = 0
+        for root in roots:
+            if distances[root] != _UNREACHED:
+                continue
+            distances[root] = 0
+            sources[root] = root
+            chains[root] = root
+            queue.append(root)
+            while position < len(queue):
+                node = queue[position]
+                position += 1
+                next_distance = distances[node] + 1
+                corridor = degrees[node] == 2
+                chain = chains[node]
+                for i in range(offsets[node], offsets[node + 1]):
+                    neighbor = neighbors[i]
+                    if distances[neighbor] == _UNREACHED:
+                        distances[neighbor] = next_distance
+                        sources[neighbor] = sources[node]
+                        chains[neighbor] = chain if corridor and\
+                            degrees[neighbor] == 2 else neighbor
+                        queue.append(neighbor)
+                    elif corridor and degrees[neighbor] == 2 and\
+                            chains[neighbor] != chain:
+                        joins.append((chain, chains[neighbor]))
+        solution_lengths = list()
+        for entrance_id, exit_id in pairs:
+            if sources[exit_id] != entrance_id:
+                # unreachable or nearer another entrance (not a perfect maze)
+                distances_from_entrance, _ = self._bfs(entrance_id, exit_id)
+                distance = distances_from_entrance[exit_id]
+            else:
+                distance = distances[exit_id]
+            solution_lengths.append(None if distance == _UNREACHED
+                                    else distance + 1)
+        chain_sets = _UnionFind(chain for pair in joins for chain in pair)
+        for chain_a, chain_b in joins:
+            chain_sets.union(chain_a, chain_b)
+        joined = dict((chain, chain_sets.find(chain))
+                      for pair in joins for chain in pair)
+        branching = dict()
+        corridor_lengths = {None: 0}  # so there is a longest one
+        for node, degree in enumerate(degrees):
+            branching[degree] = branching.get(degree, 0) + 1
+            if degree == 2:
+                chain = joined.get(chains[node], chains[node])
+                corridor_lengths[chain] = corridor_lengths.get(chain, 0) + 1
+        return {'shapes': node_count,
+                'solution_lengths': solution_lengths,
+                'solution_length': None if None in solution_lengths
+                else sum(solution_lengths),
+                'dead_ends': branching.get(1, 0),
+                'branching': branching,
+                'longest_corridor': max(corridor_lengths.values()),
+                'river': float(branching.get(2, 0)) / node_count if node_count
+                else 0.0}
+
+    def _bfs(self, start, end=None):
+        """Return distance and parent arrays from start (stop at end)."""
+        offsets, neighbors = self._offsets, self._neighbors
+        distances = array('l', [_UNREACHED]) * len(self._indexes)
+        parents = array('l', [_UNREACHED]) * len(self._indexes)
+        distances[start] = 0
+        parents[start] = start
+        queue = [start]  # list + read position is faster than a deque here
+        position = 0
+        while position < len(queue):
+            node = queue[position]
+            position += 1
+            if node == end:
+                break
+            next_distance = distances[node] + 1
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbor = neighbors[i]
+                if distances[neighbor] == _UNREACHED:
+                    distances[neighbor] = next_distance
+                    parents[neighbor] = node
+                    queue.append(neighbor)
+        return distances, parents
+
+    def _astar(self, start, end):
+        """Return the parent array of an A* search from start to end.
+
+        The heuristic is the straight graph distance between shape centers
+        divided by the longest single step so it never overestimates.
+        """
+        offsets, neighbors = self._offsets, self._neighbors
+        rows, cols, max_step = self._shape_centers()
+        end_row, end_col = rows[end], cols[end]
+
+        def heuristic(node):
+            return math.hypot(rows[node] - end_row,
+                              cols[node] - end_col) / max_step
+
+        costs = array('l', [_UNREACHED]) * len(self._indexes)
+        parents = array('l', [_UNREACHED]) * len(self._indexes)
+        costs[start] = 0
+        parents[start] = start
+        frontier = [(heuristic(start), 0, start)]
+        while frontier:
+            _, cost, node = heapq.heappop(frontier)
+            if node == end:
+                break
+            if cost > costs[node]:
+                continue  # stale entry
+            next_cost = cost + 1
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbor = neighbors[i]
+                known_cost = costs[neighbor]
+                if known_cost == _UNREACHED or next_cost < known_cost:
+                    costs[neighbor] = next_cost
+                    parents[neighbor] = node
+                    heapq.heappush(frontier, (next_cost + heuristic(neighbor),
+                                              next_cost, neighbor))
+        return parents
+
+    def _shape_centers(self):
+        """Return center row / col arrays and the longest step between them."""
+        if self._centers is None:
+            grid = self._maze._grid
+            rows, cols = array('d'), array('d')
+            for index in self._indexes:
+                vertexes = [data['counter_vertex'] for data
+                            in grid.get(index)._edge_data.values()]
+                rows.append(sum(v[0] for v in vertexes) / len(vertexes))
+                cols.append(sum(v[1] for v in vertexes) / len(vertexes))
+            max_step = 0.0
+            offsets, neighbors = self._offsets, self._neighbors
+            for node in range(len(self._indexes)):
+                for i in range(offsets[node], offsets[node + 1]):
+                    neighbor = neighbors[i]
+                    max_step = max(max_step,
+                                   math.hypot(rows[node] - rows[neighbor],
+                                              cols[node] - cols[neighbor]))
+            self._centers = rows, cols, max_step or 1.0
+        return self._centers
+
+
+if __name__ == '__main__':
+    pass
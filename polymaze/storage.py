@@ -0,0 +1,269 @@
+"""Save and load mazes in a compact binary format.
+
+File layout (little endian):
+    header    magic b'PMZF', uint16 version, uint16 supershape name length,
+              uint32 shape count, uint32 in/out pair count
+    name      utf-8 supershape name padded to a multiple of 4 bytes
+    rows      int32 row index of each shape (shapes sorted by index)
+    cols      int32 col index of each shape
+    passages  uint16 for each shape with bit i set when the i-th clockwise
+              edge is a path. padded to a multiple of 4 bytes
+    pairs     int32 entrance shape id, exit shape id for each in/out pair
+
+Loading memory-maps the file and only creates shapes when they are accessed.
+The same format makes pickles of mazes (and of grids without styles) small.
+"""
+from array import array
+import bisect
+import mmap
+import struct
+import sys
+
+from . import shapes as _shapes
+from .maze import Maze
+from .polygrid import PolyGrid, _SS_DICT
+
+
+_MAGIC = b'PMZF'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHII')
+_MAX_EDGES = 16  # bits available per shape for passages
+
+
+def dump(maze, path):
+    """Save maze to a file at path."""
+    with open(path, 'wb') as f:
+        f.write(dumps(maze))
+
+
+def dumps(maze):
+    """Return maze packed into the binary format.
+
+    note: shapes of a lazily loaded maze that were never accessed are copied
+          from the source without creating them
+    """
+    return _packed(maze._grid, maze._PATH_STYLE, maze.entrance_exit_pairs())
+
+
+def _packed(grid, path_style, entrance_exit_pairs=()):
+    """Return the shapes of grid and the in/out pairs in the binary format.
+
+    note: no passages are stored when path_style is None
+    """
+    _shapes._require_registered(grid._supershape)
+    shapes = [(shape.index(), 0 if path_style is None
+               else _passage_bits(shape, path_style))
+              for shape in grid._shapes.values()]
+    if grid._source is not None:
+        shapes.extend(grid._source.uncreated())
+    shapes.sort()
+    ids = dict((index, i) for i, (index, _) in enumerate(shapes))
+    rows, cols, passages = array('i'), array('i'), array('H')
+    for (row, col), bits in shapes:
+        rows.append(row)
+        cols.append(col)
+        passages.append(bits)
+    pairs = array('i')
+    for entrance, exit_space in entrance_exit_pairs:
+        pairs.append(ids[entrance.index()])
+        pairs.append(ids[exit_space.index()])
+    if sys.byteorder != 'little':
+        for values in (rows, cols, passages, pairs):
+            values.byteswap()
+    name = grid.supershape_name().encode('utf-8')
+    return b''.join((_HEADER.pack(_MAGIC, _VERSION, len(name), len(shapes),
+                                  len(pairs) // 2),
+                     _padded(name),
+                     rows.tobytes(),
+                     cols.tobytes(),
+                     _padded(passages.tobytes()),
+                     pairs.tobytes()))
+
+
+def _passage_bits(shape, path_style):
+    """Return the passages of shape with bit i for its i-th clockwise edge."""
+    n_indexes = shape._ordered_n_indexes
+    if len(n_indexes) > _MAX_EDGES:
+        raise ValueError('Shapes with more than {} edges can not be saved.'
+                         ''.format(_MAX_EDGES))
+    bits = 0
+    for i, n_index in enumerate(n_indexes):
+        if shape.edge(n_index).viz_style == path_style:
+            bits |= 1 << i
+    return bits
+
+
+def load(path):
+    """Return the maze saved at path.
+
+    note: the file is memory-mapped and shapes are created only as they are
+          accessed so loading is fast even for huge mazes.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(mapped)
+
+
+def loads(data):
+    """Return the maze packed in data (any buffer such as bytes or mmap)."""
+    grid = _lazy_grid(_LazySource(data))
+    source = grid._source
+    entrance_exit_pairs = [(grid.get(source.index(entrance_id)),
+                            grid.get(source.index(exit_id)))
+                           for entrance_id, exit_id in source.pairs]
+    return Maze._from_carved_grid(grid, entrance_exit_pairs)
+
+
+def _grid_dumps(grid):
+    """Return a grid without any styles packed into the binary format."""
+    return _packed(grid, path_style=None)
+
+
+def _grid_loads(data):
+    """Return the grid packed by _grid_dumps. Shapes are created lazily."""
+    return _lazy_grid(_LazySource(data, styled=False))
+
+
+def _lazy_grid(source):
+    """Return an empty grid that creates the shapes of source on access."""
+    try:
+        supershape = _SS_DICT[source.supershape_name]
+    except KeyError:
+        raise ValueError('Unknown supershape in maze data: {}'
+                         ''.format(source.supershape_name))
+    grid = PolyGrid(supershape=supershape)
+    grid._source = source
+    return grid
+
+
+class _LazySource(object):
+    """Creates the shapes of a packed maze only when they are accessed."""
+    def __init__(self, data, styled=True):
+        """Read the header and sections of data.
+
+        kwargs:
+        styled - when False, shapes are created without any maze styles
+        """
+        self._data = data
+        self._styled = styled
+        view = memoryview(data)
+        if len(view) < _HEADER.size:
+            raise ValueError('Maze data is too short.')
+        magic, version, name_length, shape_count, pair_count =\
+            _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError('Not maze data.')
+        if version != _VERSION:
+            raise ValueError('Unsupported maze data version: {}'
+                             ''.format(version))
+        position = _HEADER.size
+        name = view[position:position + name_length].tobytes()
+        self.supershape_name = name.decode('utf-8')
+        position += _padded_length(name_length)
+        self._views = [view]
+        self._rows = self._section(view, position, 'i', shape_count)
+        position += 4 * shape_count
+        self._cols = self._section(view, position, 'i', shape_count)
+        position += 4 * shape_count
+        self._passages = self._section(view, position, 'H', shape_count)
+        position += _padded_length(2 * shape_count)
+        pairs = self._section(view, position, 'i', 2 * pair_count)
+        self.pairs = [(pairs[2 * i], pairs[2 * i + 1])
+                      for i in range(pair_count)]
+        self._shape_styles = dict()
+        for entrance_id, exit_id in self.pairs:
+            self._shape_styles[entrance_id] = Maze._ENTRANCE_STYLE
+            self._shape_styles[exit_id] = Maze._EXIT_STYLE
+        self._created = bytearray(shape_count)
+
+    def _section(self, view, position, typecode, count):
+        """Return a typed view of count items of the data at position."""
+        size = count * struct.calcsize(typecode)
+        if position + size > len(view):
+            raise ValueError('Maze data is truncated.')
+        section = view[position:position + size]
+        if sys.byteorder != 'little':
+            values = array(typecode, section.tobytes())
+            values.byteswap()
+            return values
+        section = section.cast(typecode)
+        self._views.append(section)
+        return section
+
+    def index(self, shape_id):
+        return self._rows[shape_id], self._cols[shape_id]
+
+    def shape_id(self, index):
+        """Return the id of the shape at index or None (binary search)."""
+        return _shape_id(self._rows, self._cols, index)
+
+    def materialize(self, grid, index):
+        """Create the shape at index in grid. Return None if there is none."""
+        shape_id = self.shape_id(index)
+        if (shape_id is None) or self._created[shape_id]:
+            return None  # never existed or was removed after creation
+        return self._create(grid, shape_id)
+
+    def uncreated(self):
+        """Generate (index, passage bits) of the shapes not created yet."""
+        rows, cols, passages = self._rows, self._cols, self._passages
+        created = self._created
+        for shape_id in range(len(created)):
+            if not created[shape_id]:
+                yield (rows[shape_id], cols[shape_id]), passages[shape_id]
+
+    def materialize_all(self, grid):
+        """Create all shapes that have not been created yet."""
+        for shape_id in range(len(self._created)):
+            if not self._created[shape_id]:
+                self._create(grid, shape_id)
+        self._release()
+
+    def _create(self, grid, shape_id):
+        self._created[shape_id] = 1
+        shape = grid.create(self.index(shape_id))
+        if not self._styled:
+            return shape
+        # only set the edges this shape owns. neighbors set the others
+        bits = self._passages[shape_id]
+        owned_edges = shape._owned_edges
+        for i, n_index in enumerate(shape._ordered_n_indexes):
+            edge = owned_edges.get(n_index)
+            if edge is not None:
+                edge.viz_style = (Maze._PATH_STYLE if (bits >> i) & 1
+                                  else Maze._WALL_STYLE)
+        shape.viz_style = self._shape_styles.get(shape_id, Maze._FLOOR_STYLE)
+        return shape
+
+    def _release(self):
+        """Release the views so a memory-mapped file can be closed."""
+        self._rows = self._cols = self._passages = None
+        for view in reversed(self._views):
+            view.release()
+        self._views = list()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+
+
+def _shape_id(rows, cols, index):
+    """Return the position of index in sorted rows / cols arrays or None."""
+    row, col = index
+    low = bisect.bisect_left(rows, row)
+    high = bisect.bisect_right(rows, row, low)
+    i = bisect.bisect_left(cols, col, low, high)
+    if i < high and cols[i] == col:
+        return i
+    return None
+
+
+def _padded(data):
+    return data + b'\0' * (_padded_length(len(data)) - len(data))
+
+
+def _padded_length(length):
+    return (length + 3) // 4 * 4
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,124 @@
+"""Tracing hooks that time the main steps of making and drawing mazes.
+
+A tracer is any object with two methods:
+
+start(name, attributes) - called when a span begins. whatever it returns is
+                          given back to end
+end(handle, attributes) - called when the span ends (also when it fails)
+                          with the attributes only known at the end. failed
+                          spans have an 'error' attribute
+
+Spans are 'grid.create_rectangle', 'grid.create_string',
+'grid.create_from_image', 'maze.create', 'maze.image', 'viz.image' and
+'cli.save_maze'. Spans of nested steps (e.g. create_string makes its shapes
+with create_from_image) are nested.
+
+Use set_tracer() to trace everything in the process. Without a tracer the
+hooks only test a global for None and attributes are never computed.
+
+note: work in worker processes (processes=N) is part of the span of the
+      step that started it
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+
+_tracer = None
+
+
+def set_tracer(tracer):
+    """Trace all following steps with tracer (None stops tracing).
+
+    returns: the previous tracer
+    """
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def get_tracer():
+    return _tracer
+
+
+def traced(name, attributes=None, result_attributes=None):
+    """Decorate a function so each call is a span called name.
+
+    kwargs:
+    attributes - callable(*args, **kwargs) of the call that returns a dict
+                 of attributes for the start of the span
+    result_attributes - callable(result, *args, **kwargs) that returns a dict
+                        of attributes for the end of the span
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            handle = tracer.start(name, attributes(*args, **kwargs)
+                                  if attributes else dict())
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as e:
+                tracer.end(handle, {'error': type(e).__name__})
+                raise
+            tracer.end(handle, result_attributes(result, *args, **kwargs)
+                       if result_attributes else dict())
+            return result
+        return wrapper
+    return decorator
+
+
+class ChromeTracer(object):
+    """Tracer that records spans as Chrome trace events.
+
+    Open the saved file in chrome://tracing or https://ui.perfetto.dev to see
+    the spans of each thread on a timeline.
+
+    note: spans may start and end in any thread
+    """
+    def __init__(self):
+        self._events = list()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def start(self, name, attributes):
+        return (name, dict(attributes), threading.current_thread().ident,
+                time.time())
+
+    def end(self, handle, attributes):
+        end = time.time()
+        name, args, tid, start = handle
+        args.update(attributes)
+        event = {'name': name, 'cat': 'polymaze', 'ph': 'X',
+                 'ts': _microseconds(start),
+                 'dur': _microseconds(end - start),
+                 'pid': self._pid, 'tid': tid, 'args': args}
+        with self._lock:
+            self._events.append(event)
+
+    def events(self):
+        """Return the trace events of the spans that ended so far."""
+        with self._lock:
+            return list(self._events)
+
+    def dumps(self):
+        """Return the trace as Chrome trace-event JSON (text)."""
+        return json.dumps({'traceEvents': self.events(),
+                           'displayTimeUnit': 'ms'}, default=str)
+
+    def save(self, path):
+        """Write the trace to a JSON file at path."""
+        with open(path, 'w') as f:
+            f.write(self.dumps())
+
+
+def _microseconds(seconds):
+    return int(round(seconds * 1000000))
+
+
+if __name__ == '__main__':
+    pass
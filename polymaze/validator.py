@@ -0,0 +1,103 @@
+from .polygrid import _UnionFind
+
+
+def validate(maze):
+    """Return a report on whether maze is a set of perfect mazes.
+
+    Each region of connected shapes must be a spanning tree of passages
+    (no cycles and no unreachable shapes) with exactly one in/out pair whose
+    entrance and exit each open exactly one border wall.
+
+    The check is linear in the number of edges (union-find) so it is cheap
+    enough to run on every maze.
+
+    returns: {'valid': True / False,
+              'errors': [message, ...],
+              'regions': [{'shapes': _, 'passages': _, 'cycles': _,
+                           'pieces': _, 'border_openings': _,
+                           'entrance': _, 'exit': _, 'errors': [...]},
+                          ...]}
+    """
+    grid = maze._grid
+    path_style = maze._PATH_STYLE
+    ids = dict((shape.index(), i) for i, shape in enumerate(grid.shapes()))
+    regions = _UnionFind(range(len(ids)))
+    pieces = _UnionFind(range(len(ids)))
+    openings = [0] * len(ids)
+    cycle_ids = list()
+    for edge in grid.edges():
+        a_id = ids.get(edge._neighbor_1_index)
+        b_id = ids.get(edge._neighbor_2_index)
+        is_path = edge.viz_style == path_style
+        if (a_id is None) or (b_id is None):
+            # border edge. only the existing shape can open it
+            if is_path:
+                openings[b_id if a_id is None else a_id] += 1
+            continue
+        regions.union(a_id, b_id)
+        if is_path and not pieces.union(a_id, b_id):
+            cycle_ids.append(a_id)  # already connected ==> cycle
+    # collect the stats of each region
+    stats = dict()
+    for i in range(len(ids)):
+        region_stats = stats.setdefault(regions.find(i), {
+            'shapes': 0, 'passages': 0, 'cycles': 0, 'pieces': 0,
+            'border_openings': 0, 'entrance': None, 'exit': None,
+            'errors': list()})
+        region_stats['shapes'] += 1
+        region_stats['border_openings'] += openings[i]
+        if pieces.find(i) == i:
+            region_stats['pieces'] += 1
+    for i in cycle_ids:
+        stats[regions.find(i)]['cycles'] += 1
+    for region_stats in stats.values():
+        # spanning tree: every shape reached by exactly shapes - 1 passages
+        region_stats['passages'] = (region_stats['shapes']
+                                    - region_stats['pieces']
+                                    + region_stats['cycles'])
+    # match in/out pairs to regions
+    errors = list()
+    for entrance, exit_space in maze.entrance_exit_pairs():
+        entrance_id = ids.get(entrance.index())
+        exit_id = ids.get(exit_space.index())
+        if (entrance_id is None) or (exit_id is None):
+            errors.append('In/out pair {} -> {} is not in the grid.'
+                          ''.format(entrance.index(), exit_space.index()))
+            continue
+        region_stats = stats[regions.find(entrance_id)]
+        if regions.find(exit_id) != regions.find(entrance_id):
+            region_stats['errors'].append(
+                'Exit {} is not in the same region as entrance {}.'
+                ''.format(exit_space.index(), entrance.index()))
+        if region_stats['entrance'] is not None:
+            region_stats['errors'].append('Region has more than one in/out.')
+        region_stats['entrance'] = entrance.index()
+        region_stats['exit'] = exit_space.index()
+        for name, i in (('Entrance', entrance_id), ('Exit', exit_id)):
+            if openings[i] != 1:
+                region_stats['errors'].append(
+                    '{} opens {} border walls instead of 1.'
+                    ''.format(name, openings[i]))
+        expected_openings = 1 if entrance_id == exit_id else 2
+        if region_stats['border_openings'] != expected_openings:
+            region_stats['errors'].append(
+                'Region opens {} border walls instead of {}.'
+                ''.format(region_stats['border_openings'], expected_openings))
+    for region_stats in stats.values():
+        if region_stats['entrance'] is None:
+            region_stats['errors'].append('Region has no in/out.')
+        if region_stats['cycles']:
+            region_stats['errors'].append(
+                'Region has {} cycles.'.format(region_stats['cycles']))
+        if region_stats['pieces'] > 1:
+            region_stats['errors'].append(
+                'Region is split into {} unreachable pieces.'
+                ''.format(region_stats['pieces']))
+        errors.extend(region_stats['errors'])
+    return {'valid': not errors,
+            'errors': errors,
+            'regions': list(stats.values())}
+
+
+if __name__ == '__main__':
+    pass
@@ -27,6 +27,7 @@ setup(
     keywords='mazes tesselation',
     packages=find_packages(exclude=['contrib', 'docs', 'tests*']),
     install_requires=['PILLOW'],
+    extras_require={'numpy': ['numpy']},
     include_package_data=True,
     entry_points={
         'console_scripts': [
@@ -0,0 +1,100 @@
+"""Send many maze requests to a local maze server and report the throughput.
+
+Starts its own server unless --url is given. For example:
+
+    python load_test.py --requests 200 --clients 8 --seeds 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+from polymaze import server as _server
+
+# silly workaround to allow py2 or py3
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a maze server.')
+    parser.add_argument('--url', help='Server to test (default: start one).')
+    parser.add_argument('--processes', type=int,
+                        help='Worker processes of the started server.')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=4,
+                        help='Requests sent at the same time.')
+    parser.add_argument('--seeds', type=int, default=10,
+                        help='Different mazes requested. Repeats are cached.')
+    parser.add_argument('--complexity', type=float, default=1.0)
+    args = parser.parse_args()
+    server = None
+    url = args.url
+    if url is None:
+        server = _server.MazeServer(('127.0.0.1', 0), processes=args.processes)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = 'http://{}:{}'.format(*server.server_address)
+    try:
+        run(url, args.requests, args.clients, args.seeds, args.complexity)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+def run(url, request_count, client_count, seed_count, complexity):
+    latencies = list()
+    errors = list()
+    lock = threading.Lock()
+    next_request = [0]
+
+    def client():
+        while True:
+            with lock:
+                i = next_request[0]
+                next_request[0] += 1
+            if i >= request_count:
+                return
+            params = {'seed': i % seed_count, 'complexity': complexity}
+            request = Request(url + '/maze',
+                              data=json.dumps(params).encode('utf-8'),
+                              headers={'Content-Type': 'application/json'})
+            start = time.time()
+            try:
+                urlopen(request).read()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append(time.time() - start)
+
+    start = time.time()
+    clients = [threading.Thread(target=client) for _ in range(client_count)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.time() - start
+    latencies.sort()
+    status = json.loads(urlopen(url + '/status').read().decode('utf-8'))
+    print('{} requests in {:.2f}s ({:.1f} per second), {} errors'
+          ''.format(len(latencies), elapsed, len(latencies) / elapsed,
+                    len(errors)))
+    if latencies:
+        print('latency: median {:.3f}s, 95% {:.3f}s, max {:.3f}s'
+              ''.format(latencies[len(latencies) // 2],
+                        latencies[int(len(latencies) * 0.95)],
+                        latencies[-1]))
+    print('server cache: {}'.format(status))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import cli
+from polymaze import storage
+from polymaze.progress import Cancelled
+
+try:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from polymaze import aio
+except ImportError:
+    aio = None  # py2
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+#noinspection PyProtectedMember
+@unittest.skipIf(aio is None, 'asyncio is not available')
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(1)
+        self.loop.set_default_executor(self.executor)
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_task(self, make_task):
+        """Return the result of the task made while the loop is running."""
+        tasks = list()
+        self.loop.call_soon(lambda: tasks.append(make_task()))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        return self.loop.run_until_complete(tasks[0])
+
+    def test_make_maze_makes_the_same_maze_as_make_maze(self):
+        maze = self.run_task(lambda: aio.make_maze(seed=4, complexity=0.3))
+        expected = pmz.make_maze(seed=4, complexity=0.3)
+        self.assertEqual(list(maze.passages_csr(use_numpy=False)['neighbors']),
+                         list(expected.passages_csr(use_numpy=False)
+                              ['neighbors']))
+        self.assertEqual([(a.index(), b.index())
+                          for a, b in maze.entrance_exit_pairs()],
+                         [(a.index(), b.index())
+                          for a, b in expected.entrance_exit_pairs()])
+
+    def test_make_maze_image_returns_maze_and_its_image(self):
+        maze, image = self.run_task(
+            lambda: aio.make_maze_image(seed=4, complexity=0.3))
+        self.assertEqual(image.size, maze.image().size)
+
+    def test_seeded_maze_is_the_same_while_unseeded_ones_are_made(self):
+        expected = storage.dumps(self.run_task(
+            lambda: aio.make_maze(seed=3, complexity=6)))
+        executor = ThreadPoolExecutor(4)
+        try:
+            mazes = self.run_task(lambda: asyncio.gather(*[
+                aio.make_maze(seed=seed, complexity=6, executor=executor)
+                for seed in (None, 3, None, None)]))
+        finally:
+            executor.shutdown(wait=True)
+        self.assertEqual(storage.dumps(mazes[1]), expected)
+
+    def test_timeout_raises_TimeoutError_and_stops_the_work(self):
+        self.assertRaises(asyncio.TimeoutError, self.run_task,
+                          lambda: aio.make_maze(complexity=20, timeout=0.01))
+
+    def test_work_stops_inside_carving_when_cancelled(self):
+        cancel = aio.CancelToken()
+        phases = list()
+
+        def cancel_during_carving(fraction, phase, items):
+            phases.append((phase, fraction))
+            if phase == 'carve':
+                cancel.cancel()
+        self.assertRaises(Cancelled, aio._make_maze, cancel,
+                          {'complexity': 3, 'progress': cancel_during_carving})
+        self.assertEqual(phases[-1], ('carve', 0.0))
+
+    def test_work_does_not_start_when_already_cancelled(self):
+        cancel = aio.CancelToken()
+        cancel.cancel()
+        with mock.patch.object(cli, '_make_grid') as m_make_grid:
+            self.assertRaises(Cancelled, aio._make_maze, cancel,
+                              {'seed': 1})
+        self.assertFalse(m_make_grid.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+import PIL.Image
+import PIL.ImageChops
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import animation
+
+
+#noinspection PyProtectedMember
+class TestAnimation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_last_apng_frame_is_the_finished_maze(self):
+        path = os.path.join(self.directory, 'maze.png')
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            maze = animation.save_animation(generic_grid(ss), path,
+                                            steps_per_frame=5)
+            image = PIL.Image.open(path)
+            self.assertGreater(image.n_frames, 2)
+            image.seek(image.n_frames - 1)
+            difference = PIL.ImageChops.difference(image.convert('RGBA'),
+                                                   maze.image())
+            self.assertIsNone(difference.getbbox())
+            image.close()
+
+    def test_last_frame_is_identical_to_the_image_of_the_maze(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            for seed in (1, 7, 11):
+                random.seed(seed)
+                grid = pmz.PolyGrid(supershape=ss)
+                grid.create_rectangle(complexity=2)
+                maze = pmz.Maze(grid, carve=False)
+                for image, _ in animation._frames(maze, steps_per_frame=7):
+                    pass
+                self.assertEqual(image.tobytes(), maze.image().tobytes(),
+                                 '{} seed {}'.format(ss.name(), seed))
+
+    def test_later_apng_frames_only_hold_the_changed_region(self):
+        maze = pmz.Maze(generic_grid(), carve=False)
+        frames = animation._frames(maze, steps_per_frame=1)
+        image, box = next(frames)
+        self.assertIsNone(box)
+        width, height = image.size
+        for _, box in frames:
+            left, top, right, bottom = box
+            self.assertLess((right - left) * (bottom - top), width * height)
+
+    def test_gif_has_a_frame_for_each_batch_of_steps(self):
+        path = os.path.join(self.directory, 'maze.gif')
+        animation.save_animation(generic_grid(), path, steps_per_frame=10)
+        image = PIL.Image.open(path)
+        self.assertGreater(image.n_frames, 2)
+        image.close()
+
+    def test_gif_frames_are_made_while_saving_instead_of_all_before(self):
+        made = list()
+        frames = animation._frames
+
+        def counted_frames(*args):
+            for frame in frames(*args):
+                made.append(frame[1])
+                yield frame
+        made_before_saving = list()
+        with mock.patch.object(animation, '_frames', counted_frames):
+            with mock.patch.object(PIL.Image.Image, 'save',
+                                   lambda *args, **kwargs:
+                                   made_before_saving.append(len(made))):
+                animation.save_animation(
+                    generic_grid(), os.path.join(self.directory, 'maze.gif'),
+                    steps_per_frame=10)
+        self.assertEqual(made_before_saving, [1])
+
+
+def generic_grid(supershape=None):
+    random.seed(0)
+    grid = pmz.PolyGrid(supershape=supershape)
+    grid.create_rectangle(complexity=1)
+    return grid
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+from polymaze import batch
+from polymaze import cli
+
+
+#noinspection PyProtectedMember
+class TestPipeline(unittest.TestCase):
+    def test_pipeline_returns_results_of_last_stage_in_order_of_items(self):
+        stages = (('double', lambda v: 2 * v, 1),
+                  ('add', lambda v: v + 1, 3))
+        results, report = batch.pipeline(range(20), stages)
+        self.assertEqual(results, [2 * v + 1 for v in range(20)])
+        self.assertEqual(report['items'], 20)
+        self.assertEqual(sorted(report['busy']), ['add', 'double'])
+        self.assertEqual(sorted(report['cpu']), ['add', 'double'])
+
+    def test_pipeline_overlaps_stages(self):
+        def wait(v):
+            time.sleep(0.02)
+            return v
+        stages = (('a', wait, 1), ('b', wait, 1), ('c', wait, 1))
+        _, report = batch.pipeline(range(10), stages)
+        # sequentially this would take 30 waits. overlapped about 12
+        self.assertGreater(report['overlap'], 1.5)
+        self.assertLess(report['elapsed'], sum(report['busy'].values()))
+
+    def test_pipeline_limits_items_waiting_between_stages(self):
+        lock = threading.Lock()
+        in_flight = [0]
+        most_in_flight = [0]
+
+        def fast(v):
+            with lock:
+                in_flight[0] += 1
+                most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+            return v
+
+        def slow(v):
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return v
+        batch.pipeline(range(30), (('fast', fast, 1), ('slow', slow, 1)),
+                       queue_size=2)
+        # queue + item in each stage
+        self.assertLessEqual(most_in_flight[0], 4)
+
+    def test_pipeline_raises_the_first_error_of_any_stage(self):
+        def fail_on_three(v):
+            if v == 3:
+                raise RuntimeError('three')
+            return v
+        stages = (('a', lambda v: v, 1), ('b', fail_on_three, 2))
+        self.assertRaises(RuntimeError, batch.pipeline, range(50), stages)
+
+
+#noinspection PyProtectedMember
+class TestMakeAndSaveMazes(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_saves_the_same_mazes_as_saving_one_at_a_time(self):
+        base = os.path.join(self.directory, 'maze')
+        report = cli.make_and_save_mazes(3, 'Rectangle', base, seed=5,
+                                         complexity=0.3)
+        self.assertEqual(report['items'], 3)
+        for i in range(3):
+            maze = cli.make_maze(seed=5 + i, complexity=0.3)
+            single = os.path.join(self.directory, 'single')
+            cli.save_maze(maze, 'Rectangle', single)
+            with open(single + '.png', 'rb') as f:
+                expected = f.read()
+            with open('{} {}.png'.format(base, i + 1), 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
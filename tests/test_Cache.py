@@ -0,0 +1,94 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import cache as _cache_module
+from polymaze import cli as _cli_module
+from polymaze import polygrid as _polygrid_module
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+#noinspection PyProtectedMember
+class TestMazeCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_returns_bytes_that_were_put(self):
+        cache = pmz.MazeCache(self.directory)
+        cache.put('somekey', 'png', b'asdf')
+        self.assertEqual(cache.get('somekey', 'png'), b'asdf')
+
+    def test_get_returns_None_for_missing_entries(self):
+        cache = pmz.MazeCache(self.directory)
+        self.assertIsNone(cache.get('somekey', 'png'))
+        self.assertIsNone(cache.get_maze('somekey'))
+
+    def test_least_recently_used_entries_are_evicted_first(self):
+        cache = pmz.MazeCache(self.directory, max_bytes=25)
+        cache.put('a', 'png', b'0' * 10)
+        cache.put('b', 'png', b'0' * 10)
+        # make sure "a" is more recently used than "b"
+        past = time.time() - 100
+        os.utime(cache._path('b', 'png'), (past, past))
+        cache.get('a', 'png')
+        cache.put('c', 'png', b'0' * 10)
+        self.assertIsNone(cache.get('b', 'png'))
+        self.assertIsNotNone(cache.get('a', 'png'))
+        self.assertIsNotNone(cache.get('c', 'png'))
+
+    def test_cache_key_depends_on_every_parameter(self):
+        key = _cache_module.cache_key(text='asdf', seed=1, complexity=2.0)
+        same_key = _cache_module.cache_key(complexity=2.0, seed=1, text='asdf')
+        other_key = _cache_module.cache_key(text='asdf', seed=2, complexity=2.0)
+        self.assertEqual(key, same_key)
+        self.assertNotEqual(key, other_key)
+
+    def test_make_maze_uses_cached_maze_before_any_grid_work(self):
+        cache = pmz.MazeCache(self.directory)
+        maze = pmz.make_maze(seed=1, complexity=0.3, cache=cache)
+        with mock.patch.object(_polygrid_module.PolyGrid,
+                               'create_from_image') as m_create:
+            cached_maze = pmz.make_maze(seed=1, complexity=0.3, cache=cache)
+            self.assertFalse(m_create.called)
+        self.assertEqual(cached_maze.shape_name(), maze.shape_name())
+        self.assertEqual(len(tuple(cached_maze._grid.shapes())),
+                         len(tuple(maze._grid.shapes())))
+
+    def test_cache_key_of_make_maze_depends_on_carving_in_a_pool(self):
+        cache = pmz.MazeCache(self.directory)
+        with mock.patch.object(_cli_module, 'cache_key',
+                               wraps=_cache_module.cache_key) as m_key:
+            for processes in (None, 1, 2, 4):
+                pmz.make_maze(seed=1, complexity=0.3, cache=cache,
+                              processes=processes)
+        serial_1, serial_2, parallel_1, parallel_2 = [
+            _cache_module.cache_key(**kwargs)
+            for _, kwargs in m_key.call_args_list]
+        self.assertEqual(serial_1, serial_2)
+        self.assertEqual(parallel_1, parallel_2)
+        self.assertNotEqual(serial_1, parallel_1)
+
+    def test_make_maze_with_same_seed_makes_same_maze(self):
+        maze = pmz.make_maze(seed=3, complexity=0.3)
+        same_maze = pmz.make_maze(seed=3, complexity=0.3)
+        self.assertEqual(maze.shape_name(), same_maze.shape_name())
+        self.assertEqual(list(maze.passages_csr(use_numpy=False)['neighbors']),
+                         list(same_maze.passages_csr(use_numpy=False)
+                              ['neighbors']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,14 @@ import os
 import sys
 import unittest
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
 import polymaze as pmz
+from polymaze import maze as _maze_module
 
 # silly workaround to allow tests to work in py2 or py3
 try:
@@ -14,7 +20,10 @@ except AttributeError:
 
 #noinspection PyProtectedMember
 class TestMaze(unittest.TestCase):
-    #todo: to really test this, need to confirm all graph nodes lead to in/out
+    def test_mazify_grid_makes_a_perfect_maze_for_every_region(self):
+        maze = generic_maze()
+        report = maze.validate()
+        self.assertTrue(report['valid'], report['errors'])
 
     def test_shape_name_provides_it(self):
         ss = next(iter(pmz.SUPERSHAPES_DICT.values()))  # test any value
@@ -48,6 +57,119 @@ class TestMaze(unittest.TestCase):
         for entrance_exit_pair in entrance_exit_pairs:
             self.assertEqual(len(entrance_exit_pair), 2)
 
+    def test_parallel_mazify_makes_in_out_pair_for_each_region(self):
+        square = pmz.SUPERSHAPES_DICT['Square']
+        grid = pmz.PolyGrid(supershape=square)
+        # make two separate 3x3 regions and an isolated shape
+        for row in range(3):
+            for col in range(3):
+                grid.create((row, col))
+                grid.create((row, col + 10))
+        isolated_index = (20, 20)
+        grid.create(isolated_index)
+        maze = pmz.Maze(grid, processes=2)
+        # confirm the isolated shape has been removed
+        self.assertIsNone(grid.get(isolated_index))
+        # confirm each region got exactly one pair and every shape is pathed
+        self.assertEqual(len(maze.entrance_exit_pairs()), 2)
+        for space in grid.shapes():
+            self.assertTrue(maze._has_paths(space))
+
+    def test_parallel_mazify_carves_spanning_tree_in_each_region(self):
+        square = pmz.SUPERSHAPES_DICT['Square']
+        grid = pmz.PolyGrid(supershape=square)
+        for row in range(4):
+            for col in range(4):
+                grid.create((row, col))
+                grid.create((row + 10, col))
+        maze = pmz.Maze(grid, processes=2)
+        # a perfect maze has exactly one less passage than shapes per region
+        passages = 0
+        for shape in grid.shapes():
+            for n_index, edge in shape._owned_edges.items():
+                if edge.viz_style == maze._PATH_STYLE and grid.get(n_index):
+                    passages += 1
+        self.assertEqual(passages, 2 * (16 - 1))
+
+    def test_parallel_mazify_makes_perfect_mazes_of_all_supershapes(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            grid = pmz.PolyGrid(supershape=ss)
+            grid.create_rectangle(complexity=1)
+            # a copy of the rectangle far away is a second region
+            rows = ss.period()[0] * (max(row for row, _ in grid._shapes) + 2)
+            for index in tuple(grid._shapes):
+                grid.create((index[0] + rows, index[1]))
+            maze = pmz.Maze(grid, processes=2)
+            report = maze.validate()
+            self.assertTrue(report['valid'], (ss.name(), report['errors']))
+            self.assertEqual(len(maze.entrance_exit_pairs()), 2)
+
+    def test_tiled_mazify_stitches_tiles_into_one_perfect_maze(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            grid = pmz.PolyGrid(supershape=ss)
+            grid.create_rectangle(complexity=1)
+            maze = pmz.Maze(grid, tile_size=(5, 5))
+            shape_count = len(tuple(grid.shapes()))
+            # confirm one region with all shapes reachable from the entrance
+            (entrance, exit_space), = maze.entrance_exit_pairs()
+            reached = {entrance.index()}
+            passages = 0
+            unvisited = [entrance]
+            while unvisited:
+                space = unvisited.pop()
+                for n_index, edge in space.edges():
+                    neighbor = grid.get(n_index)
+                    if edge.viz_style != maze._PATH_STYLE or not neighbor:
+                        continue
+                    passages += 1
+                    if n_index not in reached:
+                        reached.add(n_index)
+                        unvisited.append(neighbor)
+            self.assertEqual(len(reached), shape_count)
+            # confirm there are no cycles (each passage counted from both sides)
+            self.assertEqual(passages, 2 * (shape_count - 1))
+
+    def test_carve_false_leaves_grid_uncarved(self):
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=.5)
+        maze = pmz.Maze(grid, carve=False)
+        self.assertEqual(maze.entrance_exit_pairs(), ())
+        self.assertFalse(any(maze._has_paths(shape) for shape in grid.shapes()))
+
+    def test_carve_steps_makes_a_perfect_maze(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            grid = pmz.PolyGrid(supershape=ss)
+            grid.create_rectangle(complexity=.5)
+            maze = pmz.Maze(grid, carve=False)
+            events = list(maze.carve_steps())
+            self.assertEqual(events[0], ('start', None))
+            pairs = tuple(item for kind, item in events if kind == 'pair')
+            self.assertEqual(maze.entrance_exit_pairs(), pairs)
+            self.assertTrue(maze.validate()['valid'])
+
+    def test_carve_steps_report_each_opened_edge_once(self):
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=.5)
+        maze = pmz.Maze(grid, carve=False)
+        opened = [item for kind, item in maze.carve_steps() if kind == 'edge']
+        paths = [edge for edge in grid.edges()
+                 if edge.viz_style == maze._PATH_STYLE]
+        self.assertEqual(len(opened), len(set(opened)))
+        _assertCountEqual(self, opened, paths)
+
+    def test_align_tile_size_rounds_up_to_whole_supershapes(self):
+        polycat = pmz.SUPERSHAPES_DICT['Polycat']
+        self.assertEqual(polycat.period(), (4, 3))
+        aligned = _maze_module._align_tile_size((5, 3), polycat.period())
+        self.assertEqual(aligned, (8, 3))
+
+    def test_passages_csr_has_two_entries_for_each_passage(self):
+        maze = generic_maze()
+        csr = maze.passages_csr(use_numpy=False)
+        shape_count = len(tuple(maze._grid.shapes()))
+        # a perfect maze has one less passage than shapes
+        self.assertEqual(len(csr['neighbors']), 2 * (shape_count - 1))
+
     def test_has_paths_returns_false_if_edges_are_all_walls(self):
         maze = generic_maze()
         # choose any space from the maze's grid and set all edges to wall
@@ -76,6 +198,97 @@ class TestMaze(unittest.TestCase):
         # confirm it has an image method
         self.assertTrue(hasattr(im, 'crop'))
 
+    def test_image_is_rendered_once_and_copied(self):
+        maze = generic_maze()
+        with mock.patch.object(maze._viz, '_render',
+                               wraps=maze._viz._render) as viz_image:
+            first = maze.image()
+            first.paste((1, 2, 3, 4), (0, 0) + first.size)  # caller's copy
+            second = maze.image()
+        self.assertEqual(viz_image.call_count, 1)
+        self.assertNotEqual(first.tobytes(), second.tobytes())
+
+    def test_image_that_is_not_kept_is_neither_cached_nor_copied(self):
+        maze = generic_maze()
+        with mock.patch.object(maze._viz, '_render',
+                               wraps=maze._viz._render) as viz_render:
+            with mock.patch('PIL.Image.Image.copy') as image_copy:
+                maze.image(keep=False)
+            self.assertFalse(image_copy.called)
+            self.assertFalse(maze._base_is_current())
+            maze.image()
+        self.assertEqual(viz_render.call_count, 2)
+
+    def test_image_is_rendered_again_after_carve_steps(self):
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=.5)
+        maze = pmz.Maze(grid, carve=False)
+        steps = maze.carve_steps()
+        next(steps)  # walls are up
+        uncarved = maze.image()
+        for _ in steps:
+            pass
+        self.assertNotEqual(maze.image().tobytes(), uncarved.tobytes())
+
+    def test_image_is_rendered_again_after_the_grid_or_styles_change(self):
+        maze = generic_maze()
+        removed, restyled = list(maze._grid.shapes())[:2]
+        changes = (lambda: maze._grid.remove(removed.index()),
+                   lambda: setattr(restyled, 'viz_style', maze._EXIT_STYLE),
+                   lambda: maze._viz.new_shape_style(maze._FLOOR_STYLE,
+                                                     (0, 0, 255, 255)))
+        for change in changes:
+            before = maze.image()
+            change()
+            self.assertNotEqual(maze.image().tobytes(), before.tobytes())
+
+    def test_image_is_rendered_again_after_invalidate(self):
+        maze = generic_maze()
+        with mock.patch.object(maze._viz, '_render',
+                               wraps=maze._viz._render) as viz_render:
+            maze.image()
+            maze.image()
+            maze.invalidate()
+            maze.image()
+        self.assertEqual(viz_render.call_count, 2)
+
+    def test_solution_image_draws_on_a_copy_of_the_image(self):
+        maze = generic_maze()
+        image = maze.image()
+        solution_image = maze.solution_image()
+        self.assertEqual(solution_image.size, image.size)
+        self.assertNotEqual(solution_image.tobytes(), image.tobytes())
+        # drawn on a copy
+        self.assertEqual(maze.image().tobytes(), image.tobytes())
+
+    def test_preview_fits_in_size(self):
+        maze = generic_maze()
+        for size in ((300, 300), (40, 20), (5, 5)):
+            width, height = maze.preview(size).size
+            self.assertLessEqual(width, size[0])
+            self.assertLessEqual(height, size[1])
+            self.assertTrue(width == size[0] or height == size[1])
+
+    def test_tiny_preview_shades_pixels_by_wall_density(self):
+        maze = generic_maze()
+        preview = maze.preview((8, 8))
+        alphas = set(preview.getchannel('A').getdata())
+        self.assertIn(255, alphas)  # the pixels with the most walls
+        self.assertGreater(len(alphas), 2)  # and shades between
+
+    def test_image_and_preview_render_the_image_once(self):
+        maze = generic_maze()
+        with mock.patch.object(maze._viz, '_render',
+                               wraps=maze._viz._render) as viz_render:
+            image, preview = maze.image_and_preview((50, 50))
+            self.assertEqual(image.tobytes(), maze.image().tobytes())
+        self.assertEqual(viz_render.call_count, 1)
+        self.assertLessEqual(max(preview.size), 50)
+
+    def test_solution_image_returns_None_for_empty_grid(self):
+        maze = pmz.Maze(pmz.PolyGrid())
+        self.assertIsNone(maze.solution_image())
+
     def test_image_returns_None_for_empty_grid(self):
         # make and confirm an empty grid
         empty_grid = pmz.PolyGrid()
@@ -0,0 +1,138 @@
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import PIL.Image
+import PIL.ImageChops
+
+import polymaze as pmz
+from polymaze import pages
+from tests.test_Maze import generic_maze
+
+
+#noinspection PyProtectedMember
+class TestSavePages(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_each_png_page_is_the_same_as_that_part_of_the_full_image(self):
+        maze = generic_maze()
+        dpi, overlap = 100, 0.3
+        report = maze.save_pages(os.path.join(self.directory, 'maze.png'),
+                                 page_size=(3, 2), dpi=dpi, overlap=overlap,
+                                 margin=0.1)
+        self.assertEqual(len(report['paths']),
+                         report['rows'] * report['columns'])
+        self.assertGreater(len(report['paths']), 1)
+        full = on_white(maze.image())
+        width, height = report['page_pixels']
+        step_x, step_y = width - 30, height - 30
+        for number, path in enumerate(report['paths']):
+            row, column = divmod(number, report['columns'])
+            left, top = column * step_x, row * step_y
+            expected = PIL.Image.new('RGB', (width, height), (255, 255, 255))
+            expected.paste(full.crop((left, top,
+                                      min(left + width, full.size[0]),
+                                      min(top + height, full.size[1]))))
+            page = PIL.Image.open(path).convert('RGB')
+            self.assertIsNone(
+                PIL.ImageChops.difference(page, expected).getbbox())
+
+    def test_pdf_has_a_page_for_each_part_and_a_valid_xref(self):
+        path = os.path.join(self.directory, 'maze.pdf')
+        report = generic_maze().save_pages(path, page_size='Letter', dpi=50,
+                                           columns=2)
+        self.assertEqual(report['columns'], 2)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b'%PDF-1.4'))
+        self.assertTrue(data.endswith(b'%%EOF\n'))
+        page_count = report['rows'] * report['columns']
+        self.assertIn('/Count {} '.format(page_count).encode('ascii'), data)
+        self.assertEqual(data.count(b'/Type /Page '), page_count)
+        # every object in the cross-reference table is at its offset
+        xref = int(re.search(br'startxref\n(\d+)', data).group(1))
+        self.assertTrue(data[xref:].startswith(b'xref\n'))
+        offsets = re.findall(br'(\d{10}) 00000 n ', data[xref:])
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(data[int(offset):].startswith(
+                '{} 0 obj'.format(number).encode('ascii')))
+
+    def test_overlap_that_fills_the_page_raises_ValueError(self):
+        self.assertRaises(ValueError, generic_maze().save_pages,
+                          os.path.join(self.directory, 'maze.pdf'),
+                          page_size=(2, 2), overlap=1.5, margin=0.25)
+
+    def test_drawing_buffer_of_each_page_is_about_one_page(self):
+        new_image = PIL.Image.new
+        for name in ('Square', 'Triangle', 'Hexagon'):
+            sizes = list()
+
+            def recording_new(mode, size, *args, **kwargs):
+                sizes.append(size)
+                return new_image(mode, size, *args, **kwargs)
+            maze = generic_maze(supershape=pmz.SUPERSHAPES_DICT[name],
+                                complexity=10)
+            with mock.patch.object(PIL.Image, 'new', recording_new):
+                report = maze.save_pages(
+                    os.path.join(self.directory, 'maze.pdf'),
+                    page_size='A4', dpi=50, columns=6)
+            width, height = report['page_pixels']
+            largest = max(w * h for w, h in sizes)
+            self.assertLess(largest, 1.5 * width * height, name)
+
+    def test_empty_grid_writes_nothing(self):
+        maze = pmz.Maze(pmz.PolyGrid())
+        self.assertIsNone(maze.save_pages(os.path.join(self.directory,
+                                                       'maze.pdf')))
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+#noinspection PyProtectedMember
+class TestPageGeometry(unittest.TestCase):
+    def test_items_in_the_overlap_are_on_both_pages(self):
+        page_pixels, steps, counts = (100, 100), (80, 80), (3, 3)
+        # pages in a row cover x 0-99, 80-179 and 160-259
+        self.assertEqual(list(pages._pages([(90, 10)], 0, page_pixels, steps,
+                                           counts)), [0, 1])
+        self.assertEqual(list(pages._pages([(50, 10)], 0, page_pixels, steps,
+                                           counts)), [0])
+        self.assertEqual(list(pages._pages([(50, 10)], 40, page_pixels, steps,
+                                           counts)), [0, 1])
+        self.assertEqual(list(pages._pages([(250, 250)], 0, page_pixels,
+                                           steps, counts)), [8])
+
+    def test_pages_keep_item_numbers_until_they_are_drawn(self):
+        viz = generic_maze()._viz
+        bounds, polygons, walls = viz._geometry(merge=False)
+        frame = viz._fit(bounds)
+        page_polygons, page_walls = pages._page_items(
+            viz, frame, polygons, walls, (200, 200), (150, 150), (5, 5))
+        self.assertTrue(page_polygons and page_walls)
+        for items in list(page_polygons.values()) + list(page_walls.values()):
+            self.assertTrue(all(isinstance(i, int) for i in items))
+        numbers = sorted(set(i for items in page_polygons.values()
+                             for i in items))
+        self.assertEqual(numbers, list(range(len(polygons))))
+
+
+def on_white(image):
+    white = PIL.Image.new('RGBA', image.size, (255, 255, 255, 255))
+    white.alpha_composite(image)
+    return white.convert('RGB')
+
+
+if __name__ == '__main__':
+    unittest.main()
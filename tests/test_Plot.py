@@ -0,0 +1,111 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import plot
+from tests.test_Maze import generic_maze
+
+
+#noinspection PyProtectedMember
+class TestPlan(unittest.TestCase):
+    def test_each_wall_is_drawn_exactly_once_for_all_supershapes(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            maze = generic_maze(supershape=ss)
+            plotted = maze.plot()
+            drawn = sorted(segment_key(a, b)
+                           for _, polylines in plotted['layers']
+                           for polyline in polylines
+                           for a, b in zip(polyline, polyline[1:]))
+            self.assertEqual(drawn, wall_keys(maze._viz))
+
+    def test_ordering_reduces_travel_but_not_drawing(self):
+        maze = generic_maze()
+        ordered, unordered = maze.plot(), maze.plot(optimize=False)
+        self.assertAlmostEqual(ordered['draw_distance'],
+                               unordered['draw_distance'], places=3)
+        self.assertEqual(ordered['pen_lifts'], unordered['pen_lifts'])
+        self.assertLess(ordered['travel_distance'],
+                        unordered['travel_distance'])
+        self.assertLess(ordered['travel_distance'],
+                        ordered['edge_order_travel_distance'])
+
+    def test_empty_grid_has_no_plan(self):
+        self.assertIsNone(pmz.Maze(pmz.PolyGrid()).plot())
+
+
+#noinspection PyProtectedMember
+class TestPolylines(unittest.TestCase):
+    def test_closed_loop_is_one_polyline(self):
+        square = [((0, 0), (1, 0)), ((1, 0), (1, 1)),
+                  ((1, 1), (0, 1)), ((0, 1), (0, 0))]
+        polylines = plot._polylines(square)
+        self.assertEqual(len(polylines), 1)
+        self.assertEqual(len(polylines[0]), 5)
+        self.assertEqual(polylines[0][0], polylines[0][-1])
+
+    def test_one_polyline_for_each_pair_of_odd_vertexes(self):
+        # a plus sign has 4 odd ends (and an even center) ==> 2 polylines
+        plus = [((0, 0), (1, 0)), ((0, 0), (-1, 0)),
+                ((0, 0), (0, 1)), ((0, 0), (0, -1))]
+        self.assertEqual(len(plot._polylines(plus)), 2)
+        # separate segments can not be joined
+        apart = [((0, 0), (1, 0)), ((5, 5), (6, 5))]
+        self.assertEqual(len(plot._polylines(apart)), 2)
+
+    def test_nearly_equal_vertexes_are_joined(self):
+        segments = [((0, 0), (1, 0)), ((1.0000000001, 0), (2, 0))]
+        self.assertEqual(len(plot._polylines(segments)), 1)
+
+
+#noinspection PyProtectedMember
+class TestOrdering(unittest.TestCase):
+    def test_nearest_neighbor_takes_the_closest_end_first(self):
+        far = [(10, 0), (11, 0)]
+        reversed_near = [(3, 0), (1, 0)]
+        ordered = plot._nearest_neighbor([far, reversed_near], (0, 0))
+        self.assertEqual(ordered, [[(1, 0), (3, 0)], far])
+
+    def test_two_opt_never_increases_travel(self):
+        random.seed(1)
+        polylines = [[(random.random() * 100, random.random() * 100)
+                      for _ in range(2)] for _ in range(200)]
+        start = (0.0, 0.0)
+        for ordered in (polylines, plot._nearest_neighbor(polylines, start)):
+            before, _ = plot._travel(ordered, 0.0, start)
+            after, _ = plot._travel(plot._two_opt(ordered, start), 0.0, start)
+            self.assertLessEqual(after, before + 1e-9)
+
+
+class TestOutput(unittest.TestCase):
+    def test_svg_and_hpgl_draw_each_polyline(self):
+        plotted = generic_maze().plot()
+        svg = plot.svg(plotted)
+        self.assertTrue(svg.startswith('<svg'))
+        self.assertEqual(svg.count('M'), plotted['pen_lifts'])
+        hpgl = plot.hpgl(plotted)
+        self.assertTrue(hpgl.startswith('IN;SP1;'))
+        self.assertTrue(hpgl.endswith('PU;SP0;\n'))
+        self.assertEqual(hpgl.count('PD'), plotted['pen_lifts'])
+
+
+#noinspection PyProtectedMember
+def wall_keys(viz):
+    bounds, _, walls = viz._geometry(polygons=False)
+    frame = viz._fit(bounds)
+
+    def point(vertex):
+        return (frame.scale * vertex[1] + frame.horz_offset_px,
+                frame.scale * vertex[0] + frame.vert_offset_px)
+    return sorted(segment_key(point(a), point(b)) for _, a, b in walls)
+
+
+def segment_key(a, b):
+    return tuple(sorted(((round(a[0], 3), round(a[1], 3)),
+                         (round(b[0], 3), round(b[1], 3)))))
+
+
+if __name__ == '__main__':
+    unittest.main()
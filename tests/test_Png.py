@@ -0,0 +1,45 @@
+import io
+import os
+import sys
+import unittest
+
+import PIL.Image
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+from polymaze import png
+
+
+class TestBandWriter(unittest.TestCase):
+    def test_bands_make_one_image(self):
+        image = generic_image()
+        f = io.BytesIO()
+        writer = png.BandWriter(f, image.size)
+        for top, bottom in ((0, 1), (1, 7), (7, 20)):
+            writer.write(image.crop((0, top, image.size[0], bottom)))
+        writer.close()
+        f.seek(0)
+        self.assertEqual(PIL.Image.open(f).convert('RGBA').tobytes(),
+                         image.tobytes())
+
+    def test_write_raises_ValueError_for_wrong_band_size(self):
+        writer = png.BandWriter(io.BytesIO(), (10, 4))
+        self.assertRaises(ValueError, writer.write,
+                          PIL.Image.new('RGBA', (9, 2)))
+        self.assertRaises(ValueError, writer.write,
+                          PIL.Image.new('RGBA', (10, 5)))
+
+    def test_close_raises_ValueError_if_rows_are_missing(self):
+        writer = png.BandWriter(io.BytesIO(), (10, 4))
+        writer.write(PIL.Image.new('RGBA', (10, 3)))
+        self.assertRaises(ValueError, writer.close)
+
+
+def generic_image():
+    image = PIL.Image.new('RGBA', (13, 20))
+    image.putdata([(x * 19 % 256, y * 13 % 256, (x * y) % 256, 255 - y)
+                   for y in range(20) for x in range(13)])
+    return image
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,15 @@ class TestPolyGrid_Creation(unittest.TestCase):
         m_crt_im_args = m_crt_im.call_args[0]
         self.assertIn(m_s_img.return_value, m_crt_im_args)
 
+    def test_index_count_is_at_least_the_shapes_created(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            for kwargs in ({}, {'complexity': 3, 'aspect': 0.3},
+                           {'width': 30}, {'width': 10, 'height': 20}):
+                grid = pmz.PolyGrid(supershape=ss)
+                count = grid.index_count(**kwargs)
+                grid.create_rectangle(**kwargs)
+                self.assertGreaterEqual(count, len(grid._shapes))
+
     def test_string_image_returns_a_PIL_image(self):
         some_string = 'asdf'
         image = _polygrid_module._string_image(some_string)
@@ -149,6 +158,16 @@ class TestPolyGrid_Creation(unittest.TestCase):
             self.assertLessEqual(size, size_max_spec)
 
 
+# noinspection PyProtectedMember
+class TestUnionFind(unittest.TestCase):
+    def test_union_joins_sets_once(self):
+        sets = _polygrid_module._UnionFind([(0, 0), (0, 1), (5, 5)])
+        self.assertTrue(sets.union((0, 0), (0, 1)))
+        self.assertFalse(sets.union((0, 1), (0, 0)))
+        self.assertEqual(sets.find((0, 0)), sets.find((0, 1)))
+        self.assertNotEqual(sets.find((0, 0)), sets.find((5, 5)))
+
+
 # noinspection PyProtectedMember
 class TestShapeGrid(unittest.TestCase):
     def test_produces_an_empty_grid(self):
@@ -232,6 +251,79 @@ class TestShapeGrid(unittest.TestCase):
         border_shapes = tuple(grid.border_shapes())
         _assertCountEqual(self, border_shapes, border_shapes_spec)
 
+    def test_to_csr_lists_the_neighbors_of_each_shape(self):
+        center_index = (1, 2)
+        grid = generic_grid(supershape=pmz.SUPERSHAPES_DICT['Square'],
+                            neighborhood_center_index=center_index)
+        csr = grid.to_csr(use_numpy=False)
+        ids = csr['ids']
+        offsets, neighbors = csr['offsets'], csr['neighbors']
+        self.assertEqual(len(offsets), len(ids) + 1)
+        # confirm each node maps back to its index
+        for index, node in ids.items():
+            self.assertEqual((csr['rows'][node], csr['cols'][node]), index)
+        # confirm the center has 4 neighbors and each neighbor only the center
+        center = ids[center_index]
+        center_neighbors = neighbors[offsets[center]:offsets[center + 1]]
+        _assertCountEqual(self, center_neighbors,
+                          [node for node in ids.values() if node != center])
+        for node in ids.values():
+            if node != center:
+                self.assertEqual(list(neighbors[offsets[node]:
+                                                offsets[node + 1]]),
+                                 [center])
+
+    def test_to_csr_uses_numpy_arrays_when_available(self):
+        grid = generic_grid(neighborhood_center_index=(1, 2))
+        csr = grid.to_csr()
+        if _polygrid_module.numpy is None:
+            self.assertTrue(hasattr(csr['neighbors'], 'typecode'))
+        else:
+            self.assertTrue(hasattr(csr['neighbors'], 'dtype'))
+            self.assertEqual(list(csr['neighbors']),
+                             list(grid.to_csr(use_numpy=False)['neighbors']))
+
+    def test_copy_has_same_shapes_with_shared_geometry(self):
+        grid = generic_grid(neighborhood_center_index=(1, 2))
+        copied = grid.copy()
+        _assertCountEqual(self, [s.index() for s in copied.shapes()],
+                          [s.index() for s in grid.shapes()])
+        for shape in copied.shapes():
+            original = grid.get(shape.index())
+            self.assertIsNot(shape, original)
+            self.assertIs(shape.grid(), copied)
+            self.assertIs(shape._edge_data, original._edge_data)
+        self.assertEqual(len(tuple(copied.edges())), len(tuple(grid.edges())))
+
+    def test_copy_keeps_styles_and_reports_later_changes_to_the_copy(self):
+        grid = generic_grid()
+        grid.create_rectangle(complexity=0.3)
+        maze = pmz.Maze(grid)
+        copied = grid.copy()
+        self.assertEqual([e.viz_style for e in copied.edges()],
+                         [e.viz_style for e in grid.edges()])
+        self.assertEqual([s.viz_style for s in copied.shapes()],
+                         [s.viz_style for s in grid.shapes()])
+        changes, copied_changes = grid._changes, copied._changes
+        next(iter(copied.edges())).viz_style = maze._WALL_STYLE
+        next(iter(copied.shapes())).viz_style = maze._FLOOR_STYLE
+        self.assertEqual(copied._changes, copied_changes + 2)
+        self.assertEqual(grid._changes, changes)
+
+    def test_mazes_made_from_copies_do_not_change_the_template(self):
+        template = generic_grid()
+        template.create_rectangle(complexity=0.3)
+        template_indexes = set(s.index() for s in template.shapes())
+        maze = pmz.Maze(template.copy())
+        self.assertTrue(maze.validate()['valid'])
+        # confirm the template still has no styles and the same shapes
+        self.assertEqual(set(s.index() for s in template.shapes()),
+                         template_indexes)
+        for shape in template.shapes():
+            self.assertIsNone(shape.viz_style)
+        for edge in template.edges():
+            self.assertIsNone(edge.viz_style)
+
     def test_remove_removes_shape_from_the_grid(self):
         # create a grid with one shape
         grid = generic_grid()
@@ -1,5 +1,11 @@
+import io
 import unittest
 
+import PIL.Image
+import PIL.ImageChops
+
+import polymaze as pmz
+from polymaze import polygrid as _polygrid_module
 from tests.test_PolyGrid import generic_grid
 from polymaze.polygrid import PolyGrid, PolyViz
 
@@ -12,6 +18,7 @@ except (AttributeError, ImportError):
     import mock
 
 
+# noinspection PyProtectedMember
 class TestPolyViz(unittest.TestCase):
     def test_provides_reference_to_related_grid(self):
         grid = generic_grid()
@@ -93,7 +100,65 @@ class TestPolyViz(unittest.TestCase):
         viz = PolyViz(empty_grid)
         self.assertIsNone(viz.image())
 
+    def test_stamped_image_looks_like_drawn_image(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            viz = generic_viz(generic_maze_grid(ss))
+            drawn, stamped = viz.image(), viz.image(method='stamp')
+            self.assertEqual(stamped.size, drawn.size)
+            # only pixels at wall ends and rounding
+            self.assertLess(changed_pixels(drawn, stamped),
+                            0.01 * drawn.size[0] * drawn.size[1])
+
+    def test_stamps_of_components_with_the_same_name_are_kept_apart(self):
+        viz = generic_viz(generic_maze_grid(pmz.SUPERSHAPES_DICT['Triangle']))
+        for shape in viz.grid.shapes():
+            shape._name = 'triangle'  # up and down triangles look alike
+        drawn, stamped = viz.image(), viz.image(method='stamp')
+        self.assertLess(changed_pixels(drawn, stamped),
+                        0.01 * drawn.size[0] * drawn.size[1])
+
+    def test_image_drawn_in_bands_by_processes_is_identical(self):
+        viz = generic_viz(generic_maze_grid())
+        self.assertEqual(viz.image(processes=2).tobytes(),
+                         viz.image().tobytes())
+
+    @mock.patch.object(_polygrid_module, '_MAX_BAND_PIXELS', 5000)
+    def test_save_png_streams_bands_of_the_image(self):
+        viz = generic_viz(generic_maze_grid(pmz.SUPERSHAPES_DICT['Hexagon']))
+        f = io.BytesIO()
+        self.assertTrue(viz.save_png(f))
+        f.seek(0)
+        saved = PIL.Image.open(f)
+        self.assertEqual(saved.convert('RGBA').tobytes(),
+                         viz.image().tobytes())
+
+    def test_save_png_writes_nothing_for_empty_grid(self):
+        viz = PolyViz(PolyGrid())
+        f = io.BytesIO()
+        self.assertFalse(viz.save_png(f))
+        self.assertEqual(f.getvalue(), b'')
+
+    def test_image_raises_ValueError_for_unknown_method(self):
+        viz = generic_viz()
+        self.assertRaises(ValueError, viz.image, method='paint')
+
 
 def generic_viz(grid=None):
     grid = grid or generic_grid(neighborhood_center_index=(0,0))
-    return PolyViz(grid)
\ No newline at end of file
+    viz = PolyViz(grid)
+    # open the passages of carved grids (see generic_maze_grid)
+    viz.new_edge_style(pmz.Maze._PATH_STYLE, color=(255, 255, 255, 0))
+    return viz
+
+
+def generic_maze_grid(supershape=None):
+    """Return a grid with a maze carved into it."""
+    grid = PolyGrid(supershape=supershape)
+    grid.create_rectangle(complexity=.5)
+    pmz.Maze(grid)
+    return grid
+
+
+def changed_pixels(image, other):
+    difference = PIL.ImageChops.difference(image, other)
+    return sum(1 for value in difference.convert('L').getdata() if value)
@@ -0,0 +1,110 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import PIL.Image
+import PIL.ImageDraw
+
+import polymaze as pmz
+from polymaze import progress as _progress
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+#noinspection PyProtectedMember
+class TestTracker(unittest.TestCase):
+    def test_tracker_is_None_without_progress_or_cancel(self):
+        self.assertIsNone(_progress.tracker('grid', 10))
+
+    def test_reports_are_limited_by_items_and_time(self):
+        reports = list()
+        tracker = _progress.tracker('render', 100000,
+                                    lambda *args: reports.append(args))
+        with mock.patch.object(_progress.time, 'time', return_value=1.0):
+            for i in range(100000):
+                tracker.update(i)
+        self.assertEqual(reports, [(0.0, 'render', 0)])
+
+    def test_finish_always_reports_the_whole_phase(self):
+        reports = list()
+        tracker = _progress.tracker('carve', 50,
+                                    lambda *args: reports.append(args))
+        tracker.update(0)
+        tracker.finish()
+        self.assertEqual(reports[-1], (1.0, 'carve', 50))
+
+    def test_cancelled_token_stops_the_work_at_the_next_check(self):
+        cancel = pmz.CancelToken()
+        tracker = _progress.tracker('grid', 1000, cancel=cancel)
+        tracker.update(0)
+        cancel.cancel()
+        tracker.update(1)  # between checks
+        self.assertRaises(pmz.Cancelled, tracker.update,
+                          _progress._ITEMS_PER_CHECK)
+
+
+#noinspection PyProtectedMember
+class TestPhases(unittest.TestCase):
+    def test_grid_carve_and_render_report_their_progress(self):
+        reports = list()
+
+        def progress(fraction, phase, items):
+            reports.append((phase, fraction))
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=2, progress=progress)
+        maze = pmz.Maze(grid, progress=progress)
+        maze.image(progress=progress)
+        phases = [phase for phase, _ in reports]
+        self.assertEqual(sorted(set(phases), key=phases.index),
+                         ['grid', 'carve', 'render'])
+        for phase in ('grid', 'carve', 'render'):
+            fractions = [f for p, f in reports if p == phase]
+            self.assertEqual(fractions[0], 0.0)
+            self.assertEqual(fractions[-1], 1.0)
+            self.assertEqual(fractions, sorted(fractions))
+
+    def test_parallel_tiled_and_stamped_work_report_their_progress(self):
+        for maze_kwargs, image_kwargs in (({'processes': 2}, {}),
+                                          ({'tile_size': (8, 8)},
+                                           {'method': 'stamp'}),
+                                          ({}, {'processes': 2})):
+            reports = list()
+
+            def progress(fraction, phase, items):
+                reports.append((phase, fraction))
+            grid = pmz.PolyGrid(supershape=pmz.SUPERSHAPES_DICT['Square'])
+            grid.create_from_image(generic_two_blob_image(), complexity=2)
+            maze = pmz.Maze(grid, progress=progress, **maze_kwargs)
+            maze._viz.image(progress=progress, **image_kwargs)
+            self.assertIn(('carve', 1.0), reports)
+            self.assertEqual(reports[-1], ('render', 1.0))
+
+    def test_cancel_stops_each_phase(self):
+        cancel = pmz.CancelToken()
+        cancel.cancel()
+        grid = pmz.PolyGrid()
+        self.assertRaises(pmz.Cancelled, grid.create_rectangle, complexity=1,
+                          cancel=cancel)
+        grid.create_rectangle(complexity=1)
+        self.assertRaises(pmz.Cancelled, pmz.Maze, grid.copy(), cancel=cancel)
+        maze = pmz.Maze(grid)
+        self.assertRaises(pmz.Cancelled, maze.image, cancel=cancel)
+        self.assertIsNotNone(maze.image())  # nothing cached by the failure
+
+
+def generic_two_blob_image():
+    """Return an image that makes a grid with two separate regions."""
+    image = PIL.Image.new('L', (100, 40), color=255)
+    drawer = PIL.ImageDraw.Draw(image)
+    drawer.rectangle((0, 0, 39, 39), fill=0)
+    drawer.rectangle((60, 0, 99, 39), fill=0)
+    return image
+
+
+if __name__ == '__main__':
+    unittest.main()
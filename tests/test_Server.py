@@ -0,0 +1,152 @@
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+from polymaze import server as _server
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError
+
+
+#noinspection PyProtectedMember
+class TestMazeServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = _server.MazeServer(('127.0.0.1', 0), processes=1)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.url = 'http://{}:{}'.format(*cls.server.server_address)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_post_returns_png_of_maze(self):
+        response = generic_post(self.url, {'seed': 1, 'complexity': 0.3})
+        self.assertEqual(response.headers['Content-Type'], 'image/png')
+        self.assertEqual(response.read()[:8], b'\x89PNG\r\n\x1a\n')
+
+    def test_post_returns_svg_of_maze(self):
+        response = generic_post(self.url, {'seed': 1, 'complexity': 0.3,
+                                           'format': 'svg'})
+        self.assertEqual(response.headers['Content-Type'], 'image/svg+xml')
+        self.assertTrue(response.read().startswith(b'<svg'))
+
+    def test_repeated_seeded_request_is_answered_from_cache(self):
+        params = {'seed': 7, 'complexity': 0.3, 'shape': 'Square'}
+        first = generic_post(self.url, params)
+        second = generic_post(self.url, params)
+        self.assertEqual(first.headers['X-Polymaze-Cache'], 'miss')
+        self.assertEqual(second.headers['X-Polymaze-Cache'], 'hit')
+        self.assertEqual(first.read(), second.read())
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'complexity': -1}, {'shape': 'Blob'},
+                       {'seed': 'one'}, {'unknown': 1}, {'format': 'gif'},
+                       {'complexity': _server._MAX_COMPLEXITY + 1},
+                       {'width': _server._MAX_SIDE + 1},
+                       {'aspect': 1.0 / (_server._MAX_ASPECT + 1)},
+                       {'text': u'x' * (_server._MAX_TEXT_LENGTH + 1)},
+                       {'width': _server._MAX_SIDE, 'aspect': 100},
+                       {'width': _server._MAX_SIDE,
+                        'height': _server._MAX_SIDE}):
+            try:
+                generic_post(self.url, params)
+            except HTTPError as e:
+                self.assertEqual(e.code, 400)
+                self.assertIn('error', json.loads(e.read().decode('utf-8')))
+            else:
+                self.fail('Accepted {}'.format(params))
+
+    def test_unknown_path_is_not_found(self):
+        try:
+            urlopen(self.url + '/other')
+        except HTTPError as e:
+            self.assertEqual(e.code, 404)
+        else:
+            self.fail('Found an unknown path')
+
+
+#noinspection PyProtectedMember
+class TestMazeServerLimits(unittest.TestCase):
+    def setUp(self):
+        self.server = _server.MazeServer(('127.0.0.1', 0), processes=1,
+                                         timeout=0.01)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://{}:{}'.format(*self.server.server_address)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_slow_maze_is_given_up_with_504(self):
+        try:
+            generic_post(self.url, {'complexity': 50})
+        except HTTPError as e:
+            self.assertEqual(e.code, 504)
+        else:
+            self.fail('Waited past the timeout')
+
+    def test_slot_of_a_request_past_its_deadline_is_free_again(self):
+        try:
+            generic_post(self.url, {'complexity': 50})
+        except HTTPError as e:
+            self.assertEqual(e.code, 504)
+        slots = self.server._slots
+        self.assertTrue(all(slots.acquire(False) for _ in range(2)))
+        self.assertFalse(slots.acquire(False))
+
+    def test_job_past_its_deadline_stops_before_making_the_maze(self):
+        data, error = _server._job({'complexity': 50}, 'png', time.time())
+        self.assertIsNone(data)
+        self.assertEqual(error, _server._PAST_DEADLINE)
+
+    def test_request_is_turned_away_with_503_when_too_many_wait(self):
+        with mock.patch.object(self.server, '_slots', threading.Semaphore(0)):
+            try:
+                generic_post(self.url, {'complexity': 0.3})
+            except HTTPError as e:
+                self.assertEqual(e.code, 503)
+            else:
+                self.fail('Accepted a request with no free slot')
+
+
+#noinspection PyProtectedMember
+class TestResultCache(unittest.TestCase):
+    def test_least_recently_used_results_are_evicted_first(self):
+        cache = _server._ResultCache(max_bytes=10)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        cache.get('a')  # b is now the oldest
+        cache.put('c', b'1234')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'1234')
+        self.assertEqual(cache.get('c'), b'1234')
+        self.assertEqual(cache.status()['bytes'], 8)
+
+
+def generic_post(url, params):
+    request = Request(url + '/maze', data=json.dumps(params).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+    return urlopen(request)
+
+
+if __name__ == '__main__':
+    unittest.main()
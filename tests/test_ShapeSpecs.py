@@ -0,0 +1,235 @@
+import copy
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import shape_specs
+from polymaze import shapes
+from polymaze import shared
+from polymaze import storage
+from tests.test_Shapes import supershape_with_neighbors
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+#noinspection PyProtectedMember
+class TestLoads(unittest.TestCase):
+    def setUp(self):
+        shape_specs._compiled.clear()
+        forget_loaded_supershapes(self)
+
+    def test_built_in_specs_make_the_same_shapes(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            custom = shape_specs.loads(shape_specs.dumps(ss))
+            self.assertEqual(custom.name(), ss.name())
+            self.assertEqual(custom.period(), ss.period())
+            expected = supershape_with_neighbors(ss)
+            made = supershape_with_neighbors(custom)
+            for shape in expected.shapes():
+                other = made.get(shape.index())
+                self.assertEqual(other.name(), shape.name())
+                self.assertEqual(list(other.n_indexes()),
+                                 list(shape.n_indexes()))
+                for n_index in shape.n_indexes():
+                    for vertex in ('counter_vertex', 'clock_vertex'):
+                        self.assertAlmostEqual(
+                            complex(*other._edge_data[n_index][vertex]),
+                            complex(*shape._edge_data[n_index][vertex]))
+
+    def test_new_supershape_makes_a_valid_maze(self):
+        brick = shape_specs.loads(json.dumps(generic_brick_spec()))
+        grid = pmz.PolyGrid(supershape=brick)
+        grid.create_rectangle(complexity=1)
+        self.assertTrue(pmz.Maze(grid).validate()['valid'])
+
+    def test_compiled_spec_is_cached_and_not_validated_again(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = pmz.MazeCache(directory)
+            data = json.dumps(generic_brick_spec())
+            shape_specs.loads(data, cache=cache)
+            shape_specs._compiled.clear()  # as in a new process
+            with mock.patch.object(shape_specs, 'compile_spec') as compiler:
+                brick = shape_specs.loads(data, cache=cache)
+            self.assertFalse(compiler.called)
+            self.assertEqual(brick.name(), 'Brick')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_loaded_supershape_is_registered_once_by_name(self):
+        data = json.dumps(generic_brick_spec())
+        brick = shape_specs.loads(data)
+        self.assertIs(pmz.SUPERSHAPES_DICT['Brick'], brick)
+        shape_specs._compiled.clear()
+        self.assertIs(shape_specs.loads(data), brick)
+
+    def test_mazes_of_loaded_supershapes_can_be_saved_and_pickled(self):
+        brick = shape_specs.loads(json.dumps(generic_brick_spec()))
+        grid = pmz.PolyGrid(supershape=brick)
+        grid.create_rectangle(complexity=1)
+        maze = pmz.Maze(grid)
+        data = storage.dumps(maze)
+        self.assertEqual(storage.dumps(storage.loads(data)), data)
+        self.assertEqual(storage.dumps(pickle.loads(pickle.dumps(maze))), data)
+        empty = pickle.loads(pickle.dumps(pmz.PolyGrid(supershape=brick)))
+        self.assertIs(empty._supershape, brick)
+
+    def test_other_spec_with_a_used_name_is_not_registered_or_saved(self):
+        spec = generic_brick_spec()
+        spec['name'] = 'Square'
+        not_square = shape_specs.loads(json.dumps(spec))
+        self.assertIsNot(pmz.SUPERSHAPES_DICT['Square'], not_square)
+        grid = pmz.PolyGrid(supershape=not_square)
+        grid.create_rectangle(complexity=1)
+        self.assertRaises(ValueError, storage.dumps, pmz.Maze(grid))
+        if shared.shared_memory is not None:
+            self.assertRaises(ValueError, pmz.SharedGrid.create, grid)
+
+
+#noinspection PyProtectedMember
+class TestValidation(unittest.TestCase):
+    def assertInvalid(self, spec, message_part):
+        try:
+            shape_specs.compile_spec(spec)
+        except ValueError as e:
+            self.assertIn(message_part, str(e))
+        else:
+            self.fail('spec was accepted')
+
+    def test_malformed_specs_raise_ValueError(self):
+        self.assertRaises(ValueError, shape_specs.loads, '{not json')
+        self.assertInvalid([], 'JSON object')
+        spec = generic_brick_spec()
+        del spec['name']
+        self.assertInvalid(spec, 'needs a name')
+        spec = generic_brick_spec()
+        spec['graph_offset_per_row'] = [1.0]
+        self.assertInvalid(spec, 'graph_offset_per_row')
+        spec = generic_brick_spec()
+        spec['period'] = [2, 1]
+        self.assertInvalid(spec, 'period')
+
+    def test_components_without_a_name_or_with_a_used_name_are_invalid(self):
+        spec = generic_brick_spec()
+        del spec['components'][0]['name']
+        self.assertInvalid(spec, 'needs a name')
+        spec = json.loads(shape_specs.dumps(pmz.SUPERSHAPES_DICT['Triangle']))
+        for component in spec['components']:
+            component['name'] = 'triangle'
+        self.assertInvalid(spec, 'more than one component is named')
+
+    def test_edge_without_an_edge_back_is_invalid(self):
+        spec = generic_brick_spec()
+        spec['components'][0]['edges'][2]['neighbor'] = [0, 2]
+        self.assertInvalid(spec, 'no edge back')
+
+    def test_edge_with_other_vertexes_than_the_edge_back_is_invalid(self):
+        spec = generic_brick_spec()
+        spec['components'][0]['edges'][1]['counter_vertex'] = [0.0, 0.4]
+        self.assertInvalid(spec, 'different vertexes')
+
+    def test_counter_clockwise_edges_are_invalid(self):
+        spec = generic_brick_spec()
+        spec['components'][0]['edges'].reverse()
+        self.assertInvalid(spec, 'clockwise')
+
+    def test_overlapping_shapes_are_invalid(self):
+        # each square overlaps the next row but all edges still match up
+        spec = copy.deepcopy(generic_square_spec())
+        spec['graph_offset_per_row'] = [0.5, 0.0]
+        edges = spec['components'][0]['edges']
+        edges[0]['neighbor'], edges[2]['neighbor'] = [-2, 0], [2, 0]
+        self.assertInvalid(spec, 'gaps or overlaps')
+
+
+#noinspection PyProtectedMember
+class TestEnvironment(unittest.TestCase):
+    def setUp(self):
+        shape_specs._compiled.clear()
+        forget_loaded_supershapes(self)
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, 'cache')
+        with open(os.path.join(self.directory, 'brick.json'), 'w') as f:
+            json.dump(generic_brick_spec(), f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def environ(self):
+        return {'POLYMAZE_SHAPES': self.directory,
+                'POLYMAZE_CACHE': self.cache_directory}
+
+    def test_specs_in_listed_directories_are_loaded_and_cached(self):
+        loaded = shape_specs.environment_supershapes(self.environ())
+        self.assertEqual([ss.name() for ss in loaded], ['Brick'])
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+
+    def test_supershapes_include_environment_supershapes_on_first_use(self):
+        with mock.patch.object(shape_specs, '_environment_supershapes',
+                               wraps=shape_specs._environment_supershapes)\
+                as environment_supershapes:
+            supershapes = shapes._SuperShapes(self.environ())
+            self.assertFalse(environment_supershapes.called)
+            self.assertIn('Brick', supershapes)
+            self.assertIn('Square', supershapes)
+            len(supershapes)
+        self.assertEqual(environment_supershapes.call_count, 1)
+
+    def test_bad_or_duplicate_specs_warn_and_are_skipped(self):
+        spec = generic_square_spec()  # same name as the built-in
+        with open(os.path.join(self.directory, 'square.json'), 'w') as f:
+            json.dump(spec, f)
+        with open(os.path.join(self.directory, 'bad.json'), 'w') as f:
+            f.write('{}')
+        supershapes = shapes._SuperShapes(self.environ())
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            names = sorted(supershapes)
+        self.assertEqual(len(caught), 2)
+        self.assertIn('Brick', names)
+        self.assertIsInstance(supershapes['Square'], shapes.Square)
+        self.assertRaises(ValueError, shape_specs.environment_supershapes,
+                          self.environ())
+
+
+def forget_loaded_supershapes(test_case):
+    """Restore the registered supershapes when test_case is done."""
+    patcher = mock.patch.dict(shapes.supershapes_dict())
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+def generic_brick_spec():
+    """Return the spec of bricks (squares shifted half a side each row)."""
+    edges = (('top left', [-1, 0], [0.0, 0.0]),
+             ('top right', [-1, 1], [0.0, 0.5]),
+             ('right', [0, 1], [0.0, 1.0]),
+             ('bottom right', [1, 0], [1.0, 1.0]),
+             ('bottom left', [1, -1], [1.0, 0.5]),
+             ('left', [0, -1], [1.0, 0.0]))
+    return {'name': 'Brick',
+            'graph_offset_per_row': [1.0, 0.5],
+            'graph_offset_per_col': [0.0, 1.0],
+            'components': [{'origin_index': [0, 0], 'name': 'brick',
+                            'edges': [{'name': name, 'neighbor': neighbor,
+                                       'counter_vertex': vertex}
+                                      for name, neighbor, vertex in edges]}]}
+
+
+def generic_square_spec():
+    return json.loads(shape_specs.dumps(pmz.SUPERSHAPES_DICT['Square']))
+
+
+if __name__ == '__main__':
+    unittest.main()
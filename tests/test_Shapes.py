@@ -1,10 +1,20 @@
 import math
 import os
+import random
 import sys
 import unittest
 
+import PIL.ImageChops
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
 import polymaze as pmz
+from polymaze import polygrid as _polygrid_module
+from polymaze import shapes as _shapes_module
 
 # silly workaround to allow tests to work in py2 or py3
 try:
@@ -107,6 +117,14 @@ class TestComponentShapeImplementations(unittest.TestCase):
                     # confirm b and c are the same
                     self.assertAlmostEqual(b, c)
 
+    def test_supershape_n_indexes_match_shape_n_indexes(self):
+        """Confirm index-only neighbor lookup agrees with created shapes."""
+        for neighborhood in self.shape_neighborhoods:
+            ss = neighborhood._supershape
+            for shape in neighborhood.shapes():
+                self.assertEqual(ss.n_indexes(shape.index()),
+                                 list(shape.n_indexes()))
+
     def test_avg_area_is_correct(self):
         # only consider some existing super shapes and assume it otherwise works
         triangle_area = math.sin(math.pi / 3.0) / 2.0
@@ -126,6 +144,68 @@ class TestComponentShapeImplementations(unittest.TestCase):
         self.assertEqual(tested_count, len(name_and_avg_areas_spec))
 
 
+#noinspection PyProtectedMember
+class TestClosedFormSuperShapes(unittest.TestCase):
+    """Confirm the fast regular tilings match their general specification."""
+    def setUp(self):
+        self.supershapes = [pmz.SUPERSHAPES_DICT[name]
+                            for name in ('Square', 'Hexagon', 'Triangle')]
+        self.indexes = [(row, col)
+                        for row in range(-7, 8) for col in range(-7, 8)]
+
+    def test_final_data_is_exactly_equal_to_general_calculation(self):
+        general = _shapes_module._ComponentShape._calc_final_data
+        for ss in self.supershapes:
+            for index in self.indexes:
+                name, edge_data, n_indexes = ss._final_data(index)
+                spec_name, spec_edge_data, spec_n_indexes = general(ss, index)
+                self.assertEqual(name, spec_name)
+                self.assertEqual(n_indexes, spec_n_indexes)
+                # exact floats (not almost equal) so images do not change
+                self.assertEqual(repr(edge_data), repr(spec_edge_data),
+                                 '{} @ {}'.format(ss.name(), index))
+
+    def test_n_indexes_are_equal_to_general_calculation(self):
+        general = _shapes_module._SuperShape.n_indexes
+        for ss in self.supershapes:
+            for index in self.indexes:
+                self.assertEqual(ss.n_indexes(index), general(ss, index))
+
+    def test_runs_of_a_color_in_a_row_are_filled_as_one_polygon(self):
+        ss = pmz.SUPERSHAPES_DICT['Square']
+        grid = pmz.PolyGrid(supershape=ss)
+        for col in range(5):
+            grid.create((0, col))
+        grid.get((0, 2)).viz_style = 'other'
+        color = lambda shape: shape.viz_style
+        polygons = ss._fill_polygons(grid.shapes(), color)
+        self.assertEqual([shape.index() for shape, _ in polygons],
+                         [(0, 0), (0, 2), (0, 3)])
+        self.assertEqual(polygons[0][1],
+                         [(1.0, 0.0), (0.0, 0.0), (0.0, 2.0), (1.0, 2.0)])
+
+    def test_run_fills_draw_the_same_pixels_as_one_polygon_per_shape(self):
+        random.seed(7)
+        for ss in self.supershapes:
+            grid = pmz.PolyGrid(supershape=ss)
+            grid.create_rectangle(complexity=3)
+            viz = _polygrid_module.PolyViz(grid)
+            viz.new_shape_style('red', (255, 0, 0, 255))
+            viz.new_edge_style('none', (0, 0, 0, 0))
+            for shape in grid.shapes():
+                shape.viz_style = random.choice(('red', None, None))
+            for edge in grid.edges():
+                if random.random() < 0.5:
+                    edge.viz_style = 'none'  # show the borders of fills
+            image = viz.image()
+            general = _shapes_module._SuperShape._fill_polygons
+            with mock.patch.object(type(ss), '_fill_polygons', general):
+                expected = viz.image()
+            self.assertIsNone(
+                PIL.ImageChops.difference(image, expected).getbbox(),
+                ss.name())
+
+
 #noinspection PyProtectedMember
 class TestComponentShape(unittest.TestCase):
     def test_index_returns_same_index_provided_on_creation(self):
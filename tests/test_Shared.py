@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import shared as _shared
+from tests.test_Maze import generic_maze
+
+# silly workaround to allow tests to work in py2 or py3
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+#noinspection PyProtectedMember
+@unittest.skipIf(_shared.shared_memory is None,
+                 'multiprocessing.shared_memory is not available')
+class TestSharedGrid(unittest.TestCase):
+    def test_shapes_match_the_maze_for_all_supershapes(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            maze = generic_maze(supershape=ss)
+            with pmz.SharedGrid.create(maze) as shared:
+                self.assertEqual(shared.supershape_name(), ss.name())
+                self.assertEqual(shared.shape_count(),
+                                 len(list(maze._grid.shapes())))
+                for shape in maze._grid.shapes():
+                    view = shared.get(shape.index())
+                    self.assertEqual(view.name(), shape.name())
+                    self.assertEqual(view.n_indexes(),
+                                     list(shape.n_indexes()))
+                    self.assertEqual(view.vertexes(), [
+                        tuple(float(v) for v
+                              in shape._edge_data[n_index]['counter_vertex'])
+                        for n_index in shape._ordered_n_indexes])
+                    self.assertEqual(
+                        view.paths(),
+                        [n_index for n_index, edge in shape.edges()
+                         if edge.viz_style == maze._PATH_STYLE])
+                    self.assertEqual(
+                        [n_index for n_index, n in view.neighbors() if n],
+                        [n_index for n_index, n in shape.neighbors() if n])
+                self.assertEqual(shared.entrance_exit_pairs(),
+                                 [(a.index(), b.index()) for a, b
+                                  in maze.entrance_exit_pairs()])
+
+    def test_plain_grid_has_no_paths_or_pairs(self):
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=0.5)
+        with pmz.SharedGrid.create(grid) as shared:
+            self.assertEqual(sum(len(view.paths())
+                                 for view in shared.shapes()), 0)
+            self.assertEqual(shared.entrance_exit_pairs(), [])
+            self.assertIsNone(shared.get((-999, -999)))
+
+    def test_workers_attach_by_name_and_read_the_same_grid(self):
+        maze = generic_maze()
+        expected = generic_path_count(maze._grid.shapes(), maze)
+        with pmz.SharedGrid.create(maze) as shared:
+            pool = multiprocessing.Pool(2)
+            try:
+                counts = pool.map(worker_path_count, [shared.name()] * 2)
+            finally:
+                pool.close()
+                pool.join()
+        self.assertEqual(counts, [expected, expected])
+
+    def test_attached_grid_is_read_only(self):
+        with pmz.SharedGrid.create(generic_maze()) as shared:
+            attached = pmz.SharedGrid.attach(shared.name())
+            self.assertRaises(TypeError, attached._passages.__setitem__, 0, 1)
+            attached.close()
+
+    def test_block_is_freed_when_the_grid_can_not_be_made(self):
+        names = list()
+        new_memory = _shared.shared_memory.SharedMemory
+
+        def recording_memory(*args, **kwargs):
+            memory = new_memory(*args, **kwargs)
+            names.append(memory.name)
+            return memory
+        with mock.patch.object(_shared.shared_memory, 'SharedMemory',
+                               recording_memory):
+            with mock.patch.object(_shared.SharedGrid, '_read',
+                                   side_effect=ValueError):
+                self.assertRaises(ValueError, pmz.SharedGrid.create,
+                                  generic_maze())
+        self.assertEqual(len(names), 1)
+        self.assertRaises(OSError, new_memory, name=names[0])
+
+    def test_attach_does_not_change_the_resource_tracker(self):
+        tracker = _shared.resource_tracker
+        register = tracker.register
+        with pmz.SharedGrid.create(generic_maze()) as shared:
+            with mock.patch.object(tracker, 'unregister') as m_unregister:
+                attached = pmz.SharedGrid.attach(shared.name())
+                self.assertIs(tracker.register, register)
+                attached.close()
+        if sys.version_info < (3, 13) and os.name == 'posix':
+            m_unregister.assert_called_once_with(attached._memory._name,
+                                                 'shared_memory')
+
+
+def worker_path_count(name):
+    shared = pmz.SharedGrid.attach(name)
+    try:
+        return sum(len(view.paths()) for view in shared.shapes())
+    finally:
+        shared.close()
+
+
+def generic_path_count(shapes, maze):
+    return sum(1 for shape in shapes for _, edge in shape.edges()
+               if edge.viz_style == maze._PATH_STYLE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from tests.test_Maze import generic_maze
+
+
+#noinspection PyProtectedMember
+class TestSolver(unittest.TestCase):
+    def test_path_leads_from_entrance_to_exit_through_passages(self):
+        maze = generic_maze()
+        solver = pmz.Solver(maze)
+        entrance, exit_space = maze.entrance_exit_pairs()[0]
+        path = solver.path(entrance.index(), exit_space.index())
+        self.assertEqual(path[0], entrance.index())
+        self.assertEqual(path[-1], exit_space.index())
+        # confirm each step goes through a passage to a neighbor
+        for index, next_index in zip(path, path[1:]):
+            edge = maze._grid.get(index).edge(next_index)
+            self.assertEqual(edge.viz_style, maze._PATH_STYLE)
+
+    def test_astar_path_has_same_length_as_bfs_path(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            maze = generic_maze(supershape=ss)
+            solver = pmz.Solver(maze)
+            indexes = solver.indexes()
+            start, end = indexes[0], indexes[-1]
+            bfs_path = solver.path(start, end)
+            astar_path = solver.path(start, end, method='astar')
+            self.assertEqual(len(astar_path), len(bfs_path))
+
+    def test_distances_reach_every_shape_of_a_perfect_maze(self):
+        maze = generic_maze()
+        solver = pmz.Solver(maze)
+        entrance, _ = maze.entrance_exit_pairs()[0]
+        distances = solver.distances(entrance.index())
+        self.assertEqual(distances[solver.node_id(entrance.index())], 0)
+        self.assertNotIn(-1, distances)
+
+    def test_path_returns_None_between_unconnected_regions(self):
+        grid = pmz.PolyGrid(supershape=pmz.SUPERSHAPES_DICT['Square'])
+        for row in range(3):
+            for col in range(3):
+                grid.create((row, col))
+                grid.create((row, col + 10))
+        solver = pmz.Solver(pmz.Maze(grid))
+        self.assertIsNone(solver.path((0, 0), (0, 10)))
+        self.assertIsNone(solver.path((0, 0), (0, 10), method='astar'))
+
+    def test_path_raises_ValueError_for_unknown_method(self):
+        maze = generic_maze()
+        solver = pmz.Solver(maze)
+        some_index = solver.indexes()[0]
+        self.assertRaises(ValueError, solver.path, some_index, some_index,
+                          method='asdf')
+
+    def test_metrics_are_consistent_with_the_maze(self):
+        maze = generic_maze()
+        metrics = maze.metrics()
+        shape_count = len(tuple(maze._grid.shapes()))
+        self.assertEqual(metrics['shapes'], shape_count)
+        self.assertEqual(sum(metrics['branching'].values()), shape_count)
+        self.assertEqual(metrics['dead_ends'], metrics['branching'][1])
+        solution_lengths = [len(path) for path in maze.solutions()]
+        self.assertEqual(metrics['solution_lengths'], solution_lengths)
+        self.assertTrue(1 <= metrics['longest_corridor'] <= shape_count)
+        self.assertTrue(0.0 <= metrics['river'] <= 1.0)
+
+    def test_metrics_of_a_straight_corridor(self):
+        grid = pmz.PolyGrid(supershape=pmz.SUPERSHAPES_DICT['Square'])
+        # a 2 x 1 maze is always one passage with an opening on each end
+        grid.create((0, 0))
+        grid.create((0, 1))
+        metrics = pmz.Maze(grid).metrics()
+        self.assertEqual(metrics['dead_ends'] + metrics['branching'].get(2, 0),
+                         2)
+        self.assertEqual(metrics['solution_length'],
+                         sum(metrics['solution_lengths']))
+
+    def test_metrics_of_an_unreachable_exit_are_None(self):
+        maze = generic_maze()
+        (entrance, exit_space), = maze.entrance_exit_pairs()
+        # wall in the exit
+        for n_index, edge in exit_space.edges():
+            if maze._grid.get(n_index):
+                edge.viz_style = maze._WALL_STYLE
+        metrics = maze.metrics()
+        self.assertEqual(metrics['solution_lengths'], [None])
+        self.assertIsNone(metrics['solution_length'])
+
+    def test_metrics_count_a_corridor_reached_from_both_ends_once(self):
+        grid = pmz.PolyGrid(supershape=pmz.SUPERSHAPES_DICT['Square'])
+        # a ring of 8 squares around a hole with the in/out side by side
+        ring = [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0)]
+        for index in ring:
+            grid.create(index)
+        maze = pmz.Maze(grid, carve=False)
+        for index, next_index in zip(ring, ring[1:] + ring[:1]):
+            grid.get(index).edge(next_index).viz_style = maze._PATH_STYLE
+        maze._entrance_exit_pairs = ((grid.get(ring[0]), grid.get(ring[1])),)
+        metrics = maze.metrics()
+        self.assertEqual(metrics['branching'], {2: 6, 3: 2})
+        self.assertEqual(metrics['longest_corridor'], 6)
+        self.assertEqual(metrics['solution_lengths'], [2])
+
+    def test_maze_solutions_provides_a_path_for_each_pair(self):
+        maze = generic_maze()
+        solutions = maze.solutions()
+        self.assertEqual(len(solutions), len(maze.entrance_exit_pairs()))
+
+
+if __name__ == '__main__':
+    unittest.main()
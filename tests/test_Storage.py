@@ -0,0 +1,119 @@
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import storage
+from tests.test_Maze import generic_maze
+
+
+#noinspection PyProtectedMember
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'maze.pmz')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_loaded_maze_has_same_passages_and_pairs(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            maze = generic_maze(supershape=ss)
+            storage.dump(maze, self.path)
+            loaded = storage.load(self.path)
+            self.assertEqual(loaded.shape_name(), maze.shape_name())
+            self.assertEqual(passage_pairs(loaded), passage_pairs(maze))
+            self.assertEqual(index_pairs(loaded), index_pairs(maze))
+            self.assertTrue(loaded.validate()['valid'])
+
+    def test_load_only_creates_shapes_when_accessed(self):
+        maze = generic_maze()
+        storage.dump(maze, self.path)
+        loaded = storage.load(self.path)
+        # only the in/out shapes are created up front
+        self.assertLessEqual(len(loaded._grid._shapes), 2)
+        # accessing a shape creates exactly that shape
+        some_index = next(iter(maze._grid.shapes())).index()
+        created_before = len(loaded._grid._shapes)
+        shape = loaded._grid.get(some_index)
+        self.assertEqual(shape.index(), some_index)
+        self.assertLessEqual(len(loaded._grid._shapes), created_before + 1)
+        # unused indexes are still empty
+        self.assertIsNone(loaded._grid.get((-999, -999)))
+
+    def test_removed_shapes_of_loaded_maze_stay_removed(self):
+        maze = generic_maze()
+        loaded = storage.loads(storage.dumps(maze))
+        some_index = next(iter(maze._grid.shapes())).index()
+        loaded._grid.remove(some_index)
+        self.assertIsNone(loaded._grid.get(some_index))
+        self.assertNotIn(some_index,
+                         [shape.index() for shape in loaded._grid.shapes()])
+
+    def test_pickled_maze_has_same_passages_and_pairs(self):
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            maze = generic_maze(supershape=ss)
+            unpickled = pickle.loads(pickle.dumps(maze, 2))
+            self.assertEqual(passage_pairs(unpickled), passage_pairs(maze))
+            self.assertEqual(index_pairs(unpickled), index_pairs(maze))
+
+    def test_pickled_maze_is_packed_and_created_lazily(self):
+        maze = generic_maze()
+        data = pickle.dumps(maze, 2)
+        self.assertLess(len(data), len(storage.dumps(maze)) + 200)
+        unpickled = pickle.loads(data)
+        self.assertLessEqual(len(unpickled._grid._shapes), 2)
+        # pickling again does not need to create the shapes
+        self.assertEqual(pickle.dumps(unpickled, 2), data)
+        self.assertLessEqual(len(unpickled._grid._shapes), 2)
+
+    def test_pickled_grid_without_styles_is_packed_and_created_lazily(self):
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=1)
+        unpickled = pickle.loads(pickle.dumps(grid, 2))
+        self.assertEqual(len(unpickled._shapes), 0)
+        self.assertEqual(unpickled.supershape_name(), grid.supershape_name())
+        self.assertEqual(sorted(shape.index() for shape in unpickled.shapes()),
+                         sorted(shape.index() for shape in grid.shapes()))
+        for shape in unpickled.shapes():
+            self.assertIsNone(shape.viz_style)
+        # still usable for a maze
+        self.assertTrue(pmz.Maze(unpickled).validate()['valid'])
+
+    def test_pickled_grid_with_styles_keeps_styles(self):
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=1)
+        some_shape = next(iter(grid.shapes()))
+        some_shape.viz_style = 'special'
+        unpickled = pickle.loads(pickle.dumps(grid, 2))
+        self.assertEqual(unpickled.get(some_shape.index()).viz_style,
+                         'special')
+        self.assertEqual(len(unpickled._shapes), len(grid._shapes))
+
+    def test_loads_raises_ValueError_for_bad_data(self):
+        data = storage.dumps(generic_maze())
+        self.assertRaises(ValueError, storage.loads, b'asdf' + data[4:])
+        self.assertRaises(ValueError, storage.loads, data[:-4])
+        self.assertRaises(ValueError, storage.loads, b'')
+
+
+def passage_pairs(maze):
+    csr = maze.passages_csr(use_numpy=False)
+    indexes = list(zip(csr['rows'], csr['cols']))
+    offsets, neighbors = csr['offsets'], csr['neighbors']
+    return set((indexes[node], indexes[neighbors[i]])
+               for node in range(len(indexes))
+               for i in range(offsets[node], offsets[node + 1]))
+
+
+def index_pairs(maze):
+    return [(entrance.index(), exit_space.index())
+            for entrance, exit_space in maze.entrance_exit_pairs()]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze import tracing as _tracing
+
+
+class RecordingTracer(object):
+    """Tracer that keeps (name, start attributes, end attributes) in order."""
+    def __init__(self):
+        self.spans = list()
+
+    def start(self, name, attributes):
+        span = [name, attributes, None]
+        self.spans.append(span)
+        return span
+
+    def end(self, handle, attributes):
+        handle[2] = attributes
+
+
+#noinspection PyProtectedMember
+class TestTraced(unittest.TestCase):
+    def tearDown(self):
+        pmz.set_tracer(None)
+
+    def test_attributes_are_not_computed_without_a_tracer(self):
+        def fail(*args, **kwargs):
+            raise AssertionError('attributes computed without a tracer')
+
+        @_tracing.traced('test', fail, fail)
+        def double(x):
+            return 2 * x
+        self.assertEqual(double(3), 6)
+
+    def test_set_tracer_returns_the_previous_tracer(self):
+        tracer = RecordingTracer()
+        self.assertIsNone(pmz.set_tracer(tracer))
+        self.assertIs(_tracing.get_tracer(), tracer)
+        self.assertIs(pmz.set_tracer(None), tracer)
+
+    def test_failed_span_ends_with_the_error_and_reraises(self):
+        tracer = RecordingTracer()
+        pmz.set_tracer(tracer)
+        cancel = pmz.CancelToken()
+        cancel.cancel()
+        grid = pmz.PolyGrid()
+        self.assertRaises(pmz.Cancelled, grid.create_rectangle, complexity=1,
+                          cancel=cancel)
+        for name, _, end_attributes in tracer.spans:
+            self.assertEqual(end_attributes, {'error': 'Cancelled'})
+
+    def test_grid_maze_and_image_spans_have_their_attributes(self):
+        tracer = RecordingTracer()
+        pmz.set_tracer(tracer)
+        grid = pmz.PolyGrid(supershape=pmz.SUPERSHAPES_DICT['Square'])
+        grid.create_rectangle(complexity=0.5)
+        maze = pmz.Maze(grid)
+        maze.image()
+        maze._viz.image()
+        names = [name for name, _, _ in tracer.spans]
+        self.assertEqual(names, ['grid.create_rectangle',
+                                 'grid.create_from_image', 'maze.create',
+                                 'maze.image', 'viz.image'])
+        spans = dict((name, (start, end)) for name, start, end in tracer.spans)
+        start, end = spans['grid.create_rectangle']
+        self.assertEqual(start['supershape'], 'Square')
+        self.assertEqual(start['complexity'], 0.5)
+        self.assertEqual(end['shape_count'], len(grid._shapes))
+        start, end = spans['maze.create']
+        self.assertEqual(start['shape_count'], len(grid._shapes))
+        self.assertEqual(end['regions'], len(maze.entrance_exit_pairs()))
+        start, end = spans['viz.image']
+        self.assertEqual(start['method'], 'draw')
+        self.assertEqual(len(end['size']), 2)
+
+
+class TestChromeTracer(unittest.TestCase):
+    def tearDown(self):
+        pmz.set_tracer(None)
+
+    def test_spans_are_nested_complete_events(self):
+        tracer = pmz.ChromeTracer()
+        pmz.set_tracer(tracer)
+        grid = pmz.PolyGrid()
+        grid.create_rectangle(complexity=0.5)
+        pmz.set_tracer(None)
+        trace = json.loads(tracer.dumps())
+        events = dict((event['name'], event) for event in trace['traceEvents'])
+        outer = events['grid.create_rectangle']
+        inner = events['grid.create_from_image']
+        for event in (outer, inner):
+            self.assertEqual(event['ph'], 'X')
+            self.assertEqual(event['pid'], os.getpid())
+        self.assertEqual(outer['tid'], inner['tid'])
+        self.assertLessEqual(outer['ts'], inner['ts'])
+        self.assertGreaterEqual(outer['ts'] + outer['dur'],
+                                inner['ts'] + inner['dur'])
+        self.assertEqual(outer['args']['shape_count'], len(grid._shapes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath('..'))  # hack to allow simple test structure
+import polymaze as pmz
+from polymaze.validator import validate
+from tests.test_Maze import generic_maze
+
+
+#noinspection PyProtectedMember
+class TestValidate(unittest.TestCase):
+    def test_stress_mazes_of_all_supershapes_are_perfect(self):
+        modes = ({}, {'tile_size': (7, 7)})
+        for ss in pmz.SUPERSHAPES_DICT.values():
+            for complexity in (0.3, 1, 3):
+                for kwargs in modes:
+                    grid = pmz.PolyGrid(supershape=ss)
+                    grid.create_rectangle(complexity=complexity)
+                    report = validate(pmz.Maze(grid, **kwargs))
+                    self.assertTrue(report['valid'],
+                                    'For SuperShape {} with {}: {}'
+                                    ''.format(ss.name(), kwargs,
+                                              report['errors']))
+
+    def test_report_has_stats_for_each_region(self):
+        grid = square_grid_with_two_regions()
+        maze = pmz.Maze(grid)
+        report = validate(maze)
+        self.assertEqual(len(report['regions']), 2)
+        for region in report['regions']:
+            self.assertEqual(region['shapes'], 9)
+            self.assertEqual(region['passages'], 8)
+            self.assertEqual(region['border_openings'], 2)
+
+    def test_extra_passage_is_reported_as_cycle(self):
+        maze = generic_maze(supershape=pmz.SUPERSHAPES_DICT['Square'])
+        open_one_wall(maze)
+        report = validate(maze)
+        self.assertFalse(report['valid'])
+        self.assertEqual(sum(r['cycles'] for r in report['regions']), 1)
+
+    def test_removed_passage_is_reported_as_unreachable(self):
+        maze = generic_maze()
+        grid = maze._grid
+        for edge in grid.edges():
+            both_exist = (grid.get(edge._neighbor_1_index)
+                          and grid.get(edge._neighbor_2_index))
+            if both_exist and edge.viz_style == maze._PATH_STYLE:
+                edge.viz_style = maze._WALL_STYLE
+                break
+        report = validate(maze)
+        self.assertFalse(report['valid'])
+        self.assertEqual(sum(r['pieces'] for r in report['regions']), 2)
+
+    def test_extra_border_opening_is_reported(self):
+        maze = generic_maze()
+        grid = maze._grid
+        for edge in grid.edges():
+            is_border = not (grid.get(edge._neighbor_1_index)
+                             and grid.get(edge._neighbor_2_index))
+            if is_border and edge.viz_style == maze._WALL_STYLE:
+                edge.viz_style = maze._PATH_STYLE
+                break
+        report = validate(maze)
+        self.assertFalse(report['valid'])
+
+
+def square_grid_with_two_regions():
+    grid = pmz.PolyGrid(supershape=pmz.SUPERSHAPES_DICT['Square'])
+    for row in range(3):
+        for col in range(3):
+            grid.create((row, col))
+            grid.create((row, col + 10))
+    return grid
+
+
+def open_one_wall(maze):
+    """Turn one wall between two shapes into a passage."""
+    grid = maze._grid
+    for edge in grid.edges():
+        both_exist = (grid.get(edge._neighbor_1_index)
+                      and grid.get(edge._neighbor_2_index))
+        if both_exist and edge.viz_style == maze._WALL_STYLE:
+            edge.viz_style = maze._PATH_STYLE
+            return
+
+
+if __name__ == '__main__':
+    unittest.main()